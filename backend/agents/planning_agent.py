@@ -6,19 +6,30 @@ import os
 import sys
 import asyncio
 import json
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from anthropic import Anthropic
-from dotenv import load_dotenv
+from typing import Dict, Any, AsyncIterator, List, Optional, Union
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
 # Fix import path for state_store
-# This allows the file to be run directly and also imported as a module
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from state_store import StateStore
-
-# Load environment variables
-load_dotenv()
+# Only needed when the file is run directly; as a module backend/ is on the path
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import ARTIFACT_INPUTS, StateStore
+from analytics import record_plan
+from blob_store import BlobHandle, BlobStore
+from cache import ResultCache, SingleFlight, digest, profile_key
+from conversations import Conversation, ConversationStore
+from deadlines import DeadlineExceeded, deadline_scope, guard, request_budget
+from responses import dumps, etag_matches, payload_response
+import metrics
+from llm import generate_text, stream_text
+from model_router import CONVERSATION, PERSONALIZATION, PLAN_SECTION, PLANNING
+from plan_skeletons import Skeleton, SkeletonLibrary, skeleton_key
+from plan_store import PlanStore, StoredPlan
+from scheduler import BATCH, lane_scope, request_session, session_scope
+from token_budget import BudgetController
+from settings import get_settings
 
 # ============================================================
 # Models
@@ -51,6 +62,99 @@ class CareerPlanResponse(BaseModel):
     conclusion: str = Field(..., description="Final thoughts and encouragement")
 
 
+class PlanSectionSummary(BaseModel):
+    """Section of a plan outline, without its steps"""
+    index: int = Field(..., description="Position of the section (0-based), for /sections/{index}")
+    title: str = Field(..., description="Title of the section")
+    description: str = Field(..., description="Description of this section")
+    ready: bool = Field(..., description="False until the section's steps have been generated")
+    step_count: Optional[int] = Field(None, description="Number of steps (None until generated)")
+
+
+class PlanOutline(BaseModel):
+    """A stored plan without the steps; sections are fetched one at a time"""
+    plan_id: str = Field(..., description="ID for /api/career-plan/{plan_id}")
+    career: str = Field(..., description="The selected career path")
+    introduction: str = Field(..., description="Personalized introduction to the plan")
+    sections: List[PlanSectionSummary] = Field(..., description="Sections of the plan")
+    conclusion: str = Field(..., description="Final thoughts and encouragement")
+
+
+class OutlineSection(BaseModel):
+    """Section of a generated outline"""
+    title: str = Field(..., description="Title of the section")
+    description: str = Field(..., description="Description of this section")
+
+
+class OutlineDraft(BaseModel):
+    """Outline generated before any section's steps"""
+    career: str = Field(..., description="The selected career path")
+    introduction: str = Field(..., description="Personalized introduction to the plan")
+    sections: List[OutlineSection] = Field(..., description="Sections of the plan")
+    conclusion: str = Field(..., description="Final thoughts and encouragement")
+
+
+class StepNote(BaseModel):
+    """Personal note appended to a skeleton step"""
+    step: Union[str, float] = Field(..., description="Step number, e.g. \"1.2\"")
+    note: str = Field(..., description="One or two sentences tying the step to the student")
+
+
+class StepResource(BaseModel):
+    """College-specific resource attached to a skeleton step"""
+    step: Union[str, float] = Field(..., description="Step number, e.g. \"6.1\"")
+    resource: str = Field(..., description="Resource, program or place at the college")
+
+
+class Personalization(BaseModel):
+    """The personal parts of a plan built from a skeleton"""
+    introduction: str = Field(..., min_length=1, description="Personalized introduction to the plan")
+    conclusion: str = Field(..., min_length=1, description="Final thoughts and encouragement")
+    touches: List[StepNote] = Field(default_factory=list, description="Notes on individual steps")
+    resources: List[StepResource] = Field(default_factory=list, description="Resources for individual steps")
+
+
+class PlanQuestion(BaseModel):
+    """Follow-up question about a stored plan"""
+    question: str = Field(..., min_length=1, max_length=2000, description="The student's question")
+
+
+# ============================================================
+# Cache
+# ============================================================
+# Keyed on the career plus a digest of the profile (canonical college/major)
+# and the reasoning behind that career; values are blob handles of the
+# validated, serialized CareerPlanResponse
+_plan_cache = ResultCache(
+    "planning",
+    maxsize=4096,
+    ttl_seconds=get_settings().plan_cache_ttl,
+)
+
+# Identical concurrent plan requests share one model call; it is cancelled
+# once every requester has gone
+_plan_flight = SingleFlight("planning")
+
+# Skeletons are shared by every student with the same career, major and
+# year, so a build is finished even if its requesters leave
+_skeleton_flight = SingleFlight("plan-skeletons", keep_on_abandon=True)
+
+# A generated section is stored with its plan, so it is finished too
+_section_flight = SingleFlight("plan-sections", keep_on_abandon=True)
+
+_background = set()
+
+# Response header with the ID of the stored plan
+PLAN_ID_HEADER = "X-Plan-Id"
+
+# Cache-Control of stored sections (they never change) and of outlines
+# (revalidated, since sections become ready)
+SECTION_CACHE_CONTROL = "private, max-age=86400, immutable"
+OUTLINE_CACHE_CONTROL = "private, no-cache"
+
+# Output budget of the summary older conversation turns are folded into
+SUMMARY_MAX_TOKENS = 400
+
 # ============================================================
 # Helper Functions
 # ============================================================
@@ -162,6 +266,21 @@ async def generate_career_plan(selected_career: str) -> Dict[str, Any]:
     Returns:
         A structured career plan
     """
+    handle = await build_career_plan(selected_career)
+    return BlobStore.get_instance().get_json(handle)
+
+
+async def build_career_plan(selected_career: str, force: bool = False) -> BlobHandle:
+    """
+    Generate (or reuse) the career plan and store it validated and serialized
+    
+    Args:
+        selected_career: The career path chosen by the student
+        force: Generate again even if the inputs are unchanged
+        
+    Returns:
+        Blob handle of the CareerPlanResponse JSON bytes
+    """
     # Get the state store
     store = StateStore.get_instance()
     
@@ -176,26 +295,103 @@ async def generate_career_plan(selected_career: str) -> Dict[str, Any]:
     if not store.name or not store.college or not store.major:
         raise ValueError("Basic student information is missing. Please complete the profile first.")
     
-    # Check for API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+    # The session's plan for this career is reused while none of its inputs moved
+    memo_key = ("plan", selected_career.strip().lower())
+    fingerprint = store.input_fingerprint("plan")
+    if force:
+        metrics.incr("memo.forced.plan")
+    else:
+        stored = store.stored_artifact(memo_key, fingerprint)
+        if stored is not None:
+            metrics.incr("memo.hits.plan")
+            store.update_career_plan_payload(BlobStore.get_instance().get_bytes(stored))
+            store.select_career(selected_career)
+            return stored
+    
+    # Get career reasoning
+    career_reasoning = get_career_reasoning(store, selected_career)
     
-    # Initialize Anthropic client
-    client = Anthropic(api_key=api_key)
-    model = os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet-20250219")
+    # An unchanged profile and reasoning reuse the previous plan
+    cache_key = (selected_career.strip().lower(), profile_key(store, ARTIFACT_INPUTS["plan"]), digest(career_reasoning))
+    cached = None if force else _plan_cache.get(cache_key)
+    if cached is not None:
+        store.remember_artifact(memo_key, fingerprint, cached)
+        store.update_career_plan_payload(BlobStore.get_instance().get_bytes(cached))
+        store.select_career(selected_career)
+        return cached
     
+    # Determine academic year for more specific guidance
+    academic_year = determine_academic_year(store.grade)
+    
+    # Reuse the shared skeleton for this career, major and year; only the
+    # personal parts are generated per student
+    data = None
+    if get_settings().plan_skeletons:
+        data = await plan_from_skeleton(store, selected_career, career_reasoning, academic_year, cache_key)
+    if data is None:
+        data = await generate_full_plan(store, selected_career, career_reasoning, academic_year, cache_key)
+    if data is None:
+        raise ValueError("Could not generate career plan. Please try again.")
+    
+    # Validate once here; cache hits are served as bytes
+    payload = CareerPlanResponse.model_validate(data).model_dump_json().encode("utf-8")
+    handle = BlobStore.get_instance().put_bytes(payload)
+    _plan_cache.set(cache_key, handle)
+    
+    # Try to store the plan in the state store
+    try:
+        store.update_career_plan_payload(payload)
+        store.remember_artifact(memo_key, fingerprint, handle)
+    except Exception as e:
+        print(f"Warning: Could not store career plan: {str(e)}")
+    
+    # Update the selected career
+    try:
+        if hasattr(store, 'select_career'):
+            store.select_career(selected_career)
+    except Exception as e:
+        print(f"Warning: Could not update selected career: {str(e)}")
+    # Counted once, when generated; cache hits are not new plans
+    record_plan(store, selected_career)
+    
+    # Return the plan
+    return handle
+
+
+def parse_plan(text_content: str) -> Optional[Dict[str, Any]]:
+    """Extract and validate a plan from model output; None if it is unusable"""
+    try:
+        # Find JSON content (look for opening and closing braces)
+        json_start = text_content.find('{')
+        json_end = text_content.rfind('}') + 1
+        
+        if json_start >= 0 and json_end > json_start:
+            data = json.loads(text_content[json_start:json_end])
+            
+            # Validate the basic structure
+            if "career" in data and "introduction" in data and "sections" in data:
+                CareerPlanResponse.model_validate(data)
+                for section in data["sections"]:
+                    BudgetController.get_instance().record_section(
+                        PLANNING, section.get("title", ""), len(json.dumps(section)) // 4
+                    )
+                return data
+    except (json.JSONDecodeError, ValidationError) as e:
+        print(f"JSON parsing error: {str(e)}")
+    return None
+
+
+async def generate_full_plan(store, selected_career: str, career_reasoning: str,
+                             academic_year: str, cache_key: tuple) -> Optional[Dict[str, Any]]:
+    """Generate a complete plan for one student in a single call"""
     # Format MBTI type
     mbti_formatted = format_mbti(store.mbti_scores)
     
     # Format goals and interests
     goals_interests_formatted = format_goals_and_interests(getattr(store, "goals_and_interests", {}))
     
-    # Get career reasoning
-    career_reasoning = get_career_reasoning(store, selected_career)
-    
-    # Determine academic year for more specific guidance
-    academic_year = determine_academic_year(store.grade)
+    # Section length guidance from observed plans (empty until warmed up)
+    length_guidance = BudgetController.get_instance().section_guidance(PLANNING)
     
     # Create prompt for Claude with personal, empathetic tone
     prompt = f"""
@@ -267,61 +463,433 @@ async def generate_career_plan(selected_career: str) -> Dict[str, Any]:
     5. Personalized with their name and details throughout
     6. Written in a warm, supportive tone
     
+    {length_guidance}
+    
     This plan will be extremely important for helping {store.name} achieve their career goals, so make it as thoughtful, specific, and helpful as possible.
     """
     
-    # Call Claude
-    response = client.messages.create(
-        model=model,
-        max_tokens=5000,
-        temperature=0,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    # Call Claude (model and max_tokens chosen adaptively)
+    completion = await _plan_flight.run(cache_key, lambda: generate_text(PLANNING, prompt, temperature=0))
+    store.update_served_model(PLANNING, completion.model)
+    metrics.incr("plans.full")
+    return parse_plan(completion.text)
+
+
+# ============================================================
+# Addressable plans
+# ============================================================
+def student_context(store, selected_career: str, career_reasoning: str, academic_year: str) -> str:
+    """The student's situation, as written into outline and section prompts"""
+    return f"""
+    {store.name} is a {academic_year} {store.major} student at {store.college} who wants to pursue a career as a {selected_career}.
+    
+    MBTI Personality: {format_mbti(store.mbti_scores)}
+    
+    Personal priorities: {", ".join(store.priorities)}
+    
+    Goals and Interests:
+    {format_goals_and_interests(getattr(store, "goals_and_interests", {}))}
     
-    # Extract the text content
-    if response.content and len(response.content) > 0:
-        content_block = response.content[0]
-        if hasattr(content_block, 'text'):
-            text_content = content_block.text
-        else:
-            text_content = str(content_block)
+    Information about their college program:
+    {store.web_search_results}
+    
+    Why this career is a good match for them:
+    {career_reasoning}
+    """
+
+
+async def build_plan_outline(selected_career: str, force: bool = False) -> StoredPlan:
+    """
+    Register a plan whose sections are fetched one at a time
+    A complete plan already generated for this profile is reused; otherwise
+    only the outline is generated now and each section on first request
+    
+    Args:
+        selected_career: The career path chosen by the student
+        force: Generate a new outline even if the inputs are unchanged
         
-        # Try to extract JSON from the response
+    Returns:
+        The stored plan
+    """
+    store = StateStore.get_instance()
+    plans = PlanStore.get_instance()
+    if not store.name or not store.college or not store.major:
+        raise ValueError("Basic student information is missing. Please complete the profile first.")
+    
+    career = selected_career.strip().lower()
+    fingerprint = store.input_fingerprint("plan")
+    if not force:
+        plan_id = store.stored_artifact(("plan-outline", career), fingerprint)
+        plan = plans.get(plan_id) if plan_id is not None else None
+        if plan is not None:
+            metrics.incr("memo.hits.plan-outline")
+            return plan
+        # The complete plan is already here: every section is ready
+        full = store.stored_artifact(("plan", career), fingerprint)
+        if full is not None:
+            metrics.incr("memo.hits.plan")
+            return plans.register(BlobStore.get_instance().get_bytes(full))
+    
+    career_reasoning = get_career_reasoning(store, selected_career)
+    academic_year = determine_academic_year(store.grade)
+    context = student_context(store, selected_career, career_reasoning, academic_year)
+    prompt = f"""
+    {context}
+    
+    Outline a personalized career development plan for {store.name}. Include sections on:
+    
+    1. Relevant coursework they should take
+    2. Extracurricular activities they should consider
+    3. Internships, research, or work experiences to pursue
+    4. Skills they should develop
+    5. Networking opportunities and connections to make
+    6. Resources available at {store.college} they should utilize
+    7. How to relax and have fun considering {store.college}'s location/culture and {store.name}'s interests
+    
+    Do not write the steps yet: give each section a title and a one- or two-sentence description.
+    Write the introduction and conclusion in a warm, personal tone, addressing {store.name} directly.
+    
+    Respond with JSON only:
+    {{
+      "career": "{selected_career}",
+      "introduction": "A warm, personalized introduction to the plan...",
+      "sections": [{{"title": "Section title (e.g., 'Coursework')", "description": "Brief description of this section"}}],
+      "conclusion": "Final thoughts and encouragement..."
+    }}
+    """
+    cache_key = ("outline", career, profile_key(store, ARTIFACT_INPUTS["plan"]), digest(career_reasoning))
+    completion = await _plan_flight.run(cache_key, lambda: generate_text(PLAN_SECTION, prompt, temperature=0))
+    text_content = completion.text
+    try:
+        draft = OutlineDraft.model_validate_json(text_content[text_content.find('{'):text_content.rfind('}') + 1])
+    except ValidationError as e:
+        print(f"JSON parsing error: {str(e)}")
+        raise ValueError("Could not generate career plan. Please try again.")
+    store.update_served_model(PLANNING, completion.model)
+    metrics.incr("plans.outlines")
+    
+    plan = plans.register_outline(draft.model_dump(), context)
+    store.remember_artifact(("plan-outline", career), fingerprint, plan.plan_id)
+    store.select_career(selected_career)
+    record_plan(store, selected_career)
+    return plan
+
+
+async def build_plan_section(plan: StoredPlan, index: int) -> BlobHandle:
+    """A section's stored CareerPlanSection bytes, generated on first request"""
+    handle = plan.sections[index]
+    if handle is not None:
+        return handle
+    return await _section_flight.run((plan.plan_id, index), lambda: generate_section(plan, index))
+
+
+async def generate_section(plan: StoredPlan, index: int) -> BlobHandle:
+    """Write the steps of one outline section"""
+    sections = "\n".join(
+        f"{i + 1}. {title}: {plan.descriptions[i]}" for i, title in enumerate(plan.titles)
+    )
+    prompt = f"""
+    {BlobStore.get_instance().get_text(plan.context)}
+    
+    Their career plan has these sections:
+    {sections}
+    
+    Write the steps for section {index + 1}, "{plan.titles[index]}": {plan.descriptions[index]}
+    Give 3 to 5 specific, actionable steps for this student, each with a timeline and helpful resources
+    (real programs and places at their college where you can). Write in a warm, personal tone.
+    
+    Respond with JSON only:
+    {{
+      "steps": [
+        {{
+          "title": "Step title",
+          "description": "Detailed description of what to do",
+          "timeline": "When to complete this step",
+          "resources": ["Resource 1", "Resource 2"]
+        }}
+      ]
+    }}
+    """
+    completion = await generate_text(PLAN_SECTION, prompt, temperature=0)
+    text_content = completion.text
+    try:
+        data = json.loads(text_content[text_content.find('{'):text_content.rfind('}') + 1])
+        section = CareerPlanSection(
+            title=plan.titles[index], description=plan.descriptions[index], steps=data.get("steps") or []
+        )
+        if not section.steps:
+            raise ValueError("the section has no steps")
+    except (ValueError, ValidationError) as e:
+        print(f"Warning: Could not generate plan section ({str(e)})")
+        raise ValueError("Could not generate this section of the plan. Please try again.")
+    metrics.incr("plans.sections_generated")
+    return PlanStore.get_instance().set_section(plan, index, section.model_dump())
+
+
+def stored_plan(plan_id: str) -> StoredPlan:
+    plan = PlanStore.get_instance().get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired plan; create it again with POST /api/career-plan")
+    return plan
+
+# ============================================================
+# Follow-up questions
+# ============================================================
+def plan_text(plan: StoredPlan) -> str:
+    """A stored plan as prompt text: every section, with the steps of those generated so far"""
+    blobs = BlobStore.get_instance()
+    lines = [f"Career: {plan.career}", "", plan.introduction, ""]
+    for i, title in enumerate(plan.titles):
+        lines.append(f"{i + 1}. {title}: {plan.descriptions[i]}")
+        if plan.sections[i] is not None:
+            for j, step in enumerate(blobs.get_json(plan.sections[i])["steps"]):
+                lines.append(f"   {i + 1}.{j + 1} {step['title']} ({step['timeline']}): {step['description']}")
+    lines += ["", plan.conclusion]
+    return "\n".join(lines)
+
+
+def conversation_context(store, plan: StoredPlan) -> str:
+    """The student and their plan, as the cached context of a conversation"""
+    if plan.context is not None:
+        context = BlobStore.get_instance().get_text(plan.context)
+    else:
+        context = student_context(
+            store, plan.career, get_career_reasoning(store, plan.career), determine_academic_year(store.grade)
+        )
+    return f"""{context}
+    Their career plan:
+{plan_text(plan)}
+    """
+
+
+async def answer_question(conversation: Conversation, question: str) -> AsyncIterator[bytes]:
+    """
+    Answer a follow-up question, as NDJSON lines
+    {"text"} lines as the answer is written, then {"done"} with the turn's
+    token counts. The turn is kept only once the answer is complete, and the
+    oldest turns are summarized in the background when there are too many.
+    """
+    async with conversation.lock:
+        if conversation.compacting is not None:
+            # Shielded: a client leaving must not cancel the shared compaction
+            await asyncio.shield(conversation.compacting)
+        stream = stream_text(CONVERSATION, conversation.messages(question), conversation.system(), temperature=0)
+        parts = []
+        async for text in stream:
+            parts.append(text)
+            yield dumps({"text": text}) + b"\n"
+        conversation.add_turn(question, "".join(parts))
+        metrics.incr("conversations.turns")
+        if conversation.needs_compaction():
+            conversation.compacting = asyncio.create_task(compact_conversation(conversation))
+            _background.add(conversation.compacting)
+            conversation.compacting.add_done_callback(_background.discard)
+        yield dumps({"done": {
+            "turn": conversation.turn_count,
+            "stop_reason": stream.stop_reason,
+            "input_tokens": stream.input_tokens + stream.cached_input_tokens + stream.cache_write_tokens,
+            "cached_input_tokens": stream.cached_input_tokens,
+            "output_tokens": stream.output_tokens,
+        }}) + b"\n"
+
+
+async def compact_conversation(conversation: Conversation):
+    """Fold the oldest turns into the running summary (they stay as they are if this fails)"""
+    turns = conversation.oldest_turns()
+    transcript = "\n\n".join(f"Student: {turn.question}\nAdvisor: {turn.answer}" for turn in turns)
+    prompt = f"""
+    Summarize this conversation between a student and their career advisor about the student's career plan.
+    
+    Summary so far:
+    {conversation.summary or "(none)"}
+    
+    Conversation since:
+    {transcript}
+    
+    Write one updated summary of at most 150 words covering both: what the student asked about, what
+    was recommended, and any changes to the plan or preferences they stated. Respond with the summary only.
+    """
+    # Not bound to the request that triggered it
+    with deadline_scope(None):
         try:
-            # Find JSON content (look for opening and closing braces)
-            json_start = text_content.find('{')
-            json_end = text_content.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = text_content[json_start:json_end]
-                data = json.loads(json_content)
-                
-                # Validate the basic structure
-                if "career" in data and "introduction" in data and "sections" in data:
-                    # Try to store the plan in the state store
-                    try:
-                        if hasattr(store, 'update_career_plan'):
-                            store.update_career_plan(data)
-                    except Exception as e:
-                        print(f"Warning: Could not store career plan: {str(e)}")
-                    
-                    # Update the selected career
-                    try:
-                        if hasattr(store, 'select_career'):
-                            store.select_career(selected_career)
-                    except Exception as e:
-                        print(f"Warning: Could not update selected career: {str(e)}")
-                    
-                    # Return the plan
-                    return data
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            # If JSON parsing fails, try to extract in a different way
-            pass
-    
-    # If we couldn't parse JSON or the response doesn't have the expected structure,
-    # return a default response
-    raise ValueError("Could not generate career plan. Please try again.")
+            completion = await generate_text(CONVERSATION, prompt, temperature=0, max_tokens=SUMMARY_MAX_TOKENS)
+        except Exception as e:
+            print(f"Warning: Could not summarize conversation ({str(e)}), keeping the turns")
+            return
+    conversation.fold(turns, completion.text.strip())
+    metrics.incr("conversations.compactions")
+
+# ============================================================
+# Skeletons
+# ============================================================
+async def get_skeleton(selected_career: str, major: str, academic_year: str) -> Skeleton:
+    """The library skeleton for this career, major and year, built on a miss"""
+    library = SkeletonLibrary.get_instance()
+    key = skeleton_key(selected_career, major, academic_year)
+    skeleton, stale = library.get(key)
+    if skeleton is None:
+        return await _skeleton_flight.run(key, lambda: build_skeleton(key, selected_career, major, academic_year))
+    if stale and library.claim_refresh(key):
+        # Serve the stale copy; rebuild behind interactive traffic
+        with lane_scope(BATCH, "plan-skeletons"), deadline_scope(None):
+            task = asyncio.ensure_future(refresh_skeleton(key, selected_career, major, academic_year))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+    return skeleton
+
+
+async def refresh_skeleton(key: tuple, selected_career: str, major: str, academic_year: str):
+    try:
+        await build_skeleton(key, selected_career, major, academic_year)
+    except Exception as e:
+        print(f"Warning: Could not refresh plan skeleton {key}: {str(e)}")
+    finally:
+        SkeletonLibrary.get_instance().release_refresh(key)
+
+
+async def build_skeleton(key: tuple, selected_career: str, major: str, academic_year: str) -> Skeleton:
+    """Generate, validate and store the generic plan for a library key"""
+    length_guidance = BudgetController.get_instance().section_guidance(PLANNING)
+    prompt = f"""
+    Create a career development plan for a typical {academic_year} {major} student who wants to pursue a career as a {selected_career}.
+    This plan is a template shared by many students, so do not use a name or refer to a specific college; describe resources generically (e.g. "your career center").
+    
+    The plan should include sections on:
+    
+    1. Relevant coursework they should take
+    2. Extracurricular activities they should consider
+    3. Internships, research, or work experiences to pursue
+    4. Skills they should develop
+    5. Networking opportunities and connections to make
+    6. Campus resources they should utilize
+    7. How to relax and have fun along the way
+    
+    Focus on what a {academic_year} student can do now and in their remaining time at college. Be specific and actionable.
+    
+    Format your plan as a structured JSON object with the following format:
+    
+    {{
+      "career": "{selected_career}",
+      "introduction": "A short, general introduction to the plan",
+      "sections": [
+        {{
+          "title": "Section title (e.g., 'Coursework')",
+          "description": "Brief description of this section",
+          "steps": [
+            {{
+              "title": "Step title",
+              "description": "Detailed description of what to do",
+              "timeline": "When to complete this step",
+              "resources": ["Resource 1", "Resource 2", ...]
+            }}
+          ]
+        }}
+      ],
+      "conclusion": "A short, general conclusion"
+    }}
+    
+    {length_guidance}
+    """
+    completion = await generate_text(PLANNING, prompt, temperature=0)
+    data = parse_plan(completion.text)
+    if data is None:
+        raise ValueError("Could not generate career plan. Please try again.")
+    payload = CareerPlanResponse.model_validate(data).model_dump_json().encode("utf-8")
+    metrics.incr("plans.skeletons_built")
+    return SkeletonLibrary.get_instance().put(key, payload, completion.model)
+
+
+def outline(skeleton_plan: Dict[str, Any]) -> str:
+    """Numbered section and step titles of a skeleton, for the personalization prompt"""
+    lines = []
+    for i, section in enumerate(skeleton_plan["sections"], 1):
+        lines.append(f"{i}. {section['title']}")
+        for j, step in enumerate(section["steps"], 1):
+            lines.append(f"   {i}.{j} {step['title']} ({step['timeline']})")
+    return "\n".join(lines)
+
+
+def apply_personalization(skeleton_plan: Dict[str, Any], selected_career: str,
+                          personal: Personalization) -> Dict[str, Any]:
+    """Merge the personal introduction, conclusion, notes and resources into a copy of the skeleton"""
+    plan = json.loads(json.dumps(skeleton_plan))
+    plan["career"] = selected_career
+    plan["introduction"] = personal.introduction
+    plan["conclusion"] = personal.conclusion
+    
+    steps = {
+        f"{i}.{j}": step
+        for i, section in enumerate(plan["sections"], 1)
+        for j, step in enumerate(section["steps"], 1)
+    }
+    for touch in personal.touches:
+        step = steps.get(str(touch.step).strip())
+        if step is not None and touch.note:
+            step["description"] = f"{step['description']} {touch.note}"
+    for extra in personal.resources:
+        step = steps.get(str(extra.step).strip())
+        if step is not None and extra.resource:
+            step["resources"] = (step.get("resources") or []) + [extra.resource]
+    return plan
+
+
+async def plan_from_skeleton(store, selected_career: str, career_reasoning: str,
+                             academic_year: str, cache_key: tuple) -> Optional[Dict[str, Any]]:
+    """
+    Personalize the shared skeleton with one small call
+    Returns None (full generation takes over) if the personalization is unusable
+    """
+    try:
+        skeleton = await get_skeleton(selected_career, store.major, academic_year)
+    except ValueError as e:
+        print(f"Warning: No plan skeleton ({str(e)}), generating the full plan")
+        return None
+    skeleton_plan = SkeletonLibrary.get_instance().load(skeleton)
+    
+    prompt = f"""
+    Personalize this career plan for {store.name}, a {academic_year} {store.major} student at {store.college} who wants to become a {selected_career}.
+    
+    MBTI Personality: {format_mbti(store.mbti_scores)}
+    Personal priorities: {", ".join(store.priorities)}
+    {format_goals_and_interests(getattr(store, "goals_and_interests", {}))}
+    
+    Why this career is a good match for them:
+    {career_reasoning}
+    
+    Information about their college program:
+    {store.web_search_results}
+    
+    Plan outline (the steps are already written):
+    {outline(skeleton_plan)}
+    
+    Write, in a warm, personal tone addressing {store.name} directly:
+    - "introduction": a personalized introduction to the plan
+    - "conclusion": final thoughts and encouragement
+    - "touches": up to 8 notes of one or two sentences, each tying a step to {store.name}'s situation, interests or priorities
+    - "resources": up to 6 specific {store.college} resources, programs or places (including somewhere to relax and have fun), each attached to a step
+    
+    Respond with JSON only:
+    {{
+      "introduction": "...",
+      "conclusion": "...",
+      "touches": [{{"step": "1.2", "note": "..."}}],
+      "resources": [{{"step": "6.1", "resource": "..."}}]
+    }}
+    """
+    completion = await _plan_flight.run(
+        ("personalize",) + cache_key,
+        lambda: generate_text(PERSONALIZATION, prompt, temperature=0),
+    )
+    text_content = completion.text
+    try:
+        personal = Personalization.model_validate_json(text_content[text_content.find('{'):text_content.rfind('}') + 1])
+    except ValidationError as e:
+        print(f"Warning: Could not personalize plan skeleton ({str(e)}), generating the full plan")
+        return None
+    
+    store.update_served_model(PLANNING, completion.model)
+    metrics.incr("plans.from_skeleton")
+    return apply_personalization(skeleton_plan, selected_career, personal)
 
 # ============================================================
 # FastAPI Router
@@ -329,10 +897,18 @@ async def generate_career_plan(selected_career: str) -> Dict[str, Any]:
 router = APIRouter(prefix="/api", tags=["planning"])
 
 @router.post("/career-plan", response_model=CareerPlanResponse)
-async def get_career_plan(request: CareerPlanRequest) -> Dict[str, Any]:
+async def get_career_plan(
+    request: CareerPlanRequest,
+    http_request: Request,
+    force: bool = Query(False, description="Regenerate even if the profile is unchanged"),
+):
     """
     API endpoint to generate a personalized career development plan
     Uses the state store to access the complete student profile
+    The plan is served from its pre-validated bytes; revisiting a career with
+    an unchanged profile gets its stored plan back without a model call
+    The X-Plan-Id header addresses the plan at /api/career-plan/{plan_id}
+    Cancelled when the client disconnects or the request deadline passes
     """
     try:
         # Get the state store instance
@@ -342,11 +918,17 @@ async def get_career_plan(request: CareerPlanRequest) -> Dict[str, Any]:
         print(f"Planning agent accessing StateStore instance: {store.get_instance_id()}")
         
         # Generate the career plan
-        plan = await generate_career_plan(request.career)
+        handle = await guard(http_request, build_career_plan(request.career, force), "career-plan")
+        payload = BlobStore.get_instance().get_bytes(handle)
+        plan = PlanStore.get_instance().register(payload)
         
         # Return the plan
-        return plan
+        response = payload_response(http_request, payload, cache_key=handle)
+        response.headers[PLAN_ID_HEADER] = plan.plan_id
+        return response
         
+    except HTTPException:
+        raise
     except ValueError as e:
         # Handle expected errors
         raise HTTPException(status_code=400, detail=str(e))
@@ -354,6 +936,106 @@ async def get_career_plan(request: CareerPlanRequest) -> Dict[str, Any]:
         # Handle unexpected errors
         raise HTTPException(status_code=500, detail=f"Error generating career plan: {str(e)}")
 
+@router.post("/career-plan/outline", response_model=PlanOutline)
+async def create_plan_outline(
+    request: CareerPlanRequest,
+    http_request: Request,
+    force: bool = Query(False, description="Regenerate even if the profile is unchanged"),
+):
+    """
+    API endpoint to start a plan whose sections are fetched one at a time
+    Returns the outline; GET /api/career-plan/{plan_id}/sections/{index}
+    returns a section's steps, generating them on first request
+    """
+    try:
+        store = StateStore.get_instance()
+        print(f"Planning agent accessing StateStore instance: {store.get_instance_id()}")
+        
+        plan = await guard(http_request, build_plan_outline(request.career, force), "career-plan")
+        response = payload_response(http_request, dumps(plan.outline()), etag=plan.etag(),
+                                    cache_control=OUTLINE_CACHE_CONTROL)
+        response.headers[PLAN_ID_HEADER] = plan.plan_id
+        return response
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating career plan: {str(e)}")
+
+@router.get("/career-plan/{plan_id}", response_model=PlanOutline)
+async def get_plan_outline(plan_id: str, http_request: Request):
+    """
+    API endpoint for a stored plan's outline: introduction, section titles
+    and descriptions, conclusion. 304 when If-None-Match is current.
+    """
+    plan = stored_plan(plan_id)
+    return payload_response(http_request, dumps(plan.outline()), etag=plan.etag(),
+                            cache_control=OUTLINE_CACHE_CONTROL)
+
+@router.get("/career-plan/{plan_id}/sections/{index}", response_model=CareerPlanSection)
+async def get_plan_section(plan_id: str, index: int, http_request: Request):
+    """
+    API endpoint for one section of a stored plan, with its steps
+    Generated on first request for plans created from an outline; stored
+    sections never change, so If-None-Match gets a 304
+    """
+    try:
+        plan = stored_plan(plan_id)
+        if not 0 <= index < len(plan.sections):
+            raise HTTPException(status_code=404, detail=f"The plan has {len(plan.sections)} sections")
+        etag = plan.section_etag(index)
+        if plan.sections[index] is not None and etag_matches(http_request, etag):
+            metrics.incr("plans.sections_not_modified")
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": SECTION_CACHE_CONTROL})
+        
+        handle = await guard(http_request, build_plan_section(plan, index), "career-plan")
+        return payload_response(http_request, BlobStore.get_instance().get_bytes(handle), cache_key=handle,
+                                etag=etag, cache_control=SECTION_CACHE_CONTROL)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating plan section: {str(e)}")
+
+@router.post("/career-plan/{plan_id}/ask")
+async def ask_about_plan(plan_id: str, request: PlanQuestion, http_request: Request):
+    """
+    API endpoint for follow-up questions about a stored plan, streamed as
+    newline-delimited JSON: {"text"} lines as the answer is written, then
+    {"done"} with the turn number and its token counts (or {"error"}).
+    Questions from one session (X-Session-Id) continue one conversation per
+    plan; the profile, web search summary and plan are sent as a cached
+    prompt prefix and older turns are summarized.
+    """
+    plan = stored_plan(plan_id)
+    store = StateStore.get_instance()
+    print(f"Planning agent accessing StateStore instance: {store.get_instance_id()}")
+    
+    session = request_session(http_request)
+    conversation = ConversationStore.get_instance().get_or_start(
+        session, plan_id, lambda: conversation_context(store, plan)
+    )
+    budget = request_budget(http_request, "career-plan")
+    
+    async def lines():
+        # Stops (and cancels the upstream stream) when the client disconnects
+        with deadline_scope(budget), session_scope(session):
+            try:
+                async for line in answer_question(conversation, request.question):
+                    yield line
+            except DeadlineExceeded:
+                metrics.incr("requests.deadline_exceeded.career-plan")
+                yield dumps({"error": "The answer took too long. Please try again."}) + b"\n"
+            except Exception as e:
+                print(f"Error answering question: {str(e)}")
+                yield dumps({"error": "Could not answer the question. Please try again."}) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # ============================================================
 # Initialize Test Data
 # ============================================================
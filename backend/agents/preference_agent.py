@@ -5,30 +5,36 @@ Handles MBTI scores, priorities, and goals/interests
 import os
 import sys
 import asyncio
+import time
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
-from anthropic import Anthropic
-from dotenv import load_dotenv
 
 # Fix import path for state_store and constants
-# This allows the file to be run directly and also imported as a module
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from state_store import StateStore
-
-
-# Load environment variables
-load_dotenv()
+# Only needed when the file is run directly; as a module backend/ is on the path
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import ARTIFACT_INPUTS, StateStore
+import metrics
+import profiler
+from cache import ResultCache
+from deadlines import deadline_scope
+from model_router import ModelRouter
+from plan_skeletons import SkeletonLibrary
+from scheduler import BATCH, UpstreamScheduler, lane_scope, request_session
+from settings import get_settings
+from token_budget import BudgetController
 
 # ============================================================
 # Models
 # ============================================================
 class MBTIScores(BaseModel):
     """MBTI scores for each dimension"""
-    ei: int = Field(..., description="Extraversion/Introversion score (0-100)")
-    sn: int = Field(..., description="Sensing/Intuition score (0-100)")
-    tf: int = Field(..., description="Thinking/Feeling score (0-100)")
-    jp: int = Field(..., description="Judging/Perceiving score (0-100)")
+    ei: int = Field(..., ge=0, le=100, description="Extraversion/Introversion score (0-100)")
+    sn: int = Field(..., ge=0, le=100, description="Sensing/Intuition score (0-100)")
+    tf: int = Field(..., ge=0, le=100, description="Thinking/Feeling score (0-100)")
+    jp: int = Field(..., ge=0, le=100, description="Judging/Perceiving score (0-100)")
 
 class MBTIUpdateRequest(BaseModel):
     """Request to update MBTI scores"""
@@ -66,17 +72,149 @@ class ProfileResponse(BaseModel):
     priorities: List[str] = Field(..., description="List of priorities")
     goals_and_interests: Dict[str, Any] = Field({}, description="Goals and interests data")
     has_web_search_results: bool = Field(..., description="Whether web search results exist")
+    versions: Dict[str, int] = Field({}, description="Version of each profile field (0 = never set)")
+
+class ProfilePatchRequest(BaseModel):
+    """Any subset of the profile fields, applied together"""
+    name: Optional[str] = Field(None, description="Student's name")
+    college: Optional[str] = Field(None, description="College name")
+    major: Optional[str] = Field(None, description="Major")
+    grade: Optional[str] = Field(None, description="Academic year")
+    gender: Optional[str] = Field(None, description="Gender")
+    mbti_scores: Optional[MBTIScores] = Field(None, description="MBTI scores (0-100)")
+    priorities: Optional[List[str]] = Field(None, description="3 to 7 career priorities")
+    goals_and_interests: Optional[GoalsAndInterestsRequest] = Field(None, description="Goals and interests")
+    base_versions: Optional[Dict[str, int]] = Field(
+        None, description="Versions the client last saw; the patch is refused (409) if any of these fields changed since"
+    )
+
+class ProfilePatchResponse(ProfileResponse):
+    """Profile after a patch, with what changed and the work it started"""
+    changed: List[str] = Field(..., description="Fields whose value actually changed")
+    triggered: List[str] = Field(..., description="Background work started by the change (websearch, reasoning)")
 
 class NameUpdateRequest(BaseModel):
     """Request to update student name"""
     name: str = Field(..., description="Student's full name")
 
+# ============================================================
+# Downstream work
+# ============================================================
+# Inputs of the web search and of the recommendations
+SEARCH_FIELDS = set(ARTIFACT_INPUTS["websearch"])
+REASONING_FIELDS = set(ARTIFACT_INPUTS["reasoning"])
+
+# The running background refresh; a newer patch supersedes it
+_downstream: Optional[asyncio.Task] = None
+
+
+def profile_complete(store) -> bool:
+    """Whether recommendations can be made for the profile"""
+    return bool(store.name and store.college and store.major and len(store.priorities) >= 3)
+
+
+def schedule_downstream(store, changed: List[str], session: str) -> List[str]:
+    """
+    Start the background work made stale by a profile change
+    
+    Returns:
+        What was started ("websearch", "reasoning")
+    """
+    global _downstream
+    search = bool(SEARCH_FIELDS.intersection(changed)) and bool(store.college and store.major)
+    reason = (
+        get_settings().speculative_reasoning
+        and bool(REASONING_FIELDS.intersection(changed))
+        and profile_complete(store)
+    )
+    if not (search or reason):
+        return []
+    
+    # A newer profile makes the previous refresh pointless (a search already
+    # under way still finishes and is cached for everyone)
+    if _downstream is not None and not _downstream.done():
+        _downstream.cancel()
+        metrics.incr("profile.downstream_superseded")
+    
+    # Background work yields to interactive requests and has no request deadline
+    with lane_scope(BATCH, session), deadline_scope(None):
+        _downstream = asyncio.ensure_future(refresh_downstream(store, search, reason))
+    return [name for name, started in (("websearch", search), ("reasoning", reason)) if started]
+
+
+async def refresh_downstream(store, search: bool, reason: bool):
+    """Refresh the web search summary and warm the recommendations cache"""
+    from agents.reasoning_agent import build_reasoning, cached_reasoning
+    from agents.web_search_agent import search_sections, store_web_search
+    
+    try:
+        if search:
+            fingerprint = store.input_fingerprint("websearch")
+            sections = await search_sections(store.college, store.major)
+            # Only store it if the student has not moved on to another college/major
+            if store.input_fingerprint("websearch") == fingerprint:
+                store_web_search(store, fingerprint, sections)
+                metrics.incr("profile.speculative_websearch")
+        
+        if reason and get_settings().speculative_reasoning:
+            # Wait for the wizard to settle; a newer patch cancels this task
+            await asyncio.sleep(get_settings().speculative_delay_seconds)
+            if profile_complete(store) and cached_reasoning(store) is None:
+                await build_reasoning()
+                metrics.incr("profile.speculative_reasoning")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Warning: background profile refresh failed: {str(e)}")
+
 # ============================================================
 # FastAPI Router
 # ============================================================
 router = APIRouter(prefix="/api", tags=["preferences"])
 
 
+def profile_response(store) -> Dict[str, Any]:
+    """The current profile state as a ProfileResponse dict"""
+    return {
+        "name": store.name,
+        "college": store.college,
+        "major": store.major,
+        "grade": store.grade,
+        "gender": store.gender,
+        "mbti_scores": store.mbti_scores,
+        "priorities": store.priorities,
+        "goals_and_interests": getattr(store, "goals_and_interests", {}),
+        "has_web_search_results": bool(store.web_search_results),
+        "versions": store.versions(),
+    }
+
+
+def validate_priorities(priorities: List[str]):
+    """Require 3 to 7 priorities"""
+    if len(priorities) < 3:
+        raise HTTPException(
+            status_code=400,
+            detail="At least 3 priorities must be specified"
+        )
+    
+    if len(priorities) > 7:
+        raise HTTPException(
+            status_code=400,
+            detail="Too many priorities specified (maximum 7)"
+        )
+
+
+def goals_data(request: GoalsAndInterestsRequest) -> Dict[str, Any]:
+    """Goals and interests as stored; goals only count when the student knows them"""
+    return {
+        "knowsGoals": request.knowsGoals,
+        "goalType": request.goalType if request.knowsGoals else None,
+        "goals": request.goals if request.knowsGoals else None,
+        "interests": request.interests,
+        "skills": request.skills
+    }
+
+
 @router.post("/mbti", response_model=MBTIUpdateResponse)
 async def update_mbti_scores(request: MBTIUpdateRequest) -> Dict[str, Any]:
     """
@@ -123,34 +261,14 @@ async def update_priorities(request: PrioritiesUpdateRequest) -> Dict[str, Any]:
     """
     try:
         # Validate the priorities (ensure there are at least 3 and at most 7)
-        if len(request.priorities) < 3:
-            raise HTTPException(
-                status_code=400,
-                detail="At least 3 priorities must be specified"
-            )
-        
-        if len(request.priorities) > 7:
-            raise HTTPException(
-                status_code=400,
-                detail="Too many priorities specified (maximum 7)"
-            )
+        validate_priorities(request.priorities)
         
         # Update the state store
         store = StateStore.get_instance()
         store.update_priorities(request.priorities)
         
         # Return the current profile state
-        return {
-            "name": store.name,
-            "college": store.college,
-            "major": store.major,
-            "grade": store.grade,
-            "gender": store.gender,
-            "mbti_scores": store.mbti_scores,
-            "priorities": store.priorities,
-            "goals_and_interests": getattr(store, "goals_and_interests", {}),
-            "has_web_search_results": bool(store.web_search_results)
-        }
+        return profile_response(store)
         
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -173,21 +291,12 @@ async def update_goals_interests(request: GoalsAndInterestsRequest) -> Dict[str,
         # Log which agent is accessing the state store
         print(f"Preference agent accessing StateStore instance: {store.get_instance_id()}")
         
-        # Prepare the goals and interests data
-        goals_data = {
-            "knowsGoals": request.knowsGoals,
-            "goalType": request.goalType if request.knowsGoals else None,
-            "goals": request.goals if request.knowsGoals else None,
-            "interests": request.interests,
-            "skills": request.skills
-        }
-        
         # Update the state store
-        store.goals_and_interests = goals_data
+        store.goals_and_interests = goals_data(request)
         
         # Return the updated data
         return {
-            "goals_and_interests": goals_data
+            "goals_and_interests": store.goals_and_interests
         }
         
     except Exception as e:
@@ -203,23 +312,67 @@ async def get_profile() -> Dict[str, Any]:
     try:
         store = StateStore.get_instance()
         
-        return {
-            "name": store.name,
-            "college": store.college,
-            "major": store.major,
-            "grade": store.grade,
-            "gender": store.gender,
-            "mbti_scores": store.mbti_scores,
-            "priorities": store.priorities,
-            "goals_and_interests": getattr(store, "goals_and_interests", {}),
-            "has_web_search_results": bool(store.web_search_results)
-        }
+        return profile_response(store)
         
     except Exception as e:
         # Handle unexpected errors
         raise HTTPException(status_code=500, detail=f"Error retrieving profile: {str(e)}")
 
 
+@router.patch("/profile", response_model=ProfilePatchResponse)
+async def patch_profile(request: ProfilePatchRequest, http_request: Request) -> Dict[str, Any]:
+    """
+    API endpoint to update any subset of the profile in one request
+    Replaces the wizard's separate update calls. All fields are applied
+    together or not at all; only fields whose value changed get a new
+    version, and downstream work (web search, speculative reasoning) is
+    started only when its inputs changed
+    """
+    try:
+        # Get the state store instance
+        store = StateStore.get_instance()
+        
+        # Log which agent is accessing the state store
+        print(f"Preference agent accessing StateStore instance: {store.get_instance_id()}")
+        
+        # Collect the fields that were sent
+        changes: Dict[str, Any] = request.model_dump(
+            include={"name", "college", "major", "grade", "gender", "priorities"}, exclude_none=True
+        )
+        if request.mbti_scores is not None:
+            changes["mbti_scores"] = request.mbti_scores.model_dump()
+        if request.goals_and_interests is not None:
+            changes["goals_and_interests"] = goals_data(request.goals_and_interests)
+        if "priorities" in changes:
+            validate_priorities(changes["priorities"])
+        
+        # Optimistic concurrency: refuse if a field changed since the client read it
+        if request.base_versions:
+            versions = store.versions()
+            stale = sorted(
+                field for field, version in request.base_versions.items()
+                if field in changes and versions.get(field, 0) != version
+            )
+            if stale:
+                raise HTTPException(status_code=409, detail=f"Profile fields changed since read: {', '.join(stale)}")
+        
+        # Apply everything at once (no await in between)
+        changed = store.apply_profile(changes)
+        metrics.incr("profile.patches" if changed else "profile.patches_unchanged")
+        triggered = schedule_downstream(store, changed, request_session(http_request))
+        
+        return {**profile_response(store), "changed": changed, "triggered": triggered}
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        # Handle expected errors
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        # Handle unexpected errors
+        raise HTTPException(status_code=500, detail=f"Error updating profile: {str(e)}")
+
+
 @router.post("/update-name", response_model=ProfileResponse)
 async def update_name(request: NameUpdateRequest) -> Dict[str, Any]:
     """
@@ -243,17 +396,7 @@ async def update_name(request: NameUpdateRequest) -> Dict[str, Any]:
         )
         
         # Return the current profile state
-        return {
-            "name": store.name,
-            "college": store.college,
-            "major": store.major,
-            "grade": store.grade,
-            "gender": store.gender,
-            "mbti_scores": store.mbti_scores,
-            "priorities": store.priorities,
-            "goals_and_interests": getattr(store, "goals_and_interests", {}),
-            "has_web_search_results": bool(store.web_search_results)
-        }
+        return profile_response(store)
         
     except Exception as e:
         # Handle unexpected errors
@@ -297,12 +440,67 @@ async def debug_state():
                 "priorities": store.priorities,
                 "goals_and_interests": getattr(store, "goals_and_interests", {}),
                 "web_search_results": store.web_search_results
-            }
+            },
+            "served_models": store.served_models,
+            "model_routing": ModelRouter.get_instance().stats()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving state: {str(e)}")
 
 
+@router.get("/debug/metrics")
+async def debug_metrics():
+    """
+    Debug endpoint with counters, token budgets, cache hit rates, the
+    upstream scheduler queues and the reasoning batcher's current window
+    """
+    from agents.reasoning_agent import reasoning_batcher
+    batcher = reasoning_batcher()
+    return {
+        "counters": metrics.snapshot(),
+        "token_budgets": BudgetController.get_instance().stats(),
+        "caches": ResultCache.all_stats(),
+        "upstream": UpstreamScheduler.get_instance().stats(),
+        "plan_skeletons": SkeletonLibrary.get_instance().stats(),
+        "reasoning_batching": batcher.stats() if batcher is not None else None,
+    }
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    http_request: Request,
+    seconds: float = Query(10, gt=0, le=60, description="How long to sample the live process"),
+):
+    """
+    Debug endpoint sampling the live process for a few seconds
+    Returns collapsed stacks (flamegraph.pl / speedscope input); requires
+    the X-Admin-Token header
+    """
+    profiler.require_admin(http_request)
+    interval = get_settings().profile_interval_ms / 1000
+    collapsed, samples = await profiler.profile_for(seconds, interval)
+    return PlainTextResponse(
+        collapsed,
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{int(time.time())}.folded"',
+            "X-Profile-Samples": str(samples),
+        },
+    )
+
+
+@router.get("/debug/slow-requests")
+async def debug_slow_requests(http_request: Request):
+    """
+    Debug endpoint with the collapsed stacks of the most recent requests
+    slower than SLOW_REQUEST_MS; requires the X-Admin-Token header
+    """
+    profiler.require_admin(http_request)
+    return {
+        "threshold_ms": get_settings().slow_request_ms,
+        "requests": list(reversed(profiler.slow_profiles)),
+    }
+
+
 # ============================================================
 # Standalone Test Function
 # ============================================================
@@ -6,19 +6,28 @@ import os
 import sys
 import asyncio
 import json
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-from anthropic import Anthropic
-from dotenv import load_dotenv
+import re
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field, ValidationError
 
 # Fix import path for state_store
-# This allows the file to be run directly and also imported as a module
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from state_store import StateStore
-
-# Load environment variables
-load_dotenv()
+# Only needed when the file is run directly; as a module backend/ is on the path
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from state_store import ARTIFACT_INPUTS, StateStore
+from analytics import record_recommendations
+from batching import MicroBatcher
+from blob_store import BlobHandle, BlobStore
+from cache import ResultCache, SingleFlight, profile_key
+from deadlines import guard
+from responses import payload_response
+import metrics
+from career_catalog import CareerCatalog, catalog_recommendations, profile_from_store
+from llm import Completion, generate_text, should_fall_back
+from model_router import REASONING, REASONING_BATCH
+from settings import get_settings
+from token_budget import CEILING, BudgetController
 
 # ============================================================
 # Models
@@ -40,11 +49,122 @@ class CareerRecommendation(BaseModel):
 class ReasoningResponse(BaseModel):
     """Response from the reasoning agent"""
     recommendations: List[CareerRecommendation] = Field(..., description="List of career recommendations")
+    degraded: bool = Field(False, description="True when ranked by the local catalog only (model unavailable)")
+
+
+# ============================================================
+# Cache
+# ============================================================
+# Keyed on a digest of the profile (canonical college/major); values are
+# blob handles of the validated ReasoningResponse bytes
+_reasoning_cache = ResultCache(
+    "reasoning",
+    maxsize=4096,
+    ttl_seconds=get_settings().reasoning_cache_ttl,
+)
+
+# Identical concurrent requests share one model call; it is cancelled once
+# every requester has gone (each profile's result is only useful to itself)
+_reasoning_flight = SingleFlight("reasoning")
 
+# Concurrent requests packed into shared upstream calls (see batching.py);
+# created on first use when REASONING_BATCH_WINDOW_MS is set
+_reasoning_batcher = None
+
+# Catalog candidates the model chooses from
+CANDIDATES = 8
 
 # ============================================================
 # Helper Functions
 # ============================================================
+def store_reasoning(store, payload: bytes):
+    """Save reasoning (ReasoningResponse JSON bytes) and the derived career options; returns the recommendations"""
+    recommendations = json.loads(payload)["recommendations"]
+    store.update_career_reasoning_payload(payload)
+    store.update_career_options([
+        {"name": rec["career"], "score": rec["score"]}
+        for rec in recommendations
+    ])
+    return recommendations
+
+
+# Instructions and output format: the same for every student, so a batch
+# of students shares one copy
+RECOMMENDATION_RULES = """Pick the 5 best for the student (you may swap in one career that is not listed
+    if it is clearly better), adjust each match score, and give 3 concise reasons
+    per career, one or two sentences each."""
+
+RESPONSE_FORMAT = """{
+      "recommendations": [
+        {
+          "career": "Career Title",
+          "score": 85,
+          "description": "One-sentence description",
+          "reasons": [{"strength": "Short label", "explanation": "Why it fits"}]
+        }
+      ]
+    }"""
+
+# Line starting each student's part of a batched prompt and response
+BATCH_DELIMITER = "### STUDENT"
+
+
+def student_profile(store, candidates) -> str:
+    """The per-student part of the reasoning prompt: profile and catalog candidates"""
+    candidate_lines = "\n".join(
+        f"{i}. {c.name} (fit {c.score}): {c.description}" for i, c in enumerate(candidates, 1)
+    )
+    return f"""College: {store.college}
+    Major: {store.major}
+    Year: {store.grade}
+    MBTI: {format_mbti(store.mbti_scores)}
+    Priorities: {", ".join(store.priorities)}
+    {format_goals_and_interests(getattr(store, "goals_and_interests", {}))}
+    
+    Candidates from our career catalog, ranked by a fit score (0-100):
+    {candidate_lines}"""
+
+
+def build_candidate_prompt(profile: str) -> str:
+    """Short prompt asking the model to pick, rescore and explain one student's catalog candidates"""
+    return f"""
+    Recommend careers for this student.
+    
+    {profile}
+    
+    {RECOMMENDATION_RULES}
+    
+    Respond with JSON only:
+    {RESPONSE_FORMAT}
+    """
+
+
+def build_batch_prompt(profiles: List[str]) -> str:
+    """One prompt for several students, answered in delimited parts"""
+    students = "\n\n    ".join(f"{BATCH_DELIMITER} {i}\n    {profile}" for i, profile in enumerate(profiles, 1))
+    return f"""
+    Recommend careers for each of these {len(profiles)} students, independently of each other.
+    
+    {students}
+    
+    For each student: {RECOMMENDATION_RULES}
+    
+    For each student in order, write the line "{BATCH_DELIMITER} <number>" and then that student's JSON only:
+    {RESPONSE_FORMAT}
+    """
+
+
+def split_batch(text: str, count: int) -> List[Optional[str]]:
+    """Each student's part of a batched response; None where it is missing or unusable"""
+    parts: List[Optional[str]] = [None] * count
+    pieces = re.split(rf"^\s*{re.escape(BATCH_DELIMITER)} (\d+)\s*$", text, flags=re.MULTILINE)
+    for number, body in zip(pieces[1::2], pieces[2::2]):
+        index = int(number) - 1
+        if 0 <= index < count and parts[index] is None and parse_reasoning(body) is not None:
+            parts[index] = body
+    return parts
+
+
 def format_mbti(scores):
     """Format MBTI scores as a type string with percentages"""
     mbti_type = ""
@@ -138,12 +258,48 @@ def format_goals_and_interests(goals_data):
 # ============================================================
 # Core Logic (Independent of FastAPI)
 # ============================================================
-async def analyze_student_profile() -> List[Dict[str, Any]]:
+def require_basic_info(store):
+    """Refuse to reason about a profile without its basic info"""
+    # Check if basic info is missing - we shouldn't proceed without it
+    if not store.name or not store.college or not store.major:
+        raise ValueError("Basic student information is missing. Please complete the profile first.")
+
+
+def reasoning_key(store) -> Tuple[str, str]:
+    """Cache key of the store's profile; the profile must have its basic info"""
+    require_basic_info(store)
+    return ("reasoning", profile_key(store, ARTIFACT_INPUTS["reasoning"]))
+
+
+def cached_reasoning(store) -> Optional[BlobHandle]:
     """
-    Analyze the student profile to recommend careers with detailed reasoning
+    Handle of the recommendations for an unchanged profile, or None
+    The session's own result is reused while none of its inputs moved;
+    otherwise a shared cache hit is stored in the session
+    """
+    require_basic_info(store)
+    fingerprint = store.input_fingerprint("reasoning")
+    stored = store.stored_artifact("reasoning", fingerprint)
+    if stored is not None:
+        metrics.incr("memo.hits.reasoning")
+        return stored
+    cached = _reasoning_cache.get(reasoning_key(store))
+    if cached is not None:
+        store_reasoning(store, BlobStore.get_instance().get_bytes(cached))
+        store.remember_artifact("reasoning", fingerprint, cached)
+    return cached
+
+
+async def build_reasoning(force: bool = False) -> BlobHandle:
+    """
+    Generate (or reuse) career recommendations and store them validated and serialized
+    The one reasoning path: the endpoint, the CLI and background jobs all use it
     
+    Args:
+        force: Ask the model again even if the inputs are unchanged
+        
     Returns:
-        List of career recommendations with reasons
+        Blob handle of the ReasoningResponse JSON bytes
     """
     # Get the state store
     store = StateStore.get_instance()
@@ -154,149 +310,149 @@ async def analyze_student_profile() -> List[Dict[str, Any]]:
     print(f"DEBUG: Major: {store.major}")
     print(f"DEBUG: Grade: {store.grade}")
     
-    # Check if basic info is missing - we shouldn't proceed without it
-    if not store.name or not store.college or not store.major:
-        raise ValueError("Basic student information is missing. Please complete the profile first.")
-    
-    # Check for API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-    
-    # Initialize Anthropic client
-    client = Anthropic(api_key=api_key)
-    model = os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet-20250219")
-    
-    # Format MBTI type
-    mbti_formatted = format_mbti(store.mbti_scores)
-    mbti_description = get_mbti_description(store.mbti_scores)
-    
-    # Format goals and interests
-    goals_interests_formatted = format_goals_and_interests(getattr(store, "goals_and_interests", {}))
-    
-    # Create prompt for Claude with explicit major info
-    prompt = f"""
-    I need detailed career recommendations with specific reasoning for a student with the following profile:
-    
-    Name: {store.name}
-    College: {store.college}
-    Major: {store.major}
-    Year: {store.grade}
-    
-    MBTI Type: {mbti_formatted}
-    MBTI Description: {mbti_description}
-    
-    Personal priorities: {", ".join(store.priorities)}
-    
-    Goals and Interests:
-    {goals_interests_formatted}
-    
-    Here's some information about the degree program and resources at their college:
-    
-    {store.web_search_results}
-    
-    Please analyze this profile deeply and recommend 4-5 specific career paths that would be excellent matches.
-    The student is majoring in {store.major} at {store.college}, so make sure to consider this
-    academic background in your recommendations.
-    
-    For each career recommendation:
-    
-    1. Provide a match score from 0-100
-    2. Give 3-4 specific reasons why this career would be a strong match, with detailed explanations for each reason
-    3. Consider alignment with:
-       - Their MBTI personality traits
-       - Their stated priorities
-       - Their college major ({store.major})
-       - Their goals, interests, and natural talents
-       - Available resources and strengths of their specific college
-       - Current and future job market prospects
-    
-    Format your response as a structured JSON object with the following format:
-    
-    {{
-      "recommendations": [
-        {{
-          "career": "Career Title",
-          "score": score_number,
-          "description": "Brief description of the career",
-          "reasons": [
-            {{
-              "strength": "A specific strength or reason",
-              "explanation": "Detailed explanation of why this is a good match"
-            }},
-            // more reasons...
-          ]
-        }},
-        // more recommendations...
-      ]
-    }}
-    
-    IMPORTANT: The student's major is {store.major}, so make sure your recommendations align with this academic background.
-    Ensure your reasoning is detailed, specific to this student, and shows deep analytical thinking about career fit.
-    """
-    
-    # Print the prompt for debugging
-    print(f"DEBUG: Prompt includes major: {store.major}")
+    # An unchanged profile reuses the previous recommendations
+    if force:
+        metrics.incr("memo.forced.reasoning")
+    else:
+        cached = cached_reasoning(store)
+        if cached is not None:
+            return cached
+    cache_key = reasoning_key(store)
+    # Taken before the model call: edits made meanwhile make the result stale
+    fingerprint = store.input_fingerprint("reasoning")
+    
+    # Rank the catalog locally; the model explains and refines the top candidates
+    profile = profile_from_store(store)
+    candidates = CareerCatalog.get_instance().rank(profile, CANDIDATES)
+    profile_text = student_profile(store, candidates)
+    
+    # Call Claude (model and max_tokens chosen adaptively)
+    try:
+        completion = await _reasoning_flight.run(cache_key, lambda: reasoning_completion(profile_text))
+    except Exception as e:
+        if not should_fall_back(e):
+            raise
+        # Upstream unavailable: answer from the catalog (not cached, so the
+        # next request tries the model again)
+        print(f"Warning: reasoning upstream unavailable ({str(e)}), answering from the catalog")
+        metrics.incr("reasoning.degraded")
+        data = catalog_recommendations(profile)
+        data["degraded"] = True
+        payload = ReasoningResponse.model_validate(data).model_dump_json().encode("utf-8")
+        store_reasoning(store, payload)
+        return BlobStore.get_instance().put_bytes(payload)
+    store.update_served_model(REASONING, completion.model)
+    
+    # Validate once here; cache hits are served as bytes
+    response = parse_reasoning(completion.text)
+    if response is None:
+        raise ValueError("Could not generate career recommendations. Please try again.")
+    payload = response.model_dump_json().encode("utf-8")
+    handle = BlobStore.get_instance().put_bytes(payload)
+    _reasoning_cache.set(cache_key, handle)
+    
+    # Try to store the reasoning and career options in the state store
+    try:
+        recommendations = store_reasoning(store, payload)
+        store.remember_artifact("reasoning", fingerprint, handle)
+    except Exception as e:
+        print(f"Warning: Could not store career reasoning: {str(e)}")
+    else:
+        # Only fresh model answers: cache hits would count a result twice,
+        # degraded catalog answers are not recommendations
+        record_recommendations(store, recommendations)
     
-    # Call Claude
-    response = client.messages.create(
-        model=model,
-        max_tokens=4000,
-        temperature=0,
-        messages=[{"role": "user", "content": prompt}]
+    return handle
+
+
+def parse_reasoning(text_content: str) -> Optional[ReasoningResponse]:
+    """Extract and validate recommendations from model output; None if they are unusable"""
+    try:
+        # Find JSON content (look for opening and closing braces)
+        json_start = text_content.find('{')
+        json_end = text_content.rfind('}') + 1
+        if json_start < 0 or json_end <= json_start:
+            return None
+        return ReasoningResponse.model_validate_json(text_content[json_start:json_end])
+    except ValidationError as e:
+        print(f"JSON parsing error: {str(e)}")
+        return None
+
+
+async def reasoning_completion(profile: str) -> Completion:
+    """The model's recommendations for one student, batched with concurrent requests when enabled"""
+    batcher = reasoning_batcher()
+    if batcher is not None:
+        completion = await batcher.submit(profile)
+        if completion is not None:
+            return completion
+        # The batched response had no usable part for this student
+        metrics.incr("reasoning.batch_fallbacks")
+    return await generate_text(REASONING, build_candidate_prompt(profile), temperature=0)
+
+
+def reasoning_batcher() -> Optional[MicroBatcher]:
+    """The micro-batcher for reasoning calls, None while batching is disabled"""
+    global _reasoning_batcher
+    settings = get_settings()
+    if settings.reasoning_batch_window_ms <= 0:
+        return None
+    if _reasoning_batcher is None:
+        _reasoning_batcher = MicroBatcher(
+            "reasoning", run_reasoning_batch,
+            max_batch=settings.reasoning_batch_max,
+            max_window=settings.reasoning_batch_window_ms / 1000,
+        )
+    return _reasoning_batcher
+
+
+async def run_reasoning_batch(profiles: List[str]) -> List[Optional[Completion]]:
+    """One upstream call for several students, split back into one completion each"""
+    if len(profiles) == 1:
+        return [await generate_text(REASONING, build_candidate_prompt(profiles[0]), temperature=0)]
+    budgets = BudgetController.get_instance()
+    per_student = budgets.max_tokens(REASONING)
+    # One call's output stays within the model's limit (CEILING); larger
+    # batches run as several calls, and a failed call's students run alone
+    per_call = max(1, CEILING // per_student)
+    if len(profiles) > per_call:
+        chunks = [profiles[i:i + per_call] for i in range(0, len(profiles), per_call)]
+        results = await asyncio.gather(*(run_reasoning_batch(chunk) for chunk in chunks), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return [
+            completion
+            for chunk, result in zip(chunks, results)
+            for completion in (result if not isinstance(result, Exception) else [None] * len(chunk))
+        ]
+    completion = await generate_text(
+        REASONING_BATCH, build_batch_prompt(profiles), temperature=0,
+        max_tokens=min(CEILING, per_student * len(profiles)),
     )
+    parts = split_batch(completion.text, len(profiles))
+    # Output tokens split evenly: the per-student budget keeps learning from batches
+    share = completion.output_tokens // len(profiles)
+    for part in parts:
+        if part is not None:
+            budgets.record(REASONING, share)
+    metrics.incr("reasoning.batched_students", sum(part is not None for part in parts))
+    return [
+        Completion(part, completion.model, completion.stop_reason, share, completion.continuations)
+        if part is not None else None
+        for part in parts
+    ]
+
+
+async def analyze_student_profile() -> List[Dict[str, Any]]:
+    """
+    Analyze the student profile to recommend careers with detailed reasoning
     
-    # Extract the text content
-    if response.content and len(response.content) > 0:
-        content_block = response.content[0]
-        if hasattr(content_block, 'text'):
-            text_content = content_block.text
-        else:
-            text_content = str(content_block)
-        
-        # Try to extract JSON from the response
-        try:
-            # Find JSON content (look for opening and closing braces)
-            json_start = text_content.find('{')
-            json_end = text_content.rfind('}') + 1
-            
-            if json_start >= 0 and json_end > json_start:
-                json_content = text_content[json_start:json_end]
-                data = json.loads(json_content)
-                
-                # Validate the structure
-                if "recommendations" in data and isinstance(data["recommendations"], list):
-                    # Try to store the reasoning in the state store
-                    try:
-                        # Check if the update_career_reasoning method exists
-                        if hasattr(store, 'update_career_reasoning'):
-                            store.update_career_reasoning(data)
-                    except Exception as e:
-                        print(f"Warning: Could not store career reasoning: {str(e)}")
-                    
-                    # Extract just the career options for the options list
-                    career_options = [
-                        {"name": rec["career"], "score": rec["score"]}
-                        for rec in data["recommendations"]
-                    ]
-                    
-                    # Try to update career options
-                    try:
-                        if hasattr(store, 'update_career_options'):
-                            store.update_career_options(career_options)
-                    except Exception as e:
-                        print(f"Warning: Could not store career options: {str(e)}")
-                    
-                    # Return the recommendations
-                    return data["recommendations"]
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            # If JSON parsing fails, try to extract in a different way
-            pass
-    
-    # If we couldn't parse JSON or the response doesn't have the expected structure,
-    # return a default response
-    raise ValueError("Could not generate career recommendations. Please try again.")
+    Returns:
+        List of career recommendations with reasons
+    """
+    handle = await build_reasoning()
+    return BlobStore.get_instance().get_json(handle)["recommendations"]
 
 # ============================================================
 # FastAPI Router
@@ -304,10 +460,15 @@ async def analyze_student_profile() -> List[Dict[str, Any]]:
 router = APIRouter(prefix="/api", tags=["reasoning"])
 
 @router.post("/reason", response_model=ReasoningResponse)
-async def generate_recommendations() -> Dict[str, Any]:
+async def generate_recommendations(
+    http_request: Request,
+    force: bool = Query(False, description="Regenerate even if the profile is unchanged"),
+):
     """
     API endpoint to generate career recommendations
     Uses the state store to access the complete student profile
+    The response is served from its pre-validated bytes; an unchanged
+    profile gets the stored recommendations back without a model call
     """
     try:
         # Get the state store instance
@@ -316,116 +477,20 @@ async def generate_recommendations() -> Dict[str, Any]:
         # Log which agent is accessing the state store
         print(f"Reasoning agent accessing StateStore instance: {store.get_instance_id()}")
         
-        # Check for API key
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-        
-        # Initialize Anthropic client
-        client = Anthropic(api_key=api_key)
-        model = os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet-20250219")
-        
-        # Format MBTI type
-        mbti_type = ""
-        mbti_type += "E" if store.mbti_scores["ei"] >= 50 else "I"
-        mbti_type += "N" if store.mbti_scores["sn"] >= 50 else "S"
-        mbti_type += "F" if store.mbti_scores["tf"] >= 50 else "T"
-        mbti_type += "P" if store.mbti_scores["jp"] >= 50 else "J"
-        
-        # Create prompt for Claude
-        prompt = f"""
-        I need you to analyze a student's profile and suggest suitable career paths. Here's their information:
-
-        Name: {store.name}
-        College: {store.college}
-        Major: {store.major}
-        Grade: {store.grade}
-        Gender: {store.gender}
-
-        MBTI Type: {mbti_type}
-        MBTI Scores:
-        - Extraversion/Introversion: {store.mbti_scores["ei"]}% (≥50% is Extraverted)
-        - Sensing/Intuition: {store.mbti_scores["sn"]}% (≥50% is Intuitive)
-        - Thinking/Feeling: {store.mbti_scores["tf"]}% (≥50% is Feeling)
-        - Judging/Perceiving: {store.mbti_scores["jp"]}% (≥50% is Perceiving)
-
-        Priorities: {", ".join(store.priorities)}
-
-        Goals and Interests:
-        {format_goals_and_interests(getattr(store, "goals_and_interests", {}))}
-
-        Based on this information, please suggest 5 career paths that would be a good match for this student.
-        For each career, provide:
-        1. A match score (0-100)
-        2. A brief description of the career
-        3. 3-4 specific reasons why this career would be a good match, considering their:
-           - Major and academic background
-           - MBTI personality type and preferences
-           - Stated priorities and values
-           - Goals and interests
-           - Natural talents and skills
-
-        Format your response as a JSON object with the following structure:
-        {{
-          "recommendations": [
-            {{
-              "career": "Career Title",
-              "score": 85,
-              "description": "Brief description of the career",
-              "reasons": [
-                {{
-                  "strength": "Strength of the match",
-                  "explanation": "Detailed explanation"
-                }}
-              ]
-            }}
-          ]
-        }}
-
-        Make sure your recommendations are:
-        1. Realistic and achievable with their background
-        2. Aligned with their personality type and preferences
-        3. Matched to their stated priorities and values
-        4. Supported by specific, detailed reasoning
-        5. Varied in terms of different career paths
-        """
-        
-        # Call Claude
-        response = client.messages.create(
-            model=model,
-            max_tokens=4000,
-            temperature=0,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        # Extract the text content
-        if response.content and len(response.content) > 0:
-            content_block = response.content[0]
-            if hasattr(content_block, 'text'):
-                text_content = content_block.text
-            else:
-                text_content = str(content_block)
-            
-            # Try to extract JSON from the response
-            try:
-                # Find JSON content (look for opening and closing braces)
-                json_start = text_content.find('{')
-                json_end = text_content.rfind('}') + 1
-                
-                if json_start >= 0 and json_end > json_start:
-                    json_content = text_content[json_start:json_end]
-                    data = json.loads(json_content)
-                    
-                    # Store the recommendations in the state store
-                    store.career_reasoning = data
-                    
-                    return data
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {str(e)}")
-                raise HTTPException(status_code=500, detail="Failed to parse reasoning agent response")
+        # Generate the recommendations; cache hits skip the deadline guard
+        # Cancelled when the client disconnects or the request deadline passes
+        handle = None if force else cached_reasoning(store)
+        if handle is None:
+            handle = await guard(http_request, build_reasoning(force), "reason")
         
-        raise HTTPException(status_code=500, detail="Failed to generate career recommendations")
+        # Return the recommendations
+        return payload_response(http_request, BlobStore.get_instance().get_bytes(handle), cache_key=handle)
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        # Handle expected errors
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Handle unexpected errors
         raise HTTPException(status_code=500, detail=f"Error generating recommendations: {str(e)}")
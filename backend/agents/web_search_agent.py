@@ -5,19 +5,27 @@ Uses the simple state store to save results
 import os
 import sys
 import asyncio
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, AsyncIterator, List, Literal, NamedTuple, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from anthropic import Anthropic
-from dotenv import load_dotenv
 
 # Fix import path for state_store
-# This allows the file to be run directly and also imported as a module
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Only needed when the file is run directly; as a module backend/ is on the path
+if not __package__:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from state_store import StateStore
-
-# Load environment variables
-load_dotenv()
+from blob_store import BlobStore
+from cache import ResultCache, SingleFlight, web_search_key
+from canonical import get_index
+import deadlines
+import metrics
+from deadlines import DeadlineExceeded, deadline_scope, guard, request_budget
+from llm import generate_text
+from model_router import WEB_SEARCH
+from responses import dumps
+from scheduler import request_session, session_scope
+from settings import get_settings
 
 # ============================================================
 # Models
@@ -34,10 +42,79 @@ class WebSearchResponse(BaseModel):
     """Response model for web search results"""
     summary: str = Field(..., description="Summary of degree requirements and resources")
 
+class AutocompleteSuggestion(BaseModel):
+    """A canonical college or major"""
+    id: str = Field(..., description="Canonical ID")
+    name: str = Field(..., description="Canonical display name")
+
+class AutocompleteResponse(BaseModel):
+    """Autocomplete suggestions for a partial college or major name"""
+    suggestions: List[AutocompleteSuggestion] = Field(..., description="Best matches, best first")
+
+# ============================================================
+# Topics
+# ============================================================
+class SearchTopic(NamedTuple):
+    """One sub-query of the web search"""
+    id: str
+    title: str
+    question: str
+    ttl_factor: float  # cache TTL as a multiple of web_search_cache_ttl
+
+
+# Searched concurrently; degree requirements are dispatched first and lead
+# the merged summary. Faculty and facilities change far less often than
+# internship listings, so they are cached longer.
+SEARCH_TOPICS = (
+    SearchTopic(
+        "degree_requirements", "Degree Requirements",
+        "The degree requirements for my major at my specific college, including core courses plan, "
+        "electives, and any specializations available (include class codes).",
+        1.0,
+    ),
+    SearchTopic(
+        "academic_resources", "Academic Resources",
+        "Available academic resources, such as tutoring, advising, or study groups.",
+        1.0,
+    ),
+    SearchTopic(
+        "career_services", "Career Services & Internships",
+        "Career services and internship opportunities related to my major.",
+        1 / 7,
+    ),
+    SearchTopic(
+        "faculty", "Notable Faculty & Researchers",
+        "Notable professors or researchers in my field at this institution.",
+        4.0,
+    ),
+    SearchTopic(
+        "facilities", "Facilities, Labs & Centers",
+        "Any specialized facilities, labs, or centers relevant to my major.",
+        4.0,
+    ),
+)
+TOPICS_BY_ID = {topic.id: topic for topic in SEARCH_TOPICS}
+
+# ============================================================
+# Cache
+# ============================================================
+# Topic sections depend only on the (canonical) college and major, so they
+# are shared by every student with the same pair. Values are blob handles;
+# each topic has its own TTL.
+_web_search_cache = ResultCache(
+    "websearch",
+    maxsize=2048 * len(SEARCH_TOPICS),
+    ttl_seconds=get_settings().web_search_cache_ttl,
+)
+
+# Concurrent searches for the same topic share one model call. The result is
+# cached for every student, so it is finished even if all requesters leave.
+_web_search_flight = SingleFlight("websearch", keep_on_abandon=True)
+
 # ============================================================
 # Core Logic (Independent of FastAPI)
 # ============================================================
-async def perform_web_search(college: str, major: str) -> str:
+async def perform_web_search(college: str, major: str, force: bool = False) -> str:
     """
     Core web search functionality 
     Can be used directly or through the API
@@ -45,52 +122,111 @@ async def perform_web_search(college: str, major: str) -> str:
     Args:
         college: Name of the college
         major: Major of study
+        force: Search again even when the topics are cached
         
     Returns:
-        Summary text
+        Summary text, one section per topic
     """
-    # Check for API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-    
-    # Initialize Anthropic client
-    client = Anthropic(api_key=api_key)
-    model = os.getenv("ANTHROPIC_MODEL", "claude-3-7-sonnet-20250219")
-    
+    return merge_sections(await search_sections(college, major, force))
+
+
+async def search_sections(college: str, major: str, force: bool = False) -> Dict[str, str]:
+    """Section text by topic ID; topics that failed are left out"""
+    sections = {}
+    async for topic, text in stream_web_search(college, major, force):
+        sections[topic.id] = text
+    return sections
+
+
+async def stream_web_search(college: str, major: str, force: bool = False) -> AsyncIterator[Tuple[SearchTopic, str]]:
+    """
+    Search every topic concurrently and yield the sections as they complete
+    A failed topic is left out (and not cached) unless every topic fails.
+    Searches still running when the consumer stops are finished and cached.
+    """
+    tasks = {asyncio.ensure_future(search_topic(college, major, topic, force)): topic for topic in SEARCH_TOPICS}
+    errors = []
+    try:
+        pending = set(tasks)
+        while pending:
+            left = deadlines.remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            # Degree requirements first when several finish together
+            for task in sorted(done, key=lambda t: SEARCH_TOPICS.index(tasks[t])):
+                if task.exception() is not None:
+                    print(f"Warning: web search topic {tasks[task].id} failed: {str(task.exception())}")
+                    metrics.incr(f"websearch.topic_failed.{tasks[task].id}")
+                    errors.append(task.exception())
+                    continue
+                yield tasks[task], task.result()
+        if len(errors) == len(tasks):
+            raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def search_topic(college: str, major: str, topic: SearchTopic, force: bool = False) -> str:
+    """One topic's section, from the cache (unless forced) or a model search"""
+    # Spelling variants of the same college/major share one cache entry
+    cache_key = web_search_key(college, major) + (topic.id,)
+    cached = None if force else _web_search_cache.get(cache_key)
+    if cached is not None:
+        return BlobStore.get_instance().get_text(cached)
+    return await _web_search_flight.run(cache_key, lambda: _search(cache_key, college, major, topic))
+
+
+async def _search(cache_key: tuple, college: str, major: str, topic: SearchTopic) -> str:
+    """Run the model search for a cache miss and cache the section"""
     # Create prompt for Claude
     prompt = f"""
     I'm a student at {college} studying {major}.
     Can you search the web for information about:
     
-    1. The degree requirements for my major at my specific college, including
-       core courses plan, electives, and any specializations 
-       available(include class code).
-    2. Available academic resources, such as tutoring, advising, or study groups
-    3. Career services and internship opportunities related to my major
-    4. Notable professors or researchers in my field at this institution
-    5. Any specialized facilities, labs, or centers relevant to my major
+    {topic.question}
     
-    Please provide a comprehensive but concise summary that I can use to better
-    understand the academic pathways and resources available to me.
+    Please provide a concise summary that I can use to better understand the
+    academic pathways and resources available to me. Do not add a title.
     """
     
-    # Call Claude
-    response = client.messages.create(
-        model=model,
-        max_tokens= 4000,
-        temperature=0.7,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    # Call Claude (model and max_tokens chosen adaptively)
+    completion = await generate_text(WEB_SEARCH, prompt, temperature=0.7)
+    text = completion.text.strip()
     
-    # Extract the text content
-    if response.content and len(response.content) > 0:
-        content_block = response.content[0]
-        if hasattr(content_block, 'text'):
-            return content_block.text
-        return str(content_block)
-    else:
-        raise ValueError("No content in response")
+    StateStore.get_instance().update_served_model(WEB_SEARCH, completion.model)
+    ttl = get_settings().web_search_cache_ttl * topic.ttl_factor
+    _web_search_cache.set(cache_key, BlobStore.get_instance().put_text(text), ttl_seconds=ttl)
+    return text
+
+
+def stored_web_search(store) -> Optional[str]:
+    """The session's summary if its college and major are unchanged since the search, else None"""
+    stored = store.stored_artifact("websearch", store.input_fingerprint("websearch"))
+    if stored is None:
+        return None
+    metrics.incr("memo.hits.websearch")
+    return BlobStore.get_instance().get_text(stored)
+
+
+def store_web_search(store, fingerprint: Tuple, sections: Dict[str, str]) -> str:
+    """
+    Save the summary of sections searched for the college and major the
+    fingerprint was taken at; it is reused only if no topic failed
+    """
+    summary = merge_sections(sections)
+    store.update_web_search(summary)
+    if len(sections) == len(SEARCH_TOPICS):
+        store.remember_artifact("websearch", fingerprint, BlobStore.get_instance().put_text(summary))
+    return summary
+
+
+def merge_sections(sections: Dict[str, str]) -> str:
+    """The WebSearchResponse summary: one titled section per topic, in topic order"""
+    return "\n\n".join(
+        f"## {topic.title}\n\n{sections[topic.id]}" for topic in SEARCH_TOPICS if topic.id in sections
+    )
 
 # ============================================================
 # FastAPI Router
@@ -98,10 +234,16 @@ async def perform_web_search(college: str, major: str) -> str:
 router = APIRouter(prefix="/api", tags=["websearch"])
 
 @router.post("/websearch", response_model=WebSearchResponse)
-async def get_degree_information(request: WebSearchRequest) -> Dict[str, Any]:
+async def get_degree_information(
+    request: WebSearchRequest,
+    http_request: Request,
+    force: bool = Query(False, description="Search again even if college and major are unchanged"),
+) -> Dict[str, Any]:
     """
     API endpoint to get degree information via web search
     Also stores basic info and search results in the state store
+    An unchanged college and major get the stored summary back
+    Cancelled when the client disconnects or the request deadline passes
     """
     try:
         # Get the state store instance
@@ -119,15 +261,23 @@ async def get_degree_information(request: WebSearchRequest) -> Dict[str, Any]:
             gender=request.gender
         )
         
+        # Reuse the session's summary while college and major are unchanged
+        summary = None if force else stored_web_search(store)
+        if summary is not None:
+            return {"summary": summary}
+        fingerprint = store.input_fingerprint("websearch")
+        
         # Perform the web search
-        summary = await perform_web_search(request.college, request.major)
+        sections = await guard(http_request, search_sections(request.college, request.major, force), "websearch")
         
         # Save the web search results to the state store
-        store.update_web_search(summary)
+        summary = store_web_search(store, fingerprint, sections)
         
         # Return the summary
         return {"summary": summary}
         
+    except HTTPException:
+        raise
     except ValueError as e:
         # Handle expected errors
         raise HTTPException(status_code=400, detail=str(e))
@@ -135,6 +285,74 @@ async def get_degree_information(request: WebSearchRequest) -> Dict[str, Any]:
         # Handle unexpected errors
         raise HTTPException(status_code=500, detail=f"Error retrieving degree information: {str(e)}")
 
+@router.post("/websearch/stream")
+async def stream_degree_information(
+    request: WebSearchRequest,
+    http_request: Request,
+    force: bool = Query(False, description="Search again even if college and major are unchanged"),
+):
+    """
+    API endpoint streaming the web search as newline-delimited JSON
+    One {"topic", "title", "text"} line per section in completion order,
+    then a final {"summary"} line with the merged WebSearchResponse summary
+    (or {"error"} if nothing could be found in time). A stored summary for
+    an unchanged college and major is sent as the {"summary"} line alone.
+    """
+    # Get the state store instance
+    store = StateStore.get_instance()
+    
+    # Log which agent is accessing the state store
+    print(f"Web search agent accessing StateStore instance: {store.get_instance_id()}")
+    
+    # Save basic info to the state store
+    store.update_basic_info(
+        name=request.name,
+        college=request.college,
+        major=request.major,
+        grade=request.grade,
+        gender=request.gender
+    )
+    budget = request_budget(http_request, "websearch")
+    session = request_session(http_request)
+    stored = None if force else stored_web_search(store)
+    fingerprint = store.input_fingerprint("websearch")
+    
+    async def lines():
+        if stored is not None:
+            yield dumps({"summary": stored}) + b"\n"
+            return
+        sections = {}
+        # Stops (and cancels the waits) when the client disconnects
+        with deadline_scope(budget), session_scope(session):
+            try:
+                async for topic, text in stream_web_search(request.college, request.major, force):
+                    sections[topic.id] = text
+                    yield dumps({"topic": topic.id, "title": topic.title, "text": text}) + b"\n"
+            except DeadlineExceeded:
+                metrics.incr("requests.deadline_exceeded.websearch")
+            except Exception as e:
+                print(f"Error streaming web search: {str(e)}")
+        if not sections:
+            yield dumps({"error": "Could not retrieve degree information. Please try again."}) + b"\n"
+            return
+        summary = store_web_search(store, fingerprint, sections)
+        yield dumps({"summary": summary}) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+async def autocomplete(
+    q: str = Query(..., description="Partial college or major name"),
+    kind: Literal["college", "major"] = Query("college", description="What to complete"),
+    limit: int = Query(8, ge=1, le=25, description="Maximum number of suggestions"),
+) -> Dict[str, Any]:
+    """
+    API endpoint for type-ahead suggestions while the student types
+    Served from an in-memory prefix index, no model call
+    """
+    entries = get_index(kind).complete(q, limit=limit)
+    return {"suggestions": [{"id": e.id, "name": e.name} for e in entries]}
+
 # ============================================================
 # Standalone Test Function
 # ============================================================
@@ -0,0 +1,467 @@
+"""
+Cohort analytics over recommendation and plan outcomes
+Every set of career recommendations the model makes for a student (one row
+per recommended career) and every plan generated is appended to a columnar
+store (cache hits and degraded catalog answers are not counted again):
+one NumPy array per column, with careers, majors, colleges, years and
+sessions dictionary-encoded as integer codes into shared vocabularies.
+Group-bys ("top recommended careers by major", "average match score by MBTI
+type") are a boolean filter mask plus np.bincount over combined codes, so a
+query over a million rows takes milliseconds.
+With analytics_dir set, rows are written there as .npz segments of
+SEGMENT_ROWS rows (plus the vocabularies) and loaded again on startup.
+"""
+
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+import metrics
+from canonical import canonical_key, canonical_name, normalize
+from career_catalog import CareerCatalog, career_key
+from profiler import require_admin
+from settings import get_settings
+
+RECOMMENDATION = "recommendation"
+PLAN = "plan"
+KINDS = (RECOMMENDATION, PLAN)
+
+# Column dtypes; the dictionary-encoded ones are codes into a Vocabulary
+COLUMNS = {
+    "at": np.float64,
+    "kind": np.uint8,
+    "session": np.uint32,
+    "college": np.uint32,
+    "major": np.uint32,
+    "grade": np.uint16,
+    "mbti": np.uint8,
+    "career": np.uint32,
+    "score": np.int16,  # -1 when unknown (plans for careers never recommended)
+    "rank": np.uint8,  # position among the recommendations, 0 when unknown
+}
+ENCODED = ("session", "college", "major", "grade", "career")
+GROUP_COLUMNS = ("college", "major", "grade", "mbti", "career")
+
+# MBTI type code: one bit per dimension, E, N, F and P set
+MBTI_TYPES = tuple(
+    ("E" if code & 8 else "I") + ("N" if code & 4 else "S") + ("F" if code & 2 else "T") + ("P" if code & 1 else "J")
+    for code in range(16)
+)
+
+SEGMENT_ROWS = 65536
+INITIAL_CAPACITY = 4096
+# Above this many (group, career) cells the counts are taken over unique pairs
+MAX_DENSE_CELLS = 1 << 24
+
+
+def mbti_code(scores: Dict[str, int]) -> int:
+    """Type code of MBTI scores (50 or more leans to E, N, F, P)"""
+    return (
+        (scores["ei"] >= 50) << 3 | (scores["sn"] >= 50) << 2
+        | (scores["tf"] >= 50) << 1 | (scores["jp"] >= 50)
+    )
+
+
+def mean(total: float, count: int) -> Optional[float]:
+    return round(float(total / count), 1) if count else None
+
+
+def cell_stats(cells: np.ndarray, scores: Optional[np.ndarray], cell_count: int):
+    """
+    Row count (and match score sum and scored rows) per occupied cell
+    np.bincount over all cells when there are few enough, else np.unique
+
+    Returns:
+        (sorted occupied cell IDs, counts, score sums, scored counts); the
+        score arrays are None without scores
+    """
+    if cell_count <= MAX_DENSE_CELLS:
+        counts = np.bincount(cells, minlength=cell_count)
+        occupied = np.flatnonzero(counts)
+        counts = counts[occupied]
+        index = None
+    else:
+        occupied, index, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    if scores is None:
+        return occupied, counts, None, None
+    scored = scores >= 0
+    if index is None:
+        sums = np.bincount(cells[scored], weights=scores[scored], minlength=cell_count)[occupied]
+        scored_counts = np.bincount(cells[scored], minlength=cell_count)[occupied]
+    else:
+        sums = np.bincount(index[scored], weights=scores[scored], minlength=len(occupied))
+        scored_counts = np.bincount(index[scored], minlength=len(occupied))
+    return occupied, counts, sums, scored_counts
+
+
+class Vocabulary:
+    """Dictionary encoding: a code per distinct key, with a display label"""
+
+    def __init__(self, entries: Optional[List[List[str]]] = None):
+        self.codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+        for key, label in entries or []:
+            self.encode(key, label)
+
+    def encode(self, key: str, label: Optional[str] = None) -> int:
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.labels)
+            self.labels.append(label if label is not None else key)
+        return code
+
+    def entries(self) -> List[List[str]]:
+        return [[key, self.labels[code]] for key, code in self.codes.items()]
+
+    def __len__(self):
+        return len(self.labels)
+
+
+class AnalyticsStore:
+    """Append-only columnar table of recommendation and plan outcomes"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared store, loading analytics_dir if set"""
+        if cls._instance is None:
+            cls._instance = AnalyticsStore(get_settings().analytics_dir or None)
+        return cls._instance
+
+    def __init__(self, directory: Optional[str] = None, capacity: int = INITIAL_CAPACITY):
+        self.directory = directory
+        self.vocabularies = {column: Vocabulary() for column in ENCODED}
+        self._columns = {column: np.zeros(capacity, dtype=dtype) for column, dtype in COLUMNS.items()}
+        self._size = 0
+        self._flushed = 0
+        self._segments = 0
+        self._labels_by_lookup: Dict[str, Dict[str, int]] = {}
+        self._career_names: Optional[Dict[str, str]] = None
+        if directory:
+            self._load()
+
+    def __len__(self):
+        return self._size
+
+    def column(self, name: str) -> np.ndarray:
+        """The filled part of a column (a view, valid until the next append)"""
+        return self._columns[name][:self._size]
+
+    # ============================================================
+    # Appending
+    # ============================================================
+    def _reserve(self, rows: int):
+        capacity = len(self._columns["at"])
+        if self._size + rows <= capacity:
+            return
+        while capacity < self._size + rows:
+            capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def _append(self, rows: Dict[str, np.ndarray]):
+        count = len(rows["career"])
+        self._reserve(count)
+        for name, values in self._columns.items():
+            values[self._size:self._size + count] = rows[name]
+        self._size += count
+
+    def append(self, rows: Dict[str, np.ndarray]):
+        """Append rows given as one array per column (encoded columns as codes)"""
+        self._append(rows)
+        if self.directory and self._size - self._flushed >= SEGMENT_ROWS:
+            self.flush()
+
+    def record(self, store, kind: str, careers: List[str], scores: Optional[List[int]] = None,
+               ranks: Optional[List[int]] = None):
+        """Append one row per career for a session's profile"""
+        if not careers:
+            return
+        count = len(careers)
+        vocabularies = self.vocabularies
+        if self._career_names is None:
+            catalog = CareerCatalog.get_instance()
+            self._career_names = dict(zip(catalog.ids, catalog.names))
+        career_codes = []
+        for career in careers:
+            key = career_key(career)
+            career_codes.append(vocabularies["career"].encode(key, self._career_names.get(key, career)))
+        self.append({
+            "at": np.full(count, time.time()),
+            "kind": np.full(count, KINDS.index(kind)),
+            "session": np.full(count, vocabularies["session"].encode(store.get_instance_id())),
+            "college": np.full(count, vocabularies["college"].encode(
+                canonical_key("college", store.college), canonical_name("college", store.college))),
+            "major": np.full(count, vocabularies["major"].encode(
+                canonical_key("major", store.major), canonical_name("major", store.major))),
+            "grade": np.full(count, vocabularies["grade"].encode(normalize(store.grade or ""), store.grade)),
+            "mbti": np.full(count, mbti_code(store.mbti_scores)),
+            "career": np.array(career_codes),
+            "score": np.array(scores if scores is not None else [-1] * count),
+            "rank": np.array(ranks if ranks is not None else [0] * count),
+        })
+        metrics.incr(f"analytics.rows.{kind}", count)
+
+    # ============================================================
+    # Queries
+    # ============================================================
+    def code_of(self, column: str, value: str) -> Optional[int]:
+        """Code of a filter value (a key or a label, any spelling), None if never seen"""
+        if column == "mbti":
+            value = value.strip().upper()
+            return MBTI_TYPES.index(value) if value in MBTI_TYPES else None
+        vocabulary = self.vocabularies[column]
+        if column in ("college", "major"):
+            code = vocabulary.codes.get(canonical_key(column, value))
+        elif column == "career":
+            code = vocabulary.codes.get(career_key(value))
+        else:
+            code = vocabulary.codes.get(normalize(value))
+        if code is None:
+            # Match display labels too
+            lookup = self._labels_by_lookup.get(column)
+            if lookup is None or len(lookup) != len(vocabulary):
+                lookup = self._labels_by_lookup[column] = {
+                    normalize(label): i for i, label in enumerate(vocabulary.labels)
+                }
+            code = lookup.get(normalize(value))
+        return code
+
+    def label(self, column: str, code: int) -> str:
+        if column == "mbti":
+            return MBTI_TYPES[code]
+        return self.vocabularies[column].labels[code]
+
+    def mask(self, kind: Optional[str] = None, filters: Optional[Dict[str, str]] = None,
+             since: Optional[float] = None, max_rank: Optional[int] = None) -> Optional[np.ndarray]:
+        """Boolean row mask for the filters; None if a filter value was never seen"""
+        keep = np.ones(self._size, dtype=bool)
+        if kind is not None:
+            keep &= self.column("kind") == KINDS.index(kind)
+        for column, value in (filters or {}).items():
+            code = self.code_of(column, value)
+            if code is None:
+                return None
+            keep &= self.column(column) == code
+        if since is not None:
+            keep &= self.column("at") >= since
+        if max_rank is not None:
+            keep &= self.column("rank") <= max_rank
+        return keep
+
+    def group_by(self, by: Optional[str], kind: Optional[str] = RECOMMENDATION,
+                 filters: Optional[Dict[str, str]] = None, since: Optional[float] = None,
+                 max_rank: Optional[int] = None, top: int = 5, limit: int = 50) -> Dict:
+        """
+        Counts, students and mean match score per group, with each group's most frequent careers
+
+        Args:
+            by: Column to group on (GROUP_COLUMNS), or None for one overall group
+            kind: Rows to count (RECOMMENDATION or PLAN), None for both
+            filters: Column value each row must have, e.g. {"major": "Computer Science"}
+            since: Only rows recorded at or after this unix time
+            max_rank: Only recommendations ranked this high or better (1 = top pick)
+            top: Careers listed per group (0 for none)
+            limit: Groups returned, largest first
+
+        Returns:
+            {"rows": matching rows, "groups": [...]}
+        """
+        started = time.perf_counter()
+        keep = self.mask(kind, filters, since, max_rank)
+        if keep is None or not keep.any():
+            return {"rows": 0, "groups": []}
+
+        if by is None:
+            groups = np.zeros(int(keep.sum()), dtype=np.int64)
+            group_count = 1
+        else:
+            groups = self.column(by)[keep].astype(np.int64)
+            group_count = 16 if by == "mbti" else len(self.vocabularies[by])
+        careers = self.column("career")[keep].astype(np.int64)
+        scores = self.column("score")[keep]
+        sessions = self.column("session")[keep].astype(np.int64)
+        scored = scores >= 0
+
+        counts = np.bincount(groups, minlength=group_count)
+        score_sums = np.bincount(groups[scored], weights=scores[scored], minlength=group_count)
+        score_counts = np.bincount(groups[scored], minlength=group_count)
+        session_count = len(self.vocabularies["session"])
+        # Distinct students per group: the (group, session) cells that occur
+        student_cells, _, _, _ = cell_stats(groups * session_count + sessions, None, group_count * session_count)
+        students = np.bincount(student_cells // session_count, minlength=group_count)
+
+        order = [group for group in np.argsort(-counts, kind="stable")[:limit].tolist() if counts[group]]
+        career_count = len(self.vocabularies["career"])
+        with_careers = top > 0 and by != "career"
+        if with_careers:
+            # Careers of the returned groups only, with groups renumbered by position
+            position = np.full(group_count, -1, dtype=np.int64)
+            position[order] = np.arange(len(order))
+            selected = position[groups]
+            chosen = selected >= 0
+            cells, cell_counts, cell_sums, cell_scored = cell_stats(
+                selected[chosen] * career_count + careers[chosen],
+                scores[chosen], len(order) * career_count,
+            )
+            bounds = np.searchsorted(cells, np.arange(len(order) + 1) * career_count)
+
+        result = []
+        for i, group in enumerate(order):
+            entry = {
+                "group": self.label(by, group) if by is not None else "all",
+                "count": int(counts[group]),
+                "students": int(students[group]),
+                "mean_score": mean(score_sums[group], score_counts[group]),
+            }
+            if with_careers:
+                span = slice(bounds[i], bounds[i + 1])
+                best = bounds[i] + np.argsort(-cell_counts[span], kind="stable")[:top]
+                entry["careers"] = [
+                    {
+                        "career": self.label("career", int(cells[cell] % career_count)),
+                        "count": int(cell_counts[cell]),
+                        "mean_score": mean(cell_sums[cell], cell_scored[cell]),
+                    }
+                    for cell in best.tolist()
+                ]
+            result.append(entry)
+
+        metrics.incr("analytics.queries")
+        metrics.incr("analytics.query_ms", (time.perf_counter() - started) * 1000)
+        return {"rows": int(keep.sum()), "groups": result}
+
+    # ============================================================
+    # Persistence
+    # ============================================================
+    def _vocabulary_path(self) -> str:
+        return os.path.join(self.directory, "vocabularies.json")
+
+    def flush(self):
+        """Write the rows appended since the last flush as a new segment"""
+        if not self.directory or self._size == self._flushed:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Vocabularies first: a segment never refers to codes missing from them
+        path = self._vocabulary_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({column: vocabulary.entries() for column, vocabulary in self.vocabularies.items()}, f)
+        os.replace(path + ".tmp", path)
+        segment = os.path.join(self.directory, f"segment-{self._segments:06d}.npz")
+        with open(segment + ".tmp", "wb") as f:
+            np.savez(f, **{name: values[self._flushed:self._size] for name, values in self._columns.items()})
+        os.replace(segment + ".tmp", segment)
+        self._segments += 1
+        self._flushed = self._size
+
+    def _load(self):
+        path = self._vocabulary_path()
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        self.vocabularies = {column: Vocabulary(entries.get(column)) for column in ENCODED}
+        for segment in sorted(glob.glob(os.path.join(self.directory, "segment-*.npz"))):
+            with np.load(segment) as data:
+                self._append({name: data[name] for name in COLUMNS})
+            self._segments += 1
+        self._flushed = self._size
+        print(f"Analytics: loaded {self._size} rows from {self._segments} segments in {self.directory}")
+
+
+def record_recommendations(store, recommendations: List[Dict]):
+    """Append a session's recommendations (ReasoningResponse dicts), best first"""
+    try:
+        AnalyticsStore.get_instance().record(
+            store, RECOMMENDATION,
+            [rec["career"] for rec in recommendations],
+            [rec["score"] for rec in recommendations],
+            list(range(1, len(recommendations) + 1)),
+        )
+    except Exception as e:
+        print(f"Warning: Could not record recommendations for analytics: {str(e)}")
+
+
+def record_plan(store, career: str):
+    """Append a plan generated for a session, with the career's match score if it was recommended"""
+    try:
+        options = getattr(store, "career_options", None) or []
+        for rank, option in enumerate(options, 1):
+            if career_key(option["name"]) == career_key(career):
+                score, position = option["score"], rank
+                break
+        else:
+            score, position = -1, 0
+        AnalyticsStore.get_instance().record(store, PLAN, [career], [score], [position])
+    except Exception as e:
+        print(f"Warning: Could not record plan for analytics: {str(e)}")
+
+
+# ============================================================
+# FastAPI Router
+# ============================================================
+class CareerCount(BaseModel):
+    """A career within a group"""
+    career: str = Field(..., description="Career title")
+    count: int = Field(..., description="Rows for this career in the group")
+    mean_score: Optional[float] = Field(None, description="Average match score (0-100)")
+
+
+class CohortGroup(BaseModel):
+    """One group of a cohort query"""
+    group: str = Field(..., description="Value of the grouping column ('all' when ungrouped)")
+    count: int = Field(..., description="Matching rows in the group")
+    students: int = Field(..., description="Distinct students (sessions) in the group")
+    mean_score: Optional[float] = Field(None, description="Average match score (0-100)")
+    careers: Optional[List[CareerCount]] = Field(None, description="Most frequent careers in the group")
+
+
+class CohortResponse(BaseModel):
+    """Result of a cohort query"""
+    rows: int = Field(..., description="Rows matching the filters")
+    groups: List[CohortGroup] = Field(..., description="Groups, largest first")
+
+
+router = APIRouter(prefix="/api", tags=["analytics"])
+
+
+@router.get("/analytics/cohort", response_model=CohortResponse)
+async def cohort_statistics(
+    http_request: Request,
+    by: Optional[str] = Query(None, description="Group by college, major, grade, mbti or career"),
+    kind: str = Query(RECOMMENDATION, description="recommendation or plan"),
+    top: int = Query(5, ge=0, le=50, description="Careers listed per group"),
+    limit: int = Query(50, ge=1, le=1000, description="Groups returned, largest first"),
+    max_rank: Optional[int] = Query(None, ge=1, description="Only recommendations ranked this high (1 = top pick)"),
+    since: Optional[float] = Query(None, description="Only outcomes recorded after this unix time"),
+    college: Optional[str] = Query(None, description="Filter: college"),
+    major: Optional[str] = Query(None, description="Filter: major"),
+    grade: Optional[str] = Query(None, description="Filter: year"),
+    mbti: Optional[str] = Query(None, description="Filter: MBTI type, e.g. INTJ"),
+    career: Optional[str] = Query(None, description="Filter: career"),
+):
+    """
+    API endpoint for cohort statistics over every student's outcomes, e.g.
+    top recommended careers by major (?by=major) or average match score by
+    MBTI type (?by=mbti&top=0); requires the X-Admin-Token header
+    """
+    require_admin(http_request, "Cohort analytics")
+    if by is not None and by not in GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(GROUP_COLUMNS)}")
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    filters = {
+        column: value
+        for column, value in (("college", college), ("major", major), ("grade", grade), ("mbti", mbti),
+                              ("career", career))
+        if value
+    }
+    return AnalyticsStore.get_instance().group_by(by, kind, filters, since, max_rank, top, limit)
@@ -0,0 +1,125 @@
+"""
+Micro-batching of concurrent upstream calls
+Requests arriving close together are held for a short window and run as one
+upstream call, which pays the fixed part of the prompt (instructions, output
+format) once for the whole batch instead of once per request.
+The window and batch size follow the arrival rate: at low load a request is
+sent straight away (there is nobody to wait for), under load the batcher
+waits about as long as it takes for a full batch to arrive, never longer
+than max_window.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+import deadlines
+import metrics
+from deadlines import deadline_scope
+from scheduler import LANES, current_lane, lane_scope
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Weight of the newest inter-arrival gap in the moving average
+GAP_SMOOTHING = 0.2
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collects concurrent submissions and runs them through run_batch together
+    run_batch gets the items and returns one result per item, None for an
+    item it could not handle (the caller then runs it on its own).
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[T]], Awaitable[List[Optional[R]]]],
+                 max_batch: int, max_window: float):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_window = max_window
+        self._pending: List[Tuple[T, asyncio.Future, Optional[float], str]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self._last_arrival: Optional[float] = None
+        self._gap: Optional[float] = None
+
+    def _observe(self, now: float):
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._gap = gap if self._gap is None else GAP_SMOOTHING * gap + (1 - GAP_SMOOTHING) * self._gap
+        self._last_arrival = now
+
+    def target_size(self) -> int:
+        """Batch size worth waiting for: requests expected within max_window, plus this one"""
+        if self._gap is None:
+            return 1
+        if self._gap <= 0:
+            return self.max_batch
+        return max(1, min(self.max_batch, int(self.max_window / self._gap) + 1))
+
+    def window(self) -> float:
+        """How long the first request of a batch waits for the others"""
+        target = self.target_size()
+        if target <= 1:
+            return 0.0
+        return min(self.max_window, (self._gap or 0.0) * (target - 1))
+
+    async def submit(self, item: T) -> Optional[R]:
+        """Run an item in the next batch; None if the batch could not handle it"""
+        loop = asyncio.get_running_loop()
+        self._observe(time.monotonic())
+        future = loop.create_future()
+        self._pending.append((item, future, deadlines.remaining(), current_lane()))
+        if len(self._pending) >= self.target_size():
+            self._dispatch()
+        elif self._timer is None:
+            window = self.window()
+            if window <= 0:
+                self._dispatch()
+            else:
+                self._timer = loop.call_later(window, self._dispatch)
+        # Cancelling a waiter before dispatch drops its item; after, only its result
+        return await future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [entry for entry in self._pending if not entry[1].done()]
+        self._pending = []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future, Optional[float], str]]):
+        metrics.incr(f"batch.{self.name}.calls")
+        metrics.incr(f"batch.{self.name}.items", len(batch))
+        # Shared work: it may take as long as the most patient member allows,
+        # and goes in the most urgent member's lane
+        budgets = [left for _, _, left, _ in batch]
+        budget = None if None in budgets else max(budgets)
+        lane = min((lane for _, _, _, lane in batch), key=LANES.index)
+        try:
+            with lane_scope(lane), deadline_scope(budget):
+                results = await self.run_batch([item for item, _, _, _ in batch])
+        except BaseException as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e if isinstance(e, Exception) else asyncio.CancelledError())
+            if not isinstance(e, Exception):
+                raise
+            return
+        for (_, future, _, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "gap_ms": round(self._gap * 1000, 1) if self._gap is not None else None,
+            "target_size": self.target_size(),
+            "window_ms": round(self.window() * 1000, 1),
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,128 @@
+"""
+Benchmark: cohort queries over the columnar analytics store
+Fills an AnalyticsStore with synthetic recommendations (20k students x 5
+careers per run, bundled majors and catalog careers) and times the advising
+queries: top careers by major, mean match score by MBTI type, and a filtered
+query. Fails if any query exceeds the budget.
+
+Run from backend/:  python benchmarks/bench_analytics.py [--rows 1000000] [--budget-ms 1000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from analytics import KINDS, RECOMMENDATION, AnalyticsStore  # noqa: E402
+from canonical import DATA_DIR  # noqa: E402
+from career_catalog import CareerCatalog  # noqa: E402
+
+COLLEGES = ["Stanford University", "University of Michigan", "Georgia Institute of Technology", "UCLA"]
+GRADES = ["Freshman", "Sophomore", "Junior", "Senior"]
+PER_STUDENT = 5
+RUNS = 5
+
+
+def fill(analytics: AnalyticsStore, rows: int, seed: int = 7):
+    """Synthetic rows appended in bulk, with every vocabulary filled like record() would"""
+    rng = np.random.default_rng(seed)
+    with open(os.path.join(DATA_DIR, "majors.json"), encoding="utf-8") as f:
+        majors = [major["name"] for major in json.load(f)]
+    catalog = CareerCatalog.get_instance()
+    vocabularies = analytics.vocabularies
+    for career_id, name in zip(catalog.ids, catalog.names):
+        vocabularies["career"].encode(career_id, name)
+    for major in majors:
+        vocabularies["major"].encode(major.lower(), major)
+    for college in COLLEGES:
+        vocabularies["college"].encode(college.lower(), college)
+    for grade in GRADES:
+        vocabularies["grade"].encode(grade.lower(), grade)
+
+    students = rows // PER_STUDENT
+    for student in range(students):
+        vocabularies["session"].encode(f"student-{student}")
+
+    def per_student(values):
+        return np.repeat(values, PER_STUDENT)
+
+    analytics.append({
+        "at": per_student(time.time() - rng.uniform(0, 365 * 86400, students)),
+        "kind": np.full(students * PER_STUDENT, KINDS.index(RECOMMENDATION)),
+        "session": per_student(np.arange(students)),
+        "college": per_student(rng.integers(0, len(COLLEGES), students)),
+        "major": per_student(rng.integers(0, len(majors), students)),
+        "grade": per_student(rng.integers(0, len(GRADES), students)),
+        "mbti": per_student(rng.integers(0, 16, students)),
+        "career": rng.integers(0, len(catalog.ids), students * PER_STUDENT),
+        "score": rng.integers(40, 100, students * PER_STUDENT),
+        "rank": np.tile(np.arange(1, PER_STUDENT + 1), students),
+    })
+
+
+def time_query(analytics: AnalyticsStore, **query) -> float:
+    """Best of RUNS, in milliseconds"""
+    best = float("inf")
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        analytics.group_by(**query)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    analytics = AnalyticsStore()
+    started = time.perf_counter()
+    fill(analytics, args.rows)
+    fill_ms = (time.perf_counter() - started) * 1000
+
+    # One record() per student through the real path, for the append rate
+    store = SimpleNamespace(
+        get_instance_id=lambda: "bench-student", college="Stanford", major="CS", grade="Junior",
+        mbti_scores={"ei": 30, "sn": 70, "tf": 40, "jp": 60},
+    )
+    careers = CareerCatalog.get_instance().names[:PER_STUDENT]
+    appends = 2000
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        for _ in range(appends):
+            analytics.record(store, RECOMMENDATION, careers, [90, 85, 80, 75, 70], [1, 2, 3, 4, 5])
+        record_us = (time.perf_counter() - started) * 1e6 / appends
+
+    queries = {
+        "top careers by major": dict(by="major", top=5),
+        "mean score by MBTI type": dict(by="mbti", top=0),
+        "top picks, one major, by year": dict(by="grade", filters={"major": "Computer Science"}, max_rank=1),
+        "top careers overall": dict(by=None, top=10),
+    }
+    results = {name: time_query(analytics, **query) for name, query in queries.items()}
+
+    print("\n=== Cohort analytics ===")
+    print(f"rows: {len(analytics):,} ({len(analytics.vocabularies['session']):,} students)")
+    print(f"bulk fill: {fill_ms:.0f} ms, record(): {record_us:.1f} us per student")
+    for name, ms in results.items():
+        print(f"{name:32s} {ms:8.1f} ms")
+    print(f"budget: {args.budget_ms} ms")
+    print("=========================\n")
+    slowest = max(results, key=results.get)
+    if results[slowest] > args.budget_ms:
+        sys.exit(f"'{slowest}' took {results[slowest]:.1f} ms, over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
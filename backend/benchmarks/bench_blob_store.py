@@ -0,0 +1,121 @@
+"""
+Benchmark: resident memory per 10k sessions, before and after the blob store
+Each mode runs in a fresh subprocess so the numbers don't contaminate each other.
+
+Run from backend/:  python benchmarks/bench_blob_store.py [--sessions 10000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+AGENTS_DIR = os.path.join(BACKEND_DIR, "agents")
+DISTINCT_COLLEGES = 200
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # ru_maxrss is a peak value (KiB on Linux, bytes on macOS)
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def load_fixtures():
+    """Load the saved agent outputs used as realistic payloads"""
+    with open(os.path.join(AGENTS_DIR, "web_search_results.txt")) as f:
+        summary = f.read()
+    with open(os.path.join(AGENTS_DIR, "career_reasoning_results.json")) as f:
+        reasoning = f.read()
+    with open(os.path.join(AGENTS_DIR, "career_plan_results.json")) as f:
+        plan = f.read()
+    return summary, reasoning, plan
+
+
+def session_outputs(i, summary, reasoning, plan):
+    """
+    Produce one session's outputs as freshly parsed objects, like an LLM
+    response would be. Summaries repeat per college; reasoning and plans are
+    personalised, so they differ per student.
+    """
+    college = f"College {i % DISTINCT_COLLEGES}"
+    student = f"Student{i}"
+    return (
+        summary.replace("Stanford", college),
+        json.loads(reasoning.replace("Alex", student)),
+        json.loads(plan.replace("Alex", student)),
+    )
+
+
+def run_mode(mode: str, sessions: int):
+    """Build the sessions in this process and print the RSS delta as JSON"""
+    summary, reasoning, plan = load_fixtures()
+
+    if mode == "blob":
+        from blob_store import BlobStore
+        fd, path = tempfile.mkstemp(suffix=".blobs")
+        os.close(fd)
+        BlobStore._instance = BlobStore(path)
+        blobs = BlobStore.get_instance()
+
+    baseline = rss_bytes()
+    held = []
+    for i in range(sessions):
+        text, reasoning_obj, plan_obj = session_outputs(i, summary, reasoning, plan)
+        if mode == "raw":
+            held.append((text, reasoning_obj, plan_obj))
+        else:
+            held.append((blobs.put_text(text), blobs.put_json(reasoning_obj), blobs.put_json(plan_obj)))
+    used = rss_bytes() - baseline
+
+    result = {"mode": mode, "sessions": sessions, "rss_bytes": used}
+    if mode == "blob":
+        # Spot-check that reads round-trip
+        assert blobs.get_json(held[-1][2])["career"] == json.loads(plan)["career"]
+        result.update(blobs.stats())
+        blobs.close()
+        os.unlink(path)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--mode", choices=["raw", "blob"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.sessions)
+        return
+
+    results = {}
+    for mode in ("raw", "blob"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--sessions", str(args.sessions)],
+            check=True, capture_output=True, text=True,
+        )
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"\n=== RSS for {args.sessions} sessions ===")
+    for mode, label in (("raw", "before (str/dict per session)"), ("blob", "after (blob handles)")):
+        mib = results[mode]["rss_bytes"] / (1024 * 1024)
+        print(f"{label:32s} {mib:8.1f} MiB")
+    blob = results["blob"]
+    print(f"\nDistinct blobs: {blob['blobs']}  raw: {blob['raw_bytes'] / 2**20:.1f} MiB  "
+          f"on disk: {blob['file_bytes'] / 2**20:.1f} MiB")
+    print("=========================\n")
+
+
+if __name__ == "__main__":
+    main()
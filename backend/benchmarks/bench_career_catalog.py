@@ -0,0 +1,75 @@
+"""
+Benchmark: ranking the career catalog against a profile
+Times the vectorized scorer on the bundled catalog (budget: 1 ms per ranking)
+and on a synthetic catalog 100x larger.
+
+Run from backend/:  python benchmarks/bench_career_catalog.py [--budget-ms 1.0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from career_catalog import CareerCatalog, CareerProfile, MBTI_DIMENSIONS  # noqa: E402
+from canonical import canonical_key  # noqa: E402
+
+RUNS = 2000
+
+
+def random_profile(rng: random.Random, catalog: CareerCatalog) -> CareerProfile:
+    priorities = list(catalog.priority_labels.values())
+    keywords = list(catalog.keyword_index)
+    majors = list(catalog.major_index)
+    return CareerProfile(
+        mbti={d: rng.randint(0, 100) for d in MBTI_DIMENSIONS},
+        priorities=rng.sample(priorities, 4),
+        major=canonical_key("major", rng.choice(majors)),
+        direction=rng.choice(["industry", "academia", "entrepreneurship", "creative", None]),
+        interests=rng.sample(keywords, 6),
+    )
+
+
+def time_rank(catalog: CareerCatalog, profiles) -> float:
+    """Median milliseconds per top-8 ranking"""
+    samples = []
+    for profile in profiles:
+        started = time.perf_counter()
+        catalog.rank(profile, 8)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    catalog = CareerCatalog.get_instance()
+    profiles = [random_profile(rng, catalog) for _ in range(RUNS)]
+    bundled = time_rank(catalog, profiles)
+
+    # Same careers repeated with new IDs: 100x the rows
+    large = CareerCatalog([
+        dict(career, id=f"{career['id']}-{i}") for i in range(100) for career in catalog.careers
+    ])
+    synthetic = time_rank(large, profiles[:200])
+
+    print("\n=== Career catalog ranking (median per profile) ===")
+    print(f"bundled catalog ({len(catalog)} careers):   {bundled:.3f} ms")
+    print(f"synthetic catalog ({len(large)} careers): {synthetic:.3f} ms")
+    print(f"budget: {args.budget_ms} ms")
+    print("=========================\n")
+    if bundled > args.budget_ms:
+        sys.exit(f"Ranking took {bundled:.3f} ms, over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: cold-start import budget for the API
+Runs `python -X importtime -c "import main"` in a fresh interpreter, reports
+the slowest modules and fails if importing the app exceeds the budget or
+pulls in the Anthropic SDK (which must stay lazy).
+
+Run from backend/:  python benchmarks/bench_import_time.py [--budget-ms 800]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported while the app starts
+LAZY_MODULES = ("anthropic",)
+
+
+def parse_importtime(stderr: str):
+    """Parse -X importtime output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PREWARM_CLIENT="0")
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        print(out.stderr)
+        sys.exit(out.returncode)
+
+    rows = parse_importtime(out.stderr)
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+    main_ms = next((cum for name, _, cum in rows if name == "main"), 0) / 1000
+    eager = sorted({name for name, _, _ in rows if name.split(".")[0] in LAZY_MODULES})
+
+    print(f"\n=== Import time for `import main` ===")
+    print(f"{'module':48s} {'self ms':>9s} {'cumul ms':>9s}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"{name:48s} {self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}")
+    print(f"\nmain (incl. create_app): {main_ms:.1f} ms   all imports: {total_ms:.1f} ms   "
+          f"budget: {args.budget_ms:.0f} ms")
+
+    failed = False
+    if main_ms > args.budget_ms:
+        print(f"FAIL: import exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager[:5])}")
+        failed = True
+    print("=========================\n")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: career plans from the skeleton library vs full generation
+Generates plans for several students who share a career, major and year,
+once with full per-student generation and once from a shared skeleton, and
+compares latency, output tokens and simple quality checks (schema, topic
+coverage, personalization, overlap with the full plan's steps).
+Calls the real API: needs ANTHROPIC_API_KEY.
+
+Run from backend/:  python benchmarks/bench_plan_skeletons.py [--students 5]
+"""
+import argparse
+import asyncio
+import dataclasses
+import os
+import re
+import sys
+import time
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import metrics  # noqa: E402
+from settings import configure, get_settings  # noqa: E402
+from state_store import StateStore  # noqa: E402
+
+AGENTS_DIR = os.path.join(BACKEND_DIR, "agents")
+
+NAMES = ["Alex", "Priya", "Marcus", "Sofia", "Jin", "Amara", "Diego", "Hannah"]
+PRIORITIES = [
+    ["Innovation", "Learning", "Financial security"],
+    ["Work-life balance", "Helping others", "Stability"],
+    ["Challenge", "Achievement", "Recognition"],
+    ["Creativity", "Autonomy", "Flexibility"],
+]
+INTERESTS = ["AI, hiking", "music, robotics", "startups, basketball", "photography, games"]
+
+# Topics every plan should cover, matched against section titles and descriptions
+TOPICS = {
+    "coursework": r"course|class|academic",
+    "extracurriculars": r"extracurricular|club|activit",
+    "experience": r"internship|research|experience",
+    "skills": r"skill",
+    "networking": r"network|connect|mentor",
+    "resources": r"resource|center|office",
+    "wellbeing": r"relax|fun|balance|well",
+}
+
+
+def set_student(i: int, college: str, major: str, grade: str):
+    store = StateStore.get_instance()
+    store.update_basic_info(name=NAMES[i % len(NAMES)], college=college, major=major, grade=grade, gender="")
+    store.update_mbti(20 + 15 * i % 60, 70 - 10 * i % 40, 30 + 20 * i % 50, 50)
+    store.update_priorities(PRIORITIES[i % len(PRIORITIES)])
+    store.update_goals_and_interests({"knowsGoals": True, "goalType": "industry", "interests": INTERESTS[i % len(INTERESTS)]})
+    with open(os.path.join(AGENTS_DIR, "web_search_results.txt")) as f:
+        store.update_web_search(f.read())
+    return store
+
+
+def quality(plan, name: str, college: str):
+    """Cheap quality signals for one plan"""
+    outline = " ".join(s["title"] + " " + s["description"] for s in plan["sections"]).lower()
+    text = str(plan)
+    return {
+        "sections": len(plan["sections"]),
+        "steps": sum(len(s["steps"]) for s in plan["sections"]),
+        "coverage": sum(bool(re.search(p, outline)) for p in TOPICS.values()) / len(TOPICS),
+        "name_mentions": text.count(name),
+        "college_mentions": text.count(college.split()[0]),
+    }
+
+
+def step_words(plan):
+    return {w for s in plan["sections"] for step in s["steps"] for w in re.findall(r"[a-z]+", step["title"].lower())}
+
+
+async def run_mode(skeletons: bool, students: int, career: str, college: str, major: str, grade: str):
+    from agents import planning_agent
+
+    configure(dataclasses.replace(get_settings(), plan_skeletons=skeletons))
+    planning_agent._plan_cache.clear()
+    results = []
+    for i in range(students):
+        store = set_student(i, college, major, grade)
+        before = metrics.snapshot()
+        started = time.perf_counter()
+        plan = await planning_agent.generate_career_plan(career)
+        elapsed = time.perf_counter() - started
+        after = metrics.snapshot()
+        tokens = sum(v - before.get(k, 0) for k, v in after.items() if k.startswith("llm.output_tokens."))
+        results.append({"seconds": elapsed, "tokens": tokens, "plan": plan, **quality(plan, store.name, college)})
+    return results
+
+
+def summarize(label: str, results):
+    warm = results[1:] or results
+    mean = lambda key, rows: sum(r[key] for r in rows) / len(rows)  # noqa: E731
+    print(f"{label:10s} first {results[0]['seconds']:6.1f}s  warm {mean('seconds', warm):6.1f}s  "
+          f"tokens {mean('tokens', warm):7.0f}  steps {mean('steps', results):5.1f}  "
+          f"coverage {mean('coverage', results):4.0%}  name {mean('name_mentions', results):4.1f}  "
+          f"college {mean('college_mentions', results):4.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5)
+    parser.add_argument("--career", default="Software Engineer")
+    parser.add_argument("--college", default="Stanford University")
+    parser.add_argument("--major", default="Computer Science")
+    parser.add_argument("--grade", default="Junior")
+    args = parser.parse_args()
+
+    if not get_settings().anthropic_api_key:
+        sys.exit("ANTHROPIC_API_KEY is not set; this benchmark calls the real API")
+
+    params = (args.students, args.career, args.college, args.major, args.grade)
+    full = await run_mode(False, *params)
+    skeleton = await run_mode(True, *params)
+
+    print(f"\n=== {args.students} plans: {args.career} / {args.major} / {args.grade} ===")
+    summarize("full", full)
+    summarize("skeleton", skeleton)
+    overlap = [
+        len(step_words(a["plan"]) & step_words(b["plan"])) / max(1, len(step_words(a["plan"]) | step_words(b["plan"])))
+        for a, b in zip(full, skeleton)
+    ]
+    print(f"\nStep-title overlap with the full plan: {sum(overlap) / len(overlap):.0%}")
+    print("=========================\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark: reasoning latency through the endpoint and the core function
+Times POST /api/reason and analyze_student_profile() on cache misses and
+hits. By default the model is replaced by the saved reasoning fixture (plus
+--model-latency seconds), so only our own overhead is measured; --live calls
+the real API instead.
+
+Run from backend/:  python benchmarks/bench_reasoning.py [--runs 200] [--budget-ms 25]
+"""
+import argparse
+import asyncio
+import dataclasses
+import os
+import sys
+import time
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from settings import get_settings  # noqa: E402
+from state_store import StateStore  # noqa: E402
+
+FIXTURE = os.path.join(BACKEND_DIR, "agents", "career_reasoning_results.json")
+
+
+def set_profile():
+    store = StateStore.get_instance()
+    store.update_basic_info(name="Alex", college="Stanford University", major="Computer Science",
+                            grade="Junior", gender="")
+    store.update_mbti(35, 70, 30, 60)
+    store.update_priorities(["Innovation", "Learning", "Financial security"])
+    store.update_goals_and_interests({"knowsGoals": True, "goalType": "industry", "interests": "AI, hiking"})
+    return store
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--model-latency", type=float, default=0.0)
+    parser.add_argument("--budget-ms", type=float, default=25.0, help="p95 budget for replayed cache misses")
+    parser.add_argument("--live", action="store_true", help="call the real API")
+    args = parser.parse_args()
+
+    from main import create_app
+    from agents import reasoning_agent
+    from llm import Completion
+
+    if args.live:
+        if not get_settings().anthropic_api_key:
+            sys.exit("ANTHROPIC_API_KEY is not set; --live calls the real API")
+    else:
+        with open(FIXTURE) as f:
+            fixture = f.read()
+
+        async def replay(agent, prompt, temperature=0, max_tokens=None):
+            await asyncio.sleep(args.model_latency)
+            return Completion(fixture, "replay", "end_turn", len(fixture) // 4, 0)
+
+        reasoning_agent.generate_text = replay
+
+    settings = dataclasses.replace(get_settings(), client_rate_per_minute=0, prewarm_client=False)
+    set_profile()
+    results = {}
+    with TestClient(create_app(settings)) as client:
+        def endpoint():
+            response = client.post("/api/reason")
+            assert response.status_code == 200, response.text
+
+        def core():
+            client.portal.call(reasoning_agent.analyze_student_profile)
+
+        for name, call in (("endpoint", endpoint), ("core", core)):
+            for cached in (False, True):
+                samples = []
+                for _ in range(args.runs if not args.live or cached else min(args.runs, 3)):
+                    if not cached:
+                        reasoning_agent._reasoning_cache.clear()
+                    started = time.perf_counter()
+                    call()
+                    samples.append(time.perf_counter() - started)
+                results[(name, cached)] = percentiles(samples)
+
+    print(f"\n=== Reasoning latency ({'live' if args.live else 'replayed model'}) ===")
+    for (name, cached), (p50, p95) in results.items():
+        label = f"{name} ({'hit' if cached else 'miss'})"
+        print(f"{label:18s} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+    print("=========================\n")
+    if not args.live:
+        worst = max(results[("endpoint", False)][1], results[("core", False)][1]) - args.model_latency * 1000
+        if worst > args.budget_ms:
+            sys.exit(f"Replayed miss p95 {worst:.2f} ms is over the {args.budget_ms} ms budget")
+
+
+if __name__ == "__main__":
+    main()
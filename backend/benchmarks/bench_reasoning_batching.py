@@ -0,0 +1,161 @@
+"""
+Benchmark: micro-batched vs unbatched reasoning calls at peak load
+A burst of students with different profiles asks for recommendations within
+--spread seconds. Each run goes through reasoning_completion() with batching
+off and then with each --windows setting, against a simulated model: the
+saved reasoning fixture is returned per student, after a delay of
+--ttft + output tokens / --tokens-per-second. Reports the input and output
+tokens per student, upstream calls, and p50/p95 latency.
+Upstream rate limits are switched off so only batching is compared. Simulated
+time runs --speedup times faster, and the results are scaled back.
+
+Run from backend/:  python benchmarks/bench_reasoning_batching.py [--students 48] [--windows 25 50 100]
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import io
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import llm  # noqa: E402
+from agents import reasoning_agent  # noqa: E402
+from career_catalog import CareerCatalog, profile_from_store  # noqa: E402
+from settings import configure, get_settings  # noqa: E402
+from token_budget import BudgetController  # noqa: E402
+
+FIXTURE = os.path.join(BACKEND_DIR, "agents", "career_reasoning_results.json")
+COLLEGES = ["Stanford University", "University of Michigan", "Georgia Institute of Technology", "UCLA"]
+MAJORS = ["Computer Science", "Biology", "Mechanical Engineering", "Psychology", "Economics"]
+PRIORITIES = ["Work-life balance", "Financial security", "Innovation", "Helping others", "Learning", "Stability"]
+INTERESTS = ["AI", "hiking", "music", "robotics", "healthcare", "writing", "startups", "climate"]
+STUDENT_LINE = re.compile(rf"^\s*{re.escape(reasoning_agent.BATCH_DELIMITER)} \d+\s*$", re.MULTILINE)
+
+
+class SimulatedModel:
+    """Stands in for the Anthropic client: counts tokens and sleeps like a streaming model would"""
+
+    def __init__(self, ttft: float, tokens_per_second: float, speedup: float):
+        with open(FIXTURE) as f:
+            self.fixture = f.read()
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.speedup = speedup
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.messages = self
+
+    async def create(self, model, messages, max_tokens, **kwargs):
+        prompt = messages[0]["content"]
+        students = len(STUDENT_LINE.findall(prompt))
+        if students:
+            text = "\n".join(f"{reasoning_agent.BATCH_DELIMITER} {i}\n{self.fixture}" for i in range(1, students + 1))
+        else:
+            text = self.fixture
+        output_tokens = len(text) // llm.CHARS_PER_TOKEN
+        self.calls += 1
+        self.input_tokens += len(prompt) // llm.CHARS_PER_TOKEN
+        self.output_tokens += output_tokens
+        await asyncio.sleep((self.ttft + output_tokens / self.tokens_per_second) / self.speedup)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            model=model,
+            stop_reason="end_turn",
+            usage=SimpleNamespace(input_tokens=len(prompt) // llm.CHARS_PER_TOKEN, output_tokens=output_tokens),
+        )
+
+
+def student_profiles(count: int, seed: int = 11):
+    """Distinct per-student prompt parts, built like build_reasoning() does"""
+    rng = random.Random(seed)
+    catalog = CareerCatalog.get_instance()
+    profiles = []
+    for _ in range(count):
+        store = SimpleNamespace(
+            college=rng.choice(COLLEGES),
+            major=rng.choice(MAJORS),
+            grade=rng.choice(["Freshman", "Sophomore", "Junior", "Senior"]),
+            mbti_scores={d: rng.randint(0, 100) for d in ("ei", "sn", "tf", "jp")},
+            priorities=rng.sample(PRIORITIES, 3),
+            goals_and_interests={"knowsGoals": True, "goalType": "industry",
+                                 "interests": ", ".join(rng.sample(INTERESTS, 2))},
+        )
+        candidates = catalog.rank(profile_from_store(store), reasoning_agent.CANDIDATES)
+        profiles.append(reasoning_agent.student_profile(store, candidates))
+    return profiles
+
+
+async def burst(profiles, spread: float):
+    """Latency of each student's call, arrivals uniformly spread"""
+    rng = random.Random(5)
+    arrivals = sorted(rng.uniform(0, spread) for _ in profiles)
+    started = time.monotonic()
+
+    async def one(profile, at):
+        await asyncio.sleep(at)
+        begun = time.monotonic()
+        completion = await reasoning_agent.reasoning_completion(profile)
+        assert reasoning_agent.parse_reasoning(completion.text) is not None
+        return time.monotonic() - begun
+
+    latencies = await asyncio.gather(*(one(p, at - (time.monotonic() - started)) for p, at in zip(profiles, arrivals)))
+    return sorted(latencies)
+
+
+def run(profiles, window_ms: float, max_batch: int, args):
+    model = SimulatedModel(args.ttft, args.tokens_per_second, args.speedup)
+    llm._client = model
+    configure(dataclasses.replace(
+        get_settings(), upstream_rpm=0, upstream_tpm=0,
+        reasoning_batch_window_ms=window_ms / args.speedup, reasoning_batch_max=max_batch,
+    ))
+    reasoning_agent._reasoning_batcher = None
+    BudgetController._instance = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies = asyncio.run(burst(profiles, args.spread / args.speedup))
+    scale = args.speedup
+    return {
+        "calls": model.calls,
+        "input": model.input_tokens / len(profiles),
+        "output": model.output_tokens / len(profiles),
+        "p50": latencies[len(latencies) // 2] * scale,
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * scale,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=48)
+    parser.add_argument("--spread", type=float, default=1.0, help="seconds over which the burst arrives")
+    parser.add_argument("--windows", type=float, nargs="+", default=[25, 50, 100], help="batch windows (ms)")
+    parser.add_argument("--max-batch", type=int, default=get_settings().reasoning_batch_max)
+    parser.add_argument("--ttft", type=float, default=0.8, help="simulated time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--speedup", type=float, default=20)
+    args = parser.parse_args()
+
+    profiles = student_profiles(args.students)
+    results = {"unbatched": run(profiles, 0, 1, args)}
+    for window in args.windows:
+        results[f"window {window:g} ms, max {args.max_batch}"] = run(profiles, window, args.max_batch, args)
+
+    print(f"\n=== Reasoning micro-batching ({args.students} students in {args.spread:g} s) ===")
+    print(f"{'':28s} {'calls':>6s} {'in tok/student':>15s} {'out tok/student':>16s} {'p50 s':>7s} {'p95 s':>7s}")
+    for name, r in results.items():
+        print(f"{name:28s} {r['calls']:6d} {r['input']:15.0f} {r['output']:16.0f} {r['p50']:7.1f} {r['p95']:7.1f}")
+    print("=========================\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: serving the saved career plan fixture
+Compares what FastAPI does for a returned dict (validate through
+response_model, then serialize) with the cached fast path (pre-validated
+bytes from the blob store, optionally pre-compressed).
+
+Run from backend/:  python benchmarks/bench_serialization.py [--number 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder
+
+from agents.planning_agent import CareerPlanResponse
+from blob_store import BlobStore
+from responses import _compress, _compressed_cache, dumps, orjson
+
+FIXTURE = os.path.join(BACKEND_DIR, "agents", "career_plan_results.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(FIXTURE) as f:
+        plan = json.load(f)
+
+    fd, path = tempfile.mkstemp(suffix=".blobs")
+    os.close(fd)
+    blobs = BlobStore(path)
+    payload = CareerPlanResponse.model_validate(plan).model_dump_json().encode("utf-8")
+    handle = blobs.put_bytes(payload)
+    gzipped = _compress(payload, "gzip")
+    _compressed_cache.set((handle, "gzip"), gzipped)
+
+    def response_model_path():
+        # Roughly FastAPI's serialize_response + JSONResponse.render for a dict
+        model = CareerPlanResponse.model_validate(plan)
+        return json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def fast_json_path():
+        # Dict rendered with the fast encoder, no re-validation
+        return dumps(plan)
+
+    def cached_bytes_path():
+        # Cache hit: decompress the pre-validated bytes from the blob store
+        return blobs.get_bytes(handle)
+
+    def cached_gzip_path():
+        # Cache hit with the compressed variant already cached
+        return _compressed_cache.get((handle, "gzip"))
+
+    cases = [
+        ("response_model (validate + json)", response_model_path),
+        (f"fast encoder ({'orjson' if orjson else 'json'})", fast_json_path),
+        ("cached validated bytes", cached_bytes_path),
+        ("cached gzip bytes", cached_gzip_path),
+    ]
+
+    print(f"\n=== Serving the plan fixture ({len(payload)} bytes, gzip {len(gzipped)} bytes) ===")
+    baseline = None
+    for label, fn in cases:
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        baseline = baseline or seconds
+        print(f"{label:36s} {seconds * 1e6:9.1f} µs/call   {baseline / seconds:6.1f}x")
+    print("=========================\n")
+
+    blobs.close()
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
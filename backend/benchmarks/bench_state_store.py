@@ -0,0 +1,125 @@
+"""
+Benchmark: memory per session, dict-based vs compact StateStore
+Allocates N sessions with each layout (traced with tracemalloc) and reports
+bytes per session, idle and with a typical profile filled in. The dict-based
+layout is the StateStore as it was before the compact representation.
+
+Run from backend/:  python benchmarks/bench_state_store.py [--sessions 100000]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+import uuid
+
+# Fix import path for backend modules
+# This allows the file to be run directly from any directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from state_store import StateStore  # noqa: E402
+
+COLLEGES = ["Stanford University", "University of Michigan", "Georgia Institute of Technology", "UCLA"]
+MAJORS = ["Computer Science", "Biology", "Mechanical Engineering", "Psychology", "Economics"]
+PRIORITIES = ["Work-life balance", "Financial security", "Innovation", "Helping others", "Learning", "Stability"]
+
+
+class DictSession:
+    """The previous StateStore layout: instance __dict__ and nested dicts"""
+
+    def __init__(self):
+        self._revision = 0
+        self._versions = {}
+        self.instance_id = str(uuid.uuid4())
+        self.name = ""
+        self.college = ""
+        self.major = ""
+        self.grade = ""
+        self.gender = ""
+        self._web_search_handle = None
+        self._career_reasoning_handle = None
+        self._career_plan_handle = None
+        self.mbti_scores = {"ei": 50, "sn": 50, "tf": 50, "jp": 50}
+        self.priorities = []
+        self.goals_and_interests = {
+            "knowsGoals": False,
+            "goalType": None,
+            "goals": None,
+            "interests": "",
+            "skills": ""
+        }
+        self.career_options = []
+        self.selected_career = None
+        self.served_models = {}
+
+    def update_basic_info(self, name, college, major, grade, gender):
+        self.name, self.college, self.major, self.grade, self.gender = name, college, major, grade, gender
+
+    def update_mbti(self, ei, sn, tf, jp):
+        self.mbti_scores = {"ei": ei, "sn": sn, "tf": tf, "jp": jp}
+
+    def update_priorities(self, priorities):
+        self.priorities = priorities
+
+    def update_goals_and_interests(self, goals):
+        self.goals_and_interests = goals
+
+
+def request_profile(i: int):
+    """One student's profile as freshly parsed request JSON (no strings shared between sessions)"""
+    return json.loads(json.dumps({
+        "name": f"Student {i}",
+        "college": COLLEGES[i % len(COLLEGES)],
+        "major": MAJORS[i % len(MAJORS)],
+        "grade": "Junior",
+        "gender": "",
+        "mbti": [i % 101, (i * 7) % 101, (i * 13) % 101, (i * 29) % 101],
+        "priorities": [PRIORITIES[(i + k) % len(PRIORITIES)] for k in range(3)],
+        "goals": {"knowsGoals": True, "goalType": "industry", "goals": None, "interests": "AI, hiking", "skills": ""},
+    }))
+
+
+def fill(session, profile):
+    session.update_basic_info(profile["name"], profile["college"], profile["major"], profile["grade"], profile["gender"])
+    session.update_mbti(*profile["mbti"])
+    session.update_priorities(profile["priorities"])
+    session.update_goals_and_interests(profile["goals"])
+
+
+def bytes_per_session(factory, sessions: int, filled: bool) -> float:
+    """Traced bytes still allocated per session once N sessions exist"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    held = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(sessions):
+            session = factory()
+            if filled:
+                # The request payload is freed; only what the session keeps counts
+                fill(session, request_profile(i))
+            held.append(session)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del held
+    return used / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"\n=== Bytes per session ({args.sessions} sessions) ===")
+    print(f"{'':10s} {'dict-based':>12s} {'compact':>12s}")
+    for filled in (False, True):
+        before = bytes_per_session(DictSession, args.sessions, filled)
+        after = bytes_per_session(StateStore, args.sessions, filled)
+        print(f"{'filled' if filled else 'idle':10s} {before:12.0f} {after:12.0f}   ({before / after:.1f}x smaller)")
+    print("=========================\n")
+
+
+if __name__ == "__main__":
+    main()
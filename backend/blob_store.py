@@ -0,0 +1,257 @@
+"""
+Blob store for ClaudeClimb
+Keeps large agent outputs (web search summaries, reasoning JSON, plans) out of
+the per-session objects: each blob is compressed once, appended to a single
+file and read back through a memory map. Sessions only keep small handles.
+Identical blobs are stored once.
+Each record starts with a header (digest, sizes, codec), so reopening an
+existing file rebuilds the index and keeps deduplicating against it. Once
+the file passes blob_max_bytes it is compacted: blobs no handle refers to
+any more are dropped. A temporary file (no blob_path) is removed on close.
+"""
+
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import weakref
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+from settings import get_settings
+
+# zstd is preferred when installed; zlib keeps the store usable without it
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+
+# digest, compressed length, raw size, codec
+RECORD = struct.Struct("<16sIIB")
+
+
+class BlobHandle:
+    """
+    Small reference to a blob inside the store
+    Equal handles have equal content. The store keeps a blob through
+    compaction for as long as a handle to it is alive.
+    """
+    __slots__ = ("digest", "raw_size", "__weakref__")
+
+    def __init__(self, digest: bytes, raw_size: int):
+        self.digest = digest
+        self.raw_size = raw_size
+
+    def __eq__(self, other):
+        return isinstance(other, BlobHandle) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return f"BlobHandle({self.digest.hex()}, {self.raw_size})"
+
+
+class _Location(NamedTuple):
+    """Where a blob's compressed bytes are in the file"""
+    offset: int
+    length: int
+    codec: int
+    raw_size: int
+
+
+class BlobStore:
+    """Append-only, compressed, memory-mapped blob file"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared blob store (path and size bound from settings)"""
+        if cls._instance is None:
+            settings = get_settings()
+            cls._instance = BlobStore(settings.blob_path, settings.blob_max_bytes)
+        return cls._instance
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 0):
+        """
+        Open (or create) the blob file at path, or a temporary file that is
+        removed on close; max_bytes (0 = unbounded) triggers compaction
+        """
+        self._temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="claudeclimb-", suffix=".blobs")
+            os.close(fd)
+            atexit.register(self.close)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._compact_at = max_bytes
+        self.compactions = 0
+        self._map = None
+        self._mapped_size = 0
+        self._index: Dict[bytes, _Location] = {}
+        self._handles: "weakref.WeakValueDictionary[bytes, BlobHandle]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        self._size = self._load()
+
+        if zstandard is not None:
+            self._codec = CODEC_ZSTD
+            self._compressor = zstandard.ZstdCompressor(level=3)
+            self._decompressor = zstandard.ZstdDecompressor()
+        else:
+            self._codec = CODEC_ZLIB
+
+    def _load(self) -> int:
+        """Index the records already in the file; a torn record at the end is cut off"""
+        self._file.seek(0)
+        offset = 0
+        while True:
+            header = self._file.read(RECORD.size)
+            if len(header) < RECORD.size:
+                break
+            digest, length, raw_size, codec = RECORD.unpack(header)
+            start = offset + RECORD.size
+            if self._file.seek(start + length) > os.fstat(self._file.fileno()).st_size:
+                break
+            self._index[digest] = _Location(start, length, codec, raw_size)
+            offset = start + length
+        self._file.truncate(offset)
+        self._file.seek(0, os.SEEK_END)
+        return offset
+
+    # --------------------------------------------------------
+    # Writes
+    # --------------------------------------------------------
+    def put_bytes(self, data: bytes) -> BlobHandle:
+        """Store raw bytes and return a handle; duplicate data is stored once"""
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self._lock:
+            handle = self._handles.get(digest)
+            if handle is not None:
+                return handle
+            handle = self._handles[digest] = BlobHandle(digest, len(data))
+            if digest in self._index:
+                return handle
+
+            compressed = self._compress(data)
+            self._file.write(RECORD.pack(digest, len(compressed), len(data), self._codec) + compressed)
+            self._file.flush()
+            self._index[digest] = _Location(self._size + RECORD.size, len(compressed), self._codec, len(data))
+            self._size += RECORD.size + len(compressed)
+            if self._compact_at and self._size > self._compact_at:
+                self._compact()
+            return handle
+
+    def put_text(self, text: str) -> BlobHandle:
+        """Store a string"""
+        return self.put_bytes(text.encode("utf-8"))
+
+    def put_json(self, obj: Any) -> BlobHandle:
+        """Store a JSON-serialisable object"""
+        return self.put_bytes(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+    def _compact(self):
+        """Rewrite the file with only the blobs that still have handles (lock held)"""
+        live = {digest: self._index[digest] for digest in list(self._handles.keys()) if digest in self._index}
+        self._ensure_mapped(self._size)
+        source = self._map
+        path = self.path + ".compact"
+        index: Dict[bytes, _Location] = {}
+        with open(path, "wb") as out:
+            for digest, location in live.items():
+                out.write(RECORD.pack(digest, location.length, location.raw_size, location.codec))
+                index[digest] = location._replace(offset=out.tell())
+                out.write(source[location.offset:location.offset + location.length])
+            size = out.tell()
+        os.replace(path, self.path)
+        self._file.close()
+        self._file = open(self.path, "a+b")
+        # Readers may still hold views of the old map, so it is left for the
+        # garbage collector instead of closed
+        self._map = None
+        self._mapped_size = 0
+        self._index = index
+        self._size = size
+        self.compactions += 1
+        # Mostly live data: wait for as much garbage again before the next pass
+        self._compact_at = max(self.max_bytes, 2 * size)
+
+    # --------------------------------------------------------
+    # Reads
+    # --------------------------------------------------------
+    def get_bytes(self, handle: BlobHandle) -> bytes:
+        """Read and decompress the blob behind a handle"""
+        view, codec = self._view(handle)
+        try:
+            if codec == CODEC_ZSTD:
+                return self._decompressor.decompress(view, max_output_size=handle.raw_size)
+            return zlib.decompress(view)
+        finally:
+            view.release()
+
+    def get_text(self, handle: BlobHandle) -> str:
+        """Read a string"""
+        return self.get_bytes(handle).decode("utf-8")
+
+    def get_json(self, handle: BlobHandle) -> Any:
+        """Read a JSON object"""
+        return json.loads(self.get_bytes(handle))
+
+    def stats(self) -> Dict[str, int]:
+        """Sizes for debugging and benchmarks"""
+        handles = list(self._handles.values())
+        return {
+            "blobs": len(self._index),
+            "live_blobs": len(handles),
+            "raw_bytes": sum(h.raw_size for h in handles),
+            "file_bytes": self._size,
+            "compactions": self.compactions,
+        }
+
+    def close(self):
+        """Close the map and the underlying file (removing it if temporary)"""
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+            if self._temporary:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+    # --------------------------------------------------------
+    # Internals
+    # --------------------------------------------------------
+    def _compress(self, data: bytes) -> bytes:
+        if self._codec == CODEC_ZSTD:
+            return self._compressor.compress(data)
+        return zlib.compress(data, 6)
+
+    def _ensure_mapped(self, end: int):
+        """Remap if the file grew past the map (lock held)"""
+        if end > self._mapped_size:
+            # Old views may still reference the previous map, so it is left
+            # for the garbage collector instead of closed
+            self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+            self._mapped_size = self._size
+
+    def _view(self, handle: BlobHandle):
+        """Zero-copy view of the compressed bytes and their codec"""
+        with self._lock:
+            location = self._index.get(handle.digest)
+            if location is None:
+                raise KeyError(f"{handle!r} is not in the blob store")
+            end = location.offset + location.length
+            self._ensure_mapped(end)
+            return memoryview(self._map)[location.offset:end], location.codec
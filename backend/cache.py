@@ -0,0 +1,185 @@
+"""
+Result caches for agent outputs
+Small LRU caches with optional TTL; keys are built from canonical college and
+major IDs (see canonical.py) so spelling variants share entries.
+Concurrent misses for the same key share one computation (SingleFlight).
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+from canonical import canonical_key
+from deadlines import deadline_scope
+from scheduler import LANES, current_lane
+
+
+class ResultCache:
+    """LRU cache with optional time-to-live"""
+    _registry: List["ResultCache"] = []
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        ResultCache._registry.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, or None on miss/expiry"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value (ttl_seconds overrides the cache's TTL), evicting the least recently used entry if full"""
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """Stats for every cache created in this process"""
+        return {cache.name: cache.stats() for cache in cls._registry}
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    One in-flight computation per key, shared by concurrent callers
+    When every caller has gone (cancelled or timed out) the computation is
+    cancelled too, unless keep_on_abandon is set: work whose result is shared
+    and cached for everyone is worth finishing anyway, and then runs without
+    the first caller's deadline.
+    A computation runs in the scheduler lane of the caller that started it.
+    Callers join computations in their own or a higher lane, so an
+    interactive request never waits behind speculative batch work; it starts
+    its own computation, with its own lane and deadline.
+    """
+
+    def __init__(self, name: str, keep_on_abandon: bool = False):
+        self.name = name
+        self.keep_on_abandon = keep_on_abandon
+        self._flights: Dict[Tuple[str, Hashable], _Flight] = {}
+
+    def _joinable(self, key: Hashable) -> Optional[_Flight]:
+        lane = current_lane()
+        for candidate in LANES[:LANES.index(lane) + 1]:
+            flight = self._flights.get((candidate, key))
+            if flight is not None:
+                return flight
+        return None
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the computation for key, starting it with factory() if none is running"""
+        flight = self._joinable(key)
+        if flight is None:
+            if self.keep_on_abandon:
+                with deadline_scope(None):
+                    task = asyncio.ensure_future(factory())
+            else:
+                task = asyncio.ensure_future(factory())
+            flight_key = (current_lane(), key)
+            if any((lane, key) in self._flights for lane in LANES):
+                metrics.incr(f"singleflight.overtaken.{self.name}")
+            flight = self._flights[flight_key] = _Flight(task)
+            task.add_done_callback(lambda done, flight_key=flight_key: self._finished(flight_key, done))
+        else:
+            metrics.incr(f"singleflight.shared.{self.name}")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                if self.keep_on_abandon:
+                    metrics.incr(f"singleflight.kept.{self.name}")
+                else:
+                    metrics.incr(f"singleflight.abandoned.{self.name}")
+                    flight.task.cancel()
+
+    def _finished(self, flight_key: Tuple[str, Hashable], task: asyncio.Future):
+        flight = self._flights.get(flight_key)
+        if flight is None or flight.task is not task:
+            return
+        del self._flights[flight_key]
+        # Nobody awaits a kept task any more; report its error here
+        if not task.cancelled() and task.exception() is not None and not flight.waiters:
+            print(f"Warning: {self.name} computation failed: {str(task.exception())}")
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+# ============================================================
+# Cache keys
+# ============================================================
+def digest(value: Any) -> str:
+    """Short stable digest of a JSON-serialisable value"""
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def web_search_key(college: str, major: str) -> tuple:
+    """Key for a web search result"""
+    return (canonical_key("college", college), canonical_key("major", major))
+
+
+def profile_key(store, fields: Tuple[str, ...]) -> str:
+    """
+    Digest of the profile fields a prompt is built from (see
+    state_store.ARTIFACT_INPUTS), with college and major canonicalized
+    """
+    values = {}
+    for field in fields:
+        value = getattr(store, field, None)
+        if field in ("college", "major"):
+            value = canonical_key(field, value)
+        elif isinstance(value, str) and field != "web_search_results":
+            value = value.strip().lower()
+        values[field] = value
+    return digest(values)
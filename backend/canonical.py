@@ -0,0 +1,244 @@
+"""
+Canonicalization of free-text college and major names
+Maps "Stanford", "Stanford University" and "stanford univ." to the same
+canonical ID using the bundled lists in data/, so caches keyed on the
+college/major actually hit. Also powers prefix autocomplete.
+Only names and aliases match, give or take filler words and a typo per
+word: two institutions or majors that differ by a word ("Michigan State",
+"Washington University", "Business Analytics") are never merged.
+"""
+
+import bisect
+import json
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+KINDS = {
+    "college": "colleges.json",
+    "major": "majors.json",
+}
+
+# Abbreviations expanded before matching (applied to data and input alike)
+ABBREVIATIONS = {
+    "univ": "university",
+    "uni": "university",
+    "coll": "college",
+    "inst": "institute",
+    "st": "saint",
+    "poly": "polytechnic",
+    "eng": "engineering",
+    "engr": "engineering",
+    "sci": "science",
+}
+
+# Filler words dropped for the "core" form. Words such as university,
+# college, state or community stay: they tell institutions apart
+GENERIC_WORDS = {
+    "college": {"the", "of", "at", "in", "and"},
+    "major": {"the", "of", "in", "and", "ba", "bs", "bsc", "bachelor", "bachelors", "major", "degree"},
+}
+
+# Typo tolerance: trigram similarity of the whole core form, and edits per
+# word (none for words shorter than TYPO_MIN_LENGTH or containing digits)
+FUZZY_THRESHOLD = 0.5
+TYPO_MIN_LENGTH = 5
+
+
+class CanonicalEntry(NamedTuple):
+    """A canonical college or major"""
+    id: str
+    name: str
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip punctuation and expand common abbreviations"""
+    text = text.lower().replace("&", " and ")
+    words = re.findall(r"[a-z0-9]+", text)
+    return " ".join(ABBREVIATIONS.get(w, w) for w in words)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance with adjacent transpositions, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _same_words(a: List[str], b: List[str]) -> bool:
+    """Same words in the same order, allowing a typo in longer words"""
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x == y:
+            continue
+        if min(len(x), len(y)) < TYPO_MIN_LENGTH or any(c.isdigit() for c in x + y):
+            return False
+        limit = 1 if len(x) < 9 else 2
+        if _edit_distance(x, y, limit) > limit:
+            return False
+    return True
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class CanonicalIndex:
+    """Exact alias table + trigram index + sorted prefix index for one kind"""
+
+    def __init__(self, kind: str, entries: List[Dict]):
+        self.kind = kind
+        self._generic = GENERIC_WORDS[kind]
+        self.entries = [CanonicalEntry(e["id"], e["name"]) for e in entries]
+
+        self._exact: Dict[str, int] = {}
+        self._core: Dict[str, set] = {}
+        self._core_owner: List[int] = []
+        self._core_words: List[List[str]] = []
+        self._core_gram_counts: List[int] = []
+        self._trigram_index: Dict[str, List[int]] = {}
+        prefix_keys = []
+
+        for idx, entry in enumerate(entries):
+            for form in [entry["name"]] + entry.get("aliases", []):
+                norm = normalize(form)
+                if not norm:
+                    continue
+                self._exact.setdefault(norm, idx)
+
+                core = self._core_form(norm)
+                self._core.setdefault(core, set()).add(idx)
+                form_id = len(self._core_owner)
+                self._core_owner.append(idx)
+                self._core_words.append(core.split())
+                grams = set(_trigrams(core))
+                self._core_gram_counts.append(len(grams))
+                for gram in grams:
+                    self._trigram_index.setdefault(gram, []).append(form_id)
+
+                # Every word start is a prefix entry point ("berk" → UC Berkeley)
+                words = norm.split()
+                for start in range(len(words)):
+                    prefix_keys.append((" ".join(words[start:]), start, idx))
+
+        prefix_keys.sort()
+        self._prefix_keys = [k for k, _, _ in prefix_keys]
+        self._prefix_meta = [(start, idx) for _, start, idx in prefix_keys]
+
+    @classmethod
+    def load(cls, kind: str) -> "CanonicalIndex":
+        """Load the bundled list for a kind ("college" or "major")"""
+        with open(os.path.join(DATA_DIR, KINDS[kind])) as f:
+            return cls(kind, json.load(f))
+
+    def _core_form(self, norm: str) -> str:
+        core = " ".join(w for w in norm.split() if w not in self._generic)
+        return core or norm
+
+    def lookup(self, text: str) -> Optional[CanonicalEntry]:
+        """Map free text to a canonical entry, or None if nothing is close enough"""
+        norm = normalize(text)
+        if not norm:
+            return None
+
+        idx = self._exact.get(norm)
+        if idx is not None:
+            return self.entries[idx]
+
+        core = self._core_form(norm)
+        owners = self._core.get(core)
+        if owners and len(owners) == 1:
+            return self.entries[next(iter(owners))]
+
+        # Typos: Dice coefficient over trigrams of the core form, then the
+        # same words apart from an edit or two
+        words = core.split()
+        grams = set(_trigrams(core))
+        shared = Counter()
+        for gram in grams:
+            for form_id in self._trigram_index.get(gram, ()):
+                shared[form_id] += 1
+
+        best_score, best_owners = 0.0, set()
+        for form_id, count in shared.items():
+            score = 2 * count / (len(grams) + self._core_gram_counts[form_id])
+            if score < FUZZY_THRESHOLD or not _same_words(words, self._core_words[form_id]):
+                continue
+            if score > best_score:
+                best_score, best_owners = score, {self._core_owner[form_id]}
+            elif score == best_score:
+                best_owners.add(self._core_owner[form_id])
+
+        # Ambiguous matches ("Boston" → BU or BC) are left uncanonicalized
+        if len(best_owners) == 1:
+            return self.entries[best_owners.pop()]
+        return None
+
+    def complete(self, prefix: str, limit: int = 8) -> List[CanonicalEntry]:
+        """Entries whose name or alias has a word starting with prefix"""
+        norm = normalize(prefix)
+        if not norm:
+            return []
+
+        pos = bisect.bisect_left(self._prefix_keys, norm)
+        ranked = {}
+        while pos < len(self._prefix_keys) and self._prefix_keys[pos].startswith(norm):
+            start, idx = self._prefix_meta[pos]
+            if idx not in ranked or start < ranked[idx]:
+                ranked[idx] = start
+            pos += 1
+
+        # Matches at the start of a name rank above mid-name matches
+        order = sorted(ranked, key=lambda i: (ranked[i] > 0, len(self.entries[i].name), self.entries[i].name))
+        return [self.entries[i] for i in order[:limit]]
+
+
+# ============================================================
+# Module-level helpers
+# ============================================================
+_indexes: Dict[str, CanonicalIndex] = {}
+
+
+def get_index(kind: str) -> CanonicalIndex:
+    """Get the (lazily built) index for a kind"""
+    index = _indexes.get(kind)
+    if index is None:
+        index = _indexes[kind] = CanonicalIndex.load(kind)
+    return index
+
+
+@lru_cache(maxsize=4096)
+def canonicalize(kind: str, text: str) -> Optional[CanonicalEntry]:
+    """Canonical entry for free text, or None if unknown"""
+    return get_index(kind).lookup(text)
+
+
+def canonical_key(kind: str, text: str) -> str:
+    """Stable cache key: the canonical ID, or the normalized text if unknown"""
+    entry = canonicalize(kind, text or "")
+    if entry is not None:
+        return entry.id
+    return "raw:" + normalize(text or "")
+
+
+def canonical_name(kind: str, text: str) -> str:
+    """Canonical display name, falling back to the text as given"""
+    entry = canonicalize(kind, text or "")
+    return entry.name if entry is not None else text
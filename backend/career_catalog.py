@@ -0,0 +1,264 @@
+"""
+Bundled career catalog and profile scorer
+O*NET-style occupations (data/careers.json) with trait vectors for the MBTI
+dimensions, priorities, majors, career directions and interest keywords.
+The whole catalog is scored against a profile with a few matrix-vector
+products. The reasoning agent only asks the model to explain and refine the
+top candidates, and answers from the scorer alone when the model is
+unavailable.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from canonical import DATA_DIR, canonical_key, canonical_name, normalize
+
+CATALOG_FILE = "careers.json"
+
+MBTI_DIMENSIONS = ("ei", "sn", "tf", "jp")
+MBTI_LABELS = {
+    "ei": ("Introversion", "Extraversion"),
+    "sn": ("Sensing", "Intuition"),
+    "tf": ("Thinking", "Feeling"),
+    "jp": ("Judging", "Perceiving"),
+}
+DIRECTIONS = ("industry", "academia", "entrepreneurship", "creative")
+
+# Share of each component in the 0-100 match score
+WEIGHTS = {
+    "major": 0.30,
+    "mbti": 0.25,
+    "priorities": 0.25,
+    "direction": 0.10,
+    "interests": 0.10,
+}
+RELATED_MAJOR = 0.5
+NEUTRAL = 0.5
+
+
+class CareerProfile(NamedTuple):
+    """The parts of a student profile the scorer uses"""
+    mbti: Dict[str, int]
+    priorities: List[str]
+    major: str
+    direction: Optional[str]
+    interests: List[str]
+
+
+class ScoredCareer(NamedTuple):
+    """A catalog career ranked for a profile"""
+    id: str
+    name: str
+    description: str
+    score: int
+    components: Dict[str, float]
+    matched_priorities: List[str]
+    matched_interests: List[str]
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def profile_from_store(store) -> CareerProfile:
+    """Extract the scorer's inputs from the state store"""
+    goals = getattr(store, "goals_and_interests", {}) or {}
+    direction = goals.get("goalType") if goals.get("knowsGoals") else None
+    text = " ".join(str(goals.get(field, "")) for field in ("interests", "skills", "goals"))
+    return CareerProfile(
+        mbti=dict(store.mbti_scores),
+        priorities=list(store.priorities),
+        major=canonical_key("major", store.major),
+        direction=direction,
+        interests=_words(text),
+    )
+
+
+def career_key(name: str) -> str:
+    """Catalog ID of a career title, or its normalized text if not in the catalog"""
+    text = normalize(re.sub(r"\(.*?\)", "", name or ""))
+    return CareerCatalog.get_instance().name_index.get(text) or "raw:" + normalize(name or "")
+
+
+class CareerCatalog:
+    """Careers as dense trait matrices, one row per career"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the catalog loaded from data/careers.json"""
+        if cls._instance is None:
+            with open(os.path.join(DATA_DIR, CATALOG_FILE), encoding="utf-8") as f:
+                cls._instance = CareerCatalog(json.load(f))
+        return cls._instance
+
+    def __init__(self, careers: List[Dict]):
+        self.careers = careers
+        n = len(careers)
+        self.ids = [career["id"] for career in careers]
+        self.names = [career["name"] for career in careers]
+        # "Entrepreneur / Startup Founder" also answers to each half
+        self.name_index: Dict[str, str] = {}
+        for career in careers:
+            for name in [career["name"]] + career["name"].split("/"):
+                self.name_index.setdefault(normalize(re.sub(r"\(.*?\)", "", name)), career["id"])
+
+        # Vocabularies: column index per priority, major and interest keyword
+        self.priority_index = self._vocabulary(p.lower() for c in careers for p in c["priorities"])
+        self.major_index = self._vocabulary(m for c in careers for m in c["majors"] + c["related_majors"])
+        self.keyword_index = self._vocabulary(k for c in careers for k in c["keywords"])
+        self.priority_labels = {p.lower(): p for c in careers for p in c["priorities"]}
+
+        # MBTI ideal per dimension in [-1, 1] (negative = first letter)
+        self.mbti = np.array(
+            [[(c["mbti"][d] - 50) / 50 for d in MBTI_DIMENSIONS] for c in careers],
+            dtype=np.float32,
+        )
+        self.priorities = np.zeros((n, len(self.priority_index)), dtype=np.float32)
+        self.majors = np.zeros((n, len(self.major_index)), dtype=np.float32)
+        self.directions = np.zeros((n, len(DIRECTIONS)), dtype=np.float32)
+        self.keywords = np.zeros((n, len(self.keyword_index)), dtype=np.float32)
+        for row, career in enumerate(careers):
+            for priority in career["priorities"]:
+                self.priorities[row, self.priority_index[priority.lower()]] = 1
+            for major in career["related_majors"]:
+                self.majors[row, self.major_index[major]] = RELATED_MAJOR
+            for major in career["majors"]:
+                self.majors[row, self.major_index[major]] = 1
+            for direction in career["directions"]:
+                self.directions[row, DIRECTIONS.index(direction)] = 1
+            for keyword in career["keywords"]:
+                self.keywords[row, self.keyword_index[keyword]] = 1
+        self._weights = np.array([WEIGHTS[name] for name in WEIGHTS], dtype=np.float32)
+
+    @staticmethod
+    def _vocabulary(values) -> Dict[str, int]:
+        index: Dict[str, int] = {}
+        for value in values:
+            index.setdefault(value, len(index))
+        return index
+
+    def __len__(self):
+        return len(self.careers)
+
+    # ------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------
+    def components(self, profile: CareerProfile) -> np.ndarray:
+        """Per-career fit in [0, 1] for each component, shape (careers, len(WEIGHTS))"""
+        n = len(self.careers)
+        out = np.full((n, len(WEIGHTS)), NEUTRAL, dtype=np.float32)
+
+        major = self.major_index.get(profile.major)
+        if major is not None:
+            out[:, 0] = self.majors[:, major]
+
+        # Alignment weighted by how strong each preference is
+        prefs = np.array([(profile.mbti.get(d, 50) - 50) / 50 for d in MBTI_DIMENSIONS], dtype=np.float32)
+        strength = float(np.abs(prefs).sum())
+        if strength:
+            out[:, 1] = NEUTRAL + NEUTRAL * (self.mbti @ prefs) / strength
+
+        wanted = [self.priority_index[p.lower()] for p in profile.priorities if p.lower() in self.priority_index]
+        if wanted:
+            out[:, 2] = self.priorities[:, wanted].sum(axis=1) / len(wanted)
+
+        if profile.direction in DIRECTIONS:
+            out[:, 3] = self.directions[:, DIRECTIONS.index(profile.direction)]
+
+        words = list({self.keyword_index[w] for w in profile.interests if w in self.keyword_index})
+        if words:
+            hits = self.keywords[:, words].sum(axis=1)
+            out[:, 4] = np.minimum(1.0, hits / min(len(words), 3))
+        return out
+
+    def scores(self, profile: CareerProfile) -> np.ndarray:
+        """Match score in [0, 1] for every career"""
+        return self.components(profile) @ self._weights
+
+    def rank(self, profile: CareerProfile, k: int = 8) -> List[ScoredCareer]:
+        """The k best careers for a profile, best first"""
+        components = self.components(profile)
+        scores = components @ self._weights
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        wanted = {p.lower() for p in profile.priorities}
+        words = set(profile.interests)
+        ranked = []
+        for row in top:
+            career = self.careers[row]
+            ranked.append(ScoredCareer(
+                id=career["id"],
+                name=career["name"],
+                description=career["description"],
+                score=int(round(float(scores[row]) * 100)),
+                components={name: round(float(components[row, i]), 3) for i, name in enumerate(WEIGHTS)},
+                matched_priorities=[p for p in career["priorities"] if p.lower() in wanted],
+                matched_interests=[k for k in career["keywords"] if k in words],
+            ))
+        return ranked
+
+
+# ============================================================
+# Degraded mode
+# ============================================================
+def explain(career: ScoredCareer, profile: CareerProfile) -> List[Dict[str, str]]:
+    """Template reasons for a scored career, built from what matched"""
+    reasons = []
+    major_name = canonical_name("major", profile.major.replace("raw:", ""))
+    if career.components["major"] >= 1:
+        reasons.append({
+            "strength": f"Direct fit with your {major_name} major",
+            "explanation": f"{career.name} is a common path for {major_name} graduates.",
+        })
+    elif career.components["major"] >= RELATED_MAJOR and profile.major in CareerCatalog.get_instance().major_index:
+        reasons.append({
+            "strength": f"Builds on your {major_name} background",
+            "explanation": f"{major_name} is a related preparation for {career.name.lower()} roles.",
+        })
+    if career.matched_priorities:
+        reasons.append({
+            "strength": "Matches your priorities",
+            "explanation": f"This career offers {', '.join(career.matched_priorities).lower()}, which you said matter to you.",
+        })
+    if career.components["mbti"] > 0.6:
+        traits = [
+            MBTI_LABELS[d][profile.mbti.get(d, 50) >= 50]
+            for d in MBTI_DIMENSIONS if abs(profile.mbti.get(d, 50) - 50) >= 10
+        ]
+        reasons.append({
+            "strength": "Suits your personality",
+            "explanation": f"The day-to-day work rewards your preferences for {', '.join(traits).lower()}.",
+        })
+    if career.matched_interests:
+        reasons.append({
+            "strength": "Connects to your interests",
+            "explanation": f"It involves {', '.join(career.matched_interests)}.",
+        })
+    if not reasons:
+        reasons.append({
+            "strength": "Broad fit with your profile",
+            "explanation": career.description,
+        })
+    return reasons
+
+
+def catalog_recommendations(profile: CareerProfile, k: int = 5) -> Dict[str, List[Dict]]:
+    """Recommendations in the ReasoningResponse shape, from the scorer alone"""
+    return {
+        "recommendations": [
+            {
+                "career": career.name,
+                "score": career.score,
+                "description": career.description,
+                "reasons": explain(career, profile),
+            }
+            for career in CareerCatalog.get_instance().rank(profile, k)
+        ]
+    }
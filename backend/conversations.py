@@ -0,0 +1,113 @@
+"""
+Follow-up conversations about a stored plan
+Each session has one conversation per plan. Its context (the student's
+profile, web search summary and the plan itself) is fixed when the
+conversation starts and sent as a cached system prompt, so every turn reuses
+it from the prompt cache instead of paying for it again. Only the last
+conversation_recent_turns turns are sent word for word; older ones are
+folded into a short running summary, so the input of a turn stays about the
+same size however long the conversation gets.
+"""
+
+import asyncio
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from cache import ResultCache
+from settings import get_settings
+
+# Marks the end of a prompt prefix to cache
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+INSTRUCTIONS = """
+You are ClaudeClimb's career advisor. The student below already has a
+personalized career plan and is asking follow-up questions about it (for
+example how a different track, class or internship would change it).
+Answer in a warm, personal tone, addressing the student directly. Refer to
+the plan's sections and steps by name, say what you would change and why,
+and keep answers focused: a few short paragraphs or a short list.
+"""
+
+
+class Turn(NamedTuple):
+    question: str
+    answer: str
+
+
+class Conversation:
+    """Questions and answers about one plan, in one session"""
+    __slots__ = ("plan_id", "context", "summary", "turns", "summarized", "lock", "compacting")
+
+    def __init__(self, plan_id: str, context: str):
+        self.plan_id = plan_id
+        # Fixed for the whole conversation so the cached prefix stays identical
+        self.context = context
+        # Running summary of the turns no longer sent word for word
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.summarized = 0
+        # One turn at a time; a turn waits for the compaction started by the last
+        self.lock = asyncio.Lock()
+        self.compacting: Optional[asyncio.Task] = None
+
+    @property
+    def turn_count(self) -> int:
+        return self.summarized + len(self.turns)
+
+    def system(self) -> List[Dict]:
+        """System prompt blocks: the cached instructions and context, then the summary"""
+        blocks = [{"type": "text", "text": INSTRUCTIONS + self.context, "cache_control": CACHE_BREAKPOINT}]
+        if self.summary:
+            blocks.append({"type": "text", "text": f"Summary of the conversation so far:\n{self.summary}"})
+        return blocks
+
+    def messages(self, question: str) -> List[Dict]:
+        """The recent turns and the new question; the turns are cached up to the last answer"""
+        messages = []
+        for turn in self.turns:
+            messages.append({"role": "user", "content": turn.question})
+            messages.append({"role": "assistant", "content": [{"type": "text", "text": turn.answer}]})
+        if messages:
+            messages[-1]["content"][0]["cache_control"] = CACHE_BREAKPOINT
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def add_turn(self, question: str, answer: str):
+        self.turns.append(Turn(question, answer))
+
+    def needs_compaction(self) -> bool:
+        return len(self.turns) > get_settings().conversation_recent_turns
+
+    def oldest_turns(self) -> List[Turn]:
+        """Turns to fold into the summary: all but the newest half of the recent window"""
+        keep = get_settings().conversation_recent_turns // 2
+        return self.turns[:len(self.turns) - keep]
+
+    def fold(self, turns: List[Turn], summary: str):
+        """Replace turns (the oldest ones) with a summary covering them"""
+        self.summary = summary
+        self.turns = self.turns[len(turns):]
+        self.summarized += len(turns)
+
+
+class ConversationStore:
+    """Conversations by (session, plan ID), least recently used evicted"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared conversation store"""
+        if cls._instance is None:
+            cls._instance = ConversationStore(ttl_seconds=get_settings().plan_cache_ttl)
+        return cls._instance
+
+    def __init__(self, maxsize: int = 10000, ttl_seconds: Optional[float] = None):
+        self._conversations = ResultCache("conversations", maxsize=maxsize, ttl_seconds=ttl_seconds)
+
+    def get_or_start(self, session: str, plan_id: str, context: Callable[[], str]) -> Conversation:
+        """The session's conversation about a plan, started (with context()) if there is none"""
+        key = (session, plan_id)
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = Conversation(plan_id, context())
+            self._conversations.set(key, conversation)
+        return conversation
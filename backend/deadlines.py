@@ -0,0 +1,134 @@
+"""
+Request deadlines for ClaudeClimb
+Each model-backed request runs with a time budget, from the X-Request-Timeout
+header (seconds) or the route's configured budget, whichever is shorter.
+The deadline travels with the request in a context variable, so the upstream
+call sees it without threading it through every function. The work is
+cancelled, and the upstream call with it, when the deadline passes or the
+client disconnects.
+"""
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+import metrics
+from scheduler import request_session, session_scope
+from settings import get_settings
+
+T = TypeVar("T")
+
+TIMEOUT_HEADER = "x-request-timeout"
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Status nginx uses for "client closed request"; nobody is left to read it
+CLIENT_CLOSED_REQUEST = 499
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out"""
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check():
+    """Raise DeadlineExceeded if the current request is out of time"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run a block with a deadline (None removes it, e.g. for shared work)"""
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def route_budget(route: str) -> float:
+    """Configured time budget of a route, in seconds"""
+    settings = get_settings()
+    return {
+        "websearch": settings.websearch_deadline_seconds,
+        "reason": settings.reason_deadline_seconds,
+        "career-plan": settings.career_plan_deadline_seconds,
+    }.get(route, settings.default_deadline_seconds)
+
+
+def request_budget(request: Request, route: str) -> float:
+    """The route budget, shortened by the client's X-Request-Timeout"""
+    budget = route_budget(route)
+    header = request.headers.get(TIMEOUT_HEADER)
+    if header:
+        try:
+            budget = min(budget, max(0.0, float(header)))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {TIMEOUT_HEADER} header: {header}")
+    return budget
+
+
+async def guard(request: Request, work: Awaitable[T], route: str) -> T:
+    """
+    Await request work under the request's deadline, cancelling it when the
+    deadline passes or the client disconnects
+
+    Args:
+        request: The incoming request (watched for disconnects)
+        work: Coroutine doing the model-backed part of the request
+        route: Route name for the configured budget
+
+    Returns:
+        The work's result
+
+    Raises:
+        HTTPException: 504 when the deadline passed, 499 when the client left
+    """
+    try:
+        budget = request_budget(request, route)
+    except HTTPException:
+        if asyncio.iscoroutine(work):
+            work.close()
+        raise
+    # The task copies the context, deadline and upstream session included
+    with deadline_scope(budget), session_scope(request_session(request)):
+        task = asyncio.ensure_future(work)
+        deadline = _deadline.get()
+
+    try:
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise DeadlineExceeded("Request deadline exceeded")
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, left))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    except DeadlineExceeded:
+        metrics.incr(f"requests.deadline_exceeded.{route}")
+        raise HTTPException(status_code=504, detail=f"Request deadline of {budget:g}s exceeded")
+    except ClientDisconnected:
+        metrics.incr(f"requests.disconnected.{route}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,196 @@
+"""
+Liveness, readiness and load reporting for orchestrators and autoscalers
+GET /api/health/live answers as long as the event loop does. GET
+/api/health/ready is 503 while the app is starting or draining, while the
+event loop is lagging or while the upstream queue is longer than requests
+would wait for, and reports the load either way: event-loop lag, in-flight
+requests and upstream calls per agent, scheduler queue depth, rolling
+upstream latency, cache hit rates and active sessions.
+Everything it reads is plain state owned by the event loop (counters,
+deques, dict sizes); it never takes the blob store or client locks, so a
+slow disk or SDK import cannot hold up a probe.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+import llm
+from cache import ResultCache
+from model_router import ModelRouter
+from responses import FastJSONResponse
+from scheduler import INTERACTIVE, LANES, UpstreamScheduler, request_session
+from settings import get_settings
+
+LAG_INTERVAL = 0.25
+LAG_WINDOW = 240  # samples: the last minute
+ACTIVE_SESSION_SECONDS = 300
+MAX_TRACKED_SESSIONS = 10000
+
+
+class LoopMonitor:
+    """Measures event-loop lag: how late a short periodic sleep wakes up"""
+
+    def __init__(self, interval: float = LAG_INTERVAL, window: int = LAG_WINDOW):
+        self.interval = interval
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.last_beat: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_beat = time.monotonic()
+            self.lags.append(max(0.0, self.last_beat - started - self.interval))
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Lag in ms: the latest, p99 and max over the window, and how long since the last beat"""
+        lags = sorted(self.lags)
+        if not lags:
+            return {"current_ms": None, "p99_ms": None, "max_ms": None, "since_beat_ms": None}
+        return {
+            "current_ms": round(self.lags[-1] * 1000, 1),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 1),
+            "max_ms": round(lags[-1] * 1000, 1),
+            "since_beat_ms": round((time.monotonic() - self.last_beat) * 1000, 1),
+        }
+
+
+class Activity:
+    """Requests in flight and when each session was last seen"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.started_at = time.time()
+        # Set once startup has finished, cleared when shutdown begins
+        self.ready = False
+        self._sessions: "OrderedDict[str, float]" = OrderedDict()
+
+    def touch(self, session: str):
+        self._sessions[session] = time.monotonic()
+        self._sessions.move_to_end(session)
+        while len(self._sessions) > MAX_TRACKED_SESSIONS:
+            self._sessions.popitem(last=False)
+
+    def active_sessions(self, seconds: float = ACTIVE_SESSION_SECONDS) -> int:
+        """Sessions seen within the last seconds (newest are last, so stop at the first older one)"""
+        cutoff = time.monotonic() - seconds
+        count = 0
+        for seen in reversed(self._sessions.values()):
+            if seen < cutoff:
+                break
+            count += 1
+        return count
+
+
+loop_monitor = LoopMonitor()
+activity = Activity()
+
+
+class ActivityMiddleware:
+    """Counts API requests in flight and records the session of each"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api") or path.startswith("/api/health"):
+            await self.app(scope, receive, send)
+            return
+        activity.touch(request_session(Request(scope)))
+        activity.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            activity.in_flight -= 1
+
+
+def load_report() -> Dict:
+    """Current load of this replica"""
+    scheduler = UpstreamScheduler.get_instance()
+    latency = {}
+    for agent, report in ModelRouter.get_instance().stats().items():
+        models = {model: summary for model, summary in report["models"].items() if summary["count"]}
+        if models:
+            latency[agent] = {"active": report["active"], "models": models}
+    return {
+        "uptime_seconds": round(time.time() - activity.started_at, 1),
+        "event_loop_lag": loop_monitor.summary(),
+        "requests_in_flight": activity.in_flight,
+        "upstream_in_flight": {agent: count for agent, count in llm.in_flight.items() if count},
+        "upstream_queue": {
+            "depth": scheduler.depth(),
+            "admitted_in_flight": scheduler.in_flight,
+            "estimated_wait_seconds": {lane: round(scheduler.estimate_wait(lane), 2) for lane in LANES},
+        },
+        "upstream_latency": latency,
+        "cache_hit_rates": {
+            name: {"hit_rate": round(stats["hit_rate"], 3), "size": stats["size"]}
+            for name, stats in ResultCache.all_stats().items()
+        },
+        "sessions": {"active": activity.active_sessions(), "tracked": len(activity._sessions)},
+    }
+
+
+def not_ready_reasons(report: Dict) -> list:
+    """Why this replica should get no new traffic (empty when ready)"""
+    settings = get_settings()
+    reasons = []
+    if not activity.ready:
+        reasons.append("starting or draining")
+    lag = report["event_loop_lag"]["p99_ms"]
+    if lag is not None and lag > settings.ready_max_loop_lag_ms:
+        reasons.append(f"event loop lag p99 {lag:.0f} ms over {settings.ready_max_loop_lag_ms:.0f} ms")
+    wait = report["upstream_queue"]["estimated_wait_seconds"][INTERACTIVE]
+    if settings.shed_queue_wait_seconds and wait > settings.shed_queue_wait_seconds:
+        reasons.append(f"upstream queue wait {wait:.0f}s over {settings.shed_queue_wait_seconds:.0f}s")
+    return reasons
+
+
+# ============================================================
+# FastAPI Router
+# ============================================================
+router = APIRouter(prefix="/api", tags=["health"])
+
+
+@router.get("/health")
+async def health_check():
+    """Liveness (kept for existing checks)"""
+    return {"status": "ok"}
+
+
+@router.get("/health/live")
+async def liveness():
+    """
+    Liveness probe: the process is up and its event loop is answering
+    A blocked loop fails it by not answering in time
+    """
+    return {"status": "ok", "uptime_seconds": round(time.time() - activity.started_at, 1)}
+
+
+@router.get("/health/ready")
+async def readiness() -> Response:
+    """
+    Readiness probe and load report: 200 when this replica should take
+    traffic, 503 (with the reasons) when it should not; the load report is
+    in the body either way
+    """
+    report = load_report()
+    reasons = not_ready_reasons(report)
+    body = {"status": "not_ready" if reasons else "ready", "reasons": reasons, **report}
+    return FastJSONResponse(body, status_code=503 if reasons else 200, headers={"Cache-Control": "no-store"})
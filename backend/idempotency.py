@@ -0,0 +1,151 @@
+"""
+Idempotency keys for the model-backed POST routes
+A request carrying an Idempotency-Key header has its response stored (for
+idempotency_ttl_seconds) under the session, route and key. A repeat with the
+same key gets that response back, or waits for it while the first request
+is still running, without calling the model again. Reusing a key for a
+different request body is rejected with 422.
+A keyed request keeps running when its client disconnects, so the retry
+after a dropped connection collects the result instead of starting over.
+"""
+
+import asyncio
+import hashlib
+from typing import List, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+
+import metrics
+from cache import ResultCache
+from responses import FastJSONResponse
+from scheduler import request_session
+from settings import get_settings
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+IDEMPOTENT_ROUTES = ("/api/websearch", "/api/reason", "/api/career-plan", "/api/career-plan/outline")
+
+# Responses not worth replaying: the retry should run the request again
+RETRYABLE_STATUS = (429, 499)
+
+
+class StoredResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future")
+
+    def __init__(self, fingerprint: bytes, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        # StoredResponse, or None if the first request produced nothing reusable
+        self.future = future
+
+
+class IdempotencyMiddleware:
+    """Stores and replays keyed POSTs to IDEMPOTENT_ROUTES"""
+
+    def __init__(self, app, ttl_seconds: Optional[float] = None, maxsize: int = 10000):
+        self.app = app
+        self._entries = ResultCache(
+            "idempotency",
+            maxsize=maxsize,
+            ttl_seconds=ttl_seconds or get_settings().idempotency_ttl_seconds,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].rstrip("/") not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await FastJSONResponse(
+                {"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"}, status_code=400
+            )(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        route = scope["path"].rstrip("/")
+        fingerprint = hashlib.blake2b(scope.get("query_string", b"") + b"\0" + body, digest_size=16).digest()
+        cache_key = (request_session(request), route, key)
+
+        # A repeat: replay the stored (or awaited) response
+        while True:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                break
+            if entry.fingerprint != fingerprint:
+                metrics.incr("idempotency.mismatched")
+                await FastJSONResponse(
+                    {"detail": "Idempotency-Key was already used for a different request"}, status_code=422
+                )(scope, receive, send)
+                return
+            stored = await asyncio.shield(entry.future)
+            if stored is not None:
+                metrics.incr("idempotency.duplicates_avoided")
+                metrics.incr(f"idempotency.duplicates_avoided.{route.rsplit('/', 1)[-1]}")
+                await self._replay(stored, send)
+                return
+            # The first attempt failed; the first repeat to get here runs it again
+
+        entry = _Entry(fingerprint, asyncio.get_running_loop().create_future())
+        self._entries.set(cache_key, entry)
+        started, chunks = {}, []
+        client_gone = False
+
+        async def receive_body():
+            nonlocal body
+            if body is not None:
+                message, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return message
+            # Never report the disconnect: the work carries on for the retry
+            await asyncio.Event().wait()
+
+        async def capture(message):
+            nonlocal client_gone
+            if message["type"] == "http.response.start":
+                started.update(status=message["status"], headers=list(message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                started["complete"] = not message.get("more_body", False)
+            if not client_gone:
+                try:
+                    await send(message)
+                except OSError:
+                    client_gone = True
+
+        stored = None
+        try:
+            await self.app(scope, receive_body, capture)
+            status = started.get("status")
+            if status is not None and started.get("complete") and status < 500 and status not in RETRYABLE_STATUS:
+                stored = StoredResponse(status, started["headers"], b"".join(chunks))
+        finally:
+            if stored is None:
+                self._entries.invalidate(cache_key)
+            entry.future.set_result(stored)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        parts = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            parts.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(parts)
+
+    @staticmethod
+    async def _replay(stored: StoredResponse, send):
+        headers = stored.headers + [(REPLAYED_HEADER.lower().encode("latin-1"), b"true")]
+        await send({"type": "http.response.start", "status": stored.status, "headers": headers})
+        await send({"type": "http.response.body", "body": stored.body})
@@ -0,0 +1,411 @@
+"""
+Job queue for long-running agent calls
+POST a job and get its ID back immediately; a bounded pool of in-process
+workers runs the agent while clients poll GET /api/jobs/{id} or subscribe
+over WebSocket. Jobs are kept by ID (TTL from settings), so clients can
+reconnect; the sqlite queue also survives process restarts.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+
+from responses import FastJSONResponse
+from scheduler import BATCH, UpstreamScheduler, lane_scope
+from settings import get_settings
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+
+
+@dataclass
+class Job:
+    """A unit of agent work and its current state"""
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = QUEUED
+    stage: str = QUEUED
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["job_id"] = data.pop("id")
+        return data
+
+
+# ============================================================
+# Queue backends
+# ============================================================
+class InMemoryJobQueue:
+    """Default queue: jobs live in this process only"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._pending: Optional[asyncio.Queue] = None
+
+    @property
+    def pending(self) -> asyncio.Queue:
+        # Created lazily so it binds to the running event loop
+        if self._pending is None:
+            self._pending = asyncio.Queue()
+        return self._pending
+
+    async def put(self, job: Job):
+        """Persist a new job and queue it"""
+        self.save(job)
+        await self.pending.put(job.id)
+
+    async def get(self) -> Job:
+        """Wait for the next queued job"""
+        while True:
+            job = self.load(await self.pending.get())
+            if job is not None and job.status == QUEUED:
+                return job
+
+    def save(self, job: Job):
+        """Persist a job's current state"""
+        job.updated_at = time.time()
+        self._jobs[job.id] = job
+
+    def load(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def depth(self) -> int:
+        return self.pending.qsize()
+
+    def recover(self) -> List[Job]:
+        """Jobs left unfinished by a previous process (none for memory)"""
+        return []
+
+    def prune(self, older_than: float):
+        """Forget finished jobs last updated before older_than"""
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.updated_at < older_than]:
+            del self._jobs[job_id]
+
+
+class SqliteJobQueue(InMemoryJobQueue):
+    """Durable queue: every state change is written to a sqlite file"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, data TEXT)")
+        self._db.commit()
+
+    def save(self, job: Job):
+        super().save(job)
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, data) VALUES (?, ?, ?)",
+            (job.id, job.status, json.dumps(asdict(job), default=str)),
+        )
+        self._db.commit()
+
+    def load(self, job_id: str) -> Optional[Job]:
+        job = super().load(job_id)
+        if job is None:
+            row = self._db.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                job = Job(**json.loads(row[0]))
+                self._jobs[job.id] = job
+        return job
+
+    def recover(self) -> List[Job]:
+        rows = self._db.execute(
+            "SELECT data FROM jobs WHERE status IN (?, ?) ORDER BY rowid", (QUEUED, RUNNING)
+        ).fetchall()
+        return [Job(**json.loads(row[0])) for row in rows]
+
+    def prune(self, older_than: float):
+        super().prune(older_than)
+        rows = self._db.execute("SELECT id, data FROM jobs WHERE status IN (?, ?)", FINISHED).fetchall()
+        stale = [job_id for job_id, data in rows if json.loads(data)["updated_at"] < older_than]
+        self._db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in stale])
+        self._db.commit()
+
+
+def queue_from_url(url: str):
+    """Build a queue backend from a URL: memory:// or sqlite:///path/to/jobs.db"""
+    if url.startswith("sqlite:///"):
+        return SqliteJobQueue(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        return InMemoryJobQueue()
+    raise ValueError(f"Unsupported job queue URL: {url}")
+
+
+# ============================================================
+# Job manager
+# ============================================================
+Handler = Callable[[Dict[str, Any], Callable[[str], None]], Awaitable[Any]]
+
+
+class JobManager:
+    """Bounded worker pool over a pluggable queue"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared job manager, configured from the settings"""
+        if cls._instance is None:
+            settings = get_settings()
+            cls._instance = JobManager(
+                queue_from_url(settings.job_queue_url),
+                workers=settings.job_workers,
+                max_queue=settings.job_max_queue,
+                ttl=settings.job_ttl,
+            )
+            for kind, handler in DEFAULT_HANDLERS.items():
+                cls._instance.register(kind, handler)
+        return cls._instance
+
+    def __init__(self, queue, workers: int = 4, max_queue: int = 200, ttl: float = 3600):
+        self.queue = queue
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl = ttl
+        self.running = 0
+        self._handlers: Dict[str, Handler] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def register(self, kind: str, handler: Handler):
+        """Register the coroutine that runs jobs of this kind"""
+        self._handlers[kind] = handler
+
+    async def start(self):
+        """Requeue unfinished jobs and start the workers"""
+        for job in self.queue.recover():
+            job.status = job.stage = QUEUED
+            await self.queue.put(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, params: Dict[str, Any]) -> Job:
+        """Queue a job; raises QueueFullError at capacity"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.queue.depth() >= self.max_queue:
+            raise QueueFullError("Job queue is full, please retry shortly")
+        self.queue.prune(time.time() - self.ttl)
+        job = Job(id=uuid.uuid4().hex, kind=kind, params=params)
+        await self.queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.queue.load(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.queue.depth(),
+            "running": self.running,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+        }
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Receive a snapshot after every change to the job"""
+        updates = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(updates)
+        return updates
+
+    def unsubscribe(self, job_id: str, updates: asyncio.Queue):
+        listeners = self._subscribers.get(job_id, [])
+        if updates in listeners:
+            listeners.remove(updates)
+        if not listeners:
+            self._subscribers.pop(job_id, None)
+
+    def _update(self, job: Job, **changes):
+        for name, value in changes.items():
+            setattr(job, name, value)
+        self.queue.save(job)
+        snapshot = self.snapshot(job)
+        for updates in self._subscribers.get(job.id, []):
+            updates.put_nowait(snapshot)
+
+    def snapshot(self, job: Job) -> Dict[str, Any]:
+        """Job state plus the current queue depth"""
+        data = job.to_dict()
+        data["queue_depth"] = self.queue.depth()
+        if not job.done:
+            data["estimated_upstream_wait"] = round(UpstreamScheduler.get_instance().estimate_wait(BATCH), 1)
+        return data
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            self.running += 1
+            self._update(job, status=RUNNING, stage=RUNNING)
+            try:
+                # Jobs queue upstream behind interactive requests, one session each
+                with lane_scope(BATCH, f"job:{job.id}"):
+                    result = await self._handlers[job.kind](job.params, lambda stage: self._update(job, stage=stage))
+                self._update(job, status=SUCCEEDED, stage=SUCCEEDED, result=result)
+            except asyncio.CancelledError:
+                self._update(job, status=QUEUED, stage=QUEUED)
+                raise
+            except Exception as e:
+                self._update(job, status=FAILED, stage=FAILED, error=str(e))
+            finally:
+                self.running -= 1
+
+
+# ============================================================
+# Handlers
+# ============================================================
+async def run_career_plan_job(params: Dict[str, Any], report: Callable[[str], None]) -> Any:
+    """Generate a career plan for params["career"]"""
+    from agents.planning_agent import generate_career_plan
+    report("generating plan")
+    return await generate_career_plan(params["career"])
+
+
+async def run_reasoning_job(params: Dict[str, Any], report: Callable[[str], None]) -> Any:
+    """Generate career recommendations for the current profile"""
+    from agents.reasoning_agent import analyze_student_profile
+    report("analyzing profile")
+    return {"recommendations": await analyze_student_profile()}
+
+
+DEFAULT_HANDLERS: Dict[str, Handler] = {
+    "career-plan": run_career_plan_job,
+    "reason": run_reasoning_job,
+}
+
+# ============================================================
+# Models
+# ============================================================
+class CareerPlanJobRequest(BaseModel):
+    """Request to queue a career plan"""
+    career: str = Field(..., description="The selected career path")
+
+
+class JobResponse(BaseModel):
+    """State of a queued or finished job"""
+    job_id: str = Field(..., description="Job ID to poll or subscribe to")
+    kind: str = Field(..., description="Job kind (career-plan or reason)")
+    status: str = Field(..., description="queued, running, succeeded or failed")
+    stage: str = Field(..., description="Most recent progress stage")
+    result: Optional[Any] = Field(None, description="Agent result once succeeded")
+    error: Optional[str] = Field(None, description="Error message if failed")
+    queue_depth: int = Field(..., description="Jobs waiting for a worker")
+    created_at: float = Field(..., description="Unix time the job was queued")
+    updated_at: float = Field(..., description="Unix time of the last change")
+
+
+class JobQueueStats(BaseModel):
+    """Current queue load"""
+    queue_depth: int = Field(..., description="Jobs waiting for a worker")
+    running: int = Field(..., description="Jobs being run")
+    workers: int = Field(..., description="Size of the worker pool")
+    max_queue: int = Field(..., description="Queue capacity")
+
+# ============================================================
+# FastAPI Router
+# ============================================================
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+
+async def _submit(kind: str, params: Dict[str, Any]):
+    manager = JobManager.get_instance()
+    try:
+        job = await manager.submit(kind, params)
+    except QueueFullError as e:
+        return FastJSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    return FastJSONResponse(status_code=202, content=manager.snapshot(job))
+
+
+@router.post("/jobs/career-plan", response_model=JobResponse, status_code=202)
+async def queue_career_plan(request: CareerPlanJobRequest):
+    """
+    API endpoint to queue a career plan
+    Returns the job ID immediately; poll /api/jobs/{job_id} or subscribe
+    to /api/jobs/{job_id}/ws for the result
+    """
+    return await _submit("career-plan", {"career": request.career})
+
+
+@router.post("/jobs/reason", response_model=JobResponse, status_code=202)
+async def queue_reasoning():
+    """
+    API endpoint to queue career recommendations
+    Returns the job ID immediately
+    """
+    return await _submit("reason", {})
+
+
+@router.get("/jobs", response_model=JobQueueStats)
+async def job_queue_stats() -> Dict[str, Any]:
+    """
+    API endpoint reporting queue depth and worker usage
+    """
+    return JobManager.get_instance().stats()
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    API endpoint to poll a job
+    """
+    manager = JobManager.get_instance()
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return manager.snapshot(job)
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def job_updates(websocket: WebSocket, job_id: str):
+    """
+    WebSocket that sends the job state now and after every change,
+    closing once the job has finished. Reconnecting resumes from the
+    current state.
+    """
+    manager = JobManager.get_instance()
+    await websocket.accept()
+    job = manager.get(job_id)
+    if job is None:
+        await websocket.send_json({"detail": "Job not found"})
+        await websocket.close(code=4404)
+        return
+
+    # Subscribe before sending the snapshot so no change is missed
+    updates = manager.subscribe(job_id)
+    try:
+        snapshot = manager.snapshot(job)
+        await websocket.send_json(snapshot)
+        while snapshot["status"] not in FINISHED:
+            snapshot = await updates.get()
+            await websocket.send_json(snapshot)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.unsubscribe(job_id, updates)
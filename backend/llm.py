@@ -0,0 +1,343 @@
+"""
+Anthropic client access for the agents
+The SDK is imported and the client built on first use, so importing the app
+stays cheap and replicas become ready before the first model call.
+The client is async so model calls never block the event loop.
+Agents call create_message(), which picks the model through the model router
+and falls back to the agent's fallback model on upstream failures.
+Calls honour the request deadline (deadlines.py): the SDK timeout is the time
+left, and a cancelled request cancels the upstream call.
+Every call is admitted by the upstream scheduler (scheduler.py); rate-limited
+calls are retried with jittered exponential backoff.
+stream_text() streams a generation as text deltas; a stream is routed and
+admitted like any other call, and retried or failed over only while opening.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Union
+
+import deadlines
+import metrics
+from model_router import ModelRouter
+from scheduler import UpstreamScheduler
+from settings import get_settings
+from token_budget import BudgetController
+
+# Upstream failures worth retrying on the fallback model
+FALLBACK_STATUS_CODES = {408, 429, 500, 502, 503, 504, 529}
+FALLBACK_ERRORS = {"APIConnectionError", "APITimeoutError"}
+# Upstream says slow down: back off and retry on the same model
+RATE_LIMIT_STATUS_CODES = {429, 529}
+CHARS_PER_TOKEN = 4
+
+# Continuations allowed after a generation stops on max_tokens
+MAX_CONTINUATIONS = 3
+
+
+class Completion(NamedTuple):
+    """Text of a (possibly continued) generation"""
+    text: str
+    model: str
+    stop_reason: str
+    output_tokens: int
+    continuations: int
+
+_client = None
+_client_lock = threading.Lock()
+
+# Upstream calls running per agent (streams until they end), for /api/health/ready
+in_flight: Dict[str, int] = defaultdict(int)
+
+
+def get_client():
+    """Get the shared AsyncAnthropic client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = get_settings().anthropic_api_key
+                if not api_key:
+                    raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+                from anthropic import AsyncAnthropic
+                _client = AsyncAnthropic(api_key=api_key)
+    return _client
+
+
+def warm_client():
+    """Import the SDK and build the client ahead of the first request"""
+    try:
+        get_client()
+    except ValueError as e:
+        print(f"Warning: Anthropic client not prewarmed: {str(e)}")
+
+
+def should_fall_back(error: Exception) -> bool:
+    """Whether an upstream error is transient enough to try the fallback model"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in FALLBACK_STATUS_CODES
+    return type(error).__name__ in FALLBACK_ERRORS
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) in RATE_LIMIT_STATUS_CODES
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the error's retry-after header, if it has one"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, hint: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's hint"""
+    settings = get_settings()
+    ceiling = min(settings.upstream_backoff_max, settings.upstream_backoff_base * 2 ** attempt)
+    return max(hint or 0.0, random.uniform(0, ceiling))
+
+
+def estimate_tokens(kwargs) -> int:
+    """Rough input size plus the output budget, for the TPM scheduler"""
+    chars = len(json.dumps([kwargs.get("system", ""), kwargs.get("messages", [])], ensure_ascii=False))
+    return chars // CHARS_PER_TOKEN + kwargs.get("max_tokens", 0)
+
+
+async def _timed_create(agent: str, model: str, kwargs):
+    router = ModelRouter.get_instance()
+    deadlines.check()
+    left = deadlines.remaining()
+    if left is not None:
+        kwargs = dict(kwargs, timeout=left)
+    # Local failures (no API key) say nothing about the model's health
+    client = get_client()
+    # A stream is counted by TextStream for as long as it is read
+    counted = not kwargs.get("stream")
+    started = time.monotonic()
+    if counted:
+        in_flight[agent] += 1
+    try:
+        response = await client.messages.create(model=model, **kwargs)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Only transient upstream errors count against the model; a rejected
+        # request (400, SDK argument checks) would fail on any model
+        if should_fall_back(e):
+            router.record(agent, model, time.monotonic() - started, ok=False)
+        raise
+    finally:
+        if counted:
+            in_flight[agent] -= 1
+    router.record(agent, model, time.monotonic() - started, ok=True)
+    return response
+
+
+async def _admitted_create(agent: str, model: str, kwargs):
+    """Take a scheduler slot, call upstream, back off and retry when rate limited"""
+    scheduler = UpstreamScheduler.get_instance()
+    estimate = estimate_tokens(kwargs)
+    max_retries = get_settings().upstream_max_retries
+    attempt = 0
+    while True:
+        ticket = await scheduler.acquire(agent, estimate)
+        try:
+            response = await _timed_create(agent, model, kwargs)
+        except BaseException as e:
+            scheduler.settle(ticket)
+            if not isinstance(e, Exception) or not is_rate_limited(e) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, retry_after(e))
+            left = deadlines.remaining()
+            if left is not None and delay >= left:
+                raise
+            metrics.incr(f"llm.rate_limited.{agent}")
+            print(f"Warning: {agent} rate limited on {model}, retrying in {delay:.1f}s")
+            # Everyone else waits too; the limit is shared
+            scheduler.throttle(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        usage = getattr(response, "usage", None)
+        scheduler.settle(ticket, usage.input_tokens + usage.output_tokens if usage else None)
+        return response
+
+
+async def create_message(agent: str, **kwargs):
+    """
+    Call messages.create for an agent with the routed model
+    
+    Args:
+        agent: Agent name (see model_router), selects the model policy
+        **kwargs: messages.create arguments other than model
+        
+    Returns:
+        The API response; response.model is the model that served it
+    """
+    router = ModelRouter.get_instance()
+    model = router.choose(agent)
+    try:
+        return await _admitted_create(agent, model, kwargs)
+    except Exception as e:
+        fallback = router.policy(agent).fallback
+        if model == fallback or not should_fall_back(e):
+            raise
+        # An upstream timeout at the deadline leaves no time for a retry
+        deadlines.check()
+        print(f"Warning: {agent} call on {model} failed ({str(e)}), retrying on {fallback}")
+        return await _admitted_create(agent, fallback, kwargs)
+
+
+def extract_text(response) -> str:
+    """Concatenated text blocks of a response"""
+    parts = [block.text for block in response.content if hasattr(block, "text")]
+    if not parts:
+        raise ValueError("No content in response")
+    return "".join(parts)
+
+
+async def generate_text(agent: str, prompt: str, temperature: float = 0,
+                        max_tokens: Optional[int] = None) -> Completion:
+    """
+    Generate text for a single-prompt agent call
+    max_tokens comes from the budget controller unless given. A generation
+    cut off by max_tokens is continued (the partial text is sent back as an
+    assistant prefill) up to MAX_CONTINUATIONS times instead of failing.
+    
+    Args:
+        agent: Agent name, selects the model policy and token budget
+        prompt: User prompt
+        temperature: Sampling temperature
+        max_tokens: Override for the per-call budget
+        
+    Returns:
+        The full text and how it was produced
+    """
+    budgets = BudgetController.get_instance()
+    max_tokens = max_tokens or budgets.max_tokens(agent)
+    messages = [{"role": "user", "content": prompt}]
+    text = ""
+    output_tokens = 0
+    continuations = 0
+    metrics.incr(f"llm.calls.{agent}")
+
+    while True:
+        request_messages = messages
+        if text:
+            # The API rejects a prefill ending in whitespace
+            text = text.rstrip()
+            request_messages = messages + [{"role": "assistant", "content": text}]
+        try:
+            response = await create_message(
+                agent,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=request_messages,
+            )
+        except asyncio.CancelledError:
+            # Deadline or disconnect: the rest of the generation is never billed
+            metrics.incr(f"llm.cancelled.{agent}")
+            metrics.incr(f"llm.cancelled_tokens_saved.{agent}", max(0, budgets.expected(agent) - output_tokens))
+            raise
+        text += extract_text(response)
+        output_tokens += response.usage.output_tokens
+
+        if response.stop_reason != "max_tokens":
+            break
+        metrics.incr(f"llm.truncated.{agent}")
+        if continuations >= MAX_CONTINUATIONS:
+            print(f"Warning: {agent} output still truncated after {continuations} continuations")
+            break
+        continuations += 1
+        metrics.incr(f"llm.continuations.{agent}")
+
+    budgets.record(agent, output_tokens)
+    metrics.incr(f"llm.output_tokens.{agent}", output_tokens)
+    return Completion(text, response.model, response.stop_reason, output_tokens, continuations)
+
+
+class TextStream:
+    """
+    A streamed generation: iterate it for the text deltas
+    model, stop_reason and the token counts are filled in as the stream
+    reports them, so they are complete once iteration has finished.
+    cached_input_tokens are the input tokens read from the prompt cache
+    (billed at a fraction of input_tokens, which excludes them).
+    """
+
+    def __init__(self, agent: str, messages: List[Dict], system: Union[str, List[Dict], None] = None,
+                 temperature: float = 0, max_tokens: Optional[int] = None):
+        self.agent = agent
+        self.kwargs = {
+            "max_tokens": max_tokens or BudgetController.get_instance().max_tokens(agent),
+            "temperature": temperature,
+            "messages": messages,
+        }
+        if system:
+            self.kwargs["system"] = system
+        self.model: Optional[str] = None
+        self.stop_reason: Optional[str] = None
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.cache_write_tokens = 0
+        self.output_tokens = 0
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        metrics.incr(f"llm.calls.{self.agent}")
+        in_flight[self.agent] += 1
+        try:
+            events = await create_message(self.agent, stream=True, **self.kwargs)
+        except BaseException:
+            in_flight[self.agent] -= 1
+            raise
+        try:
+            async for event in events:
+                if event.type == "message_start":
+                    usage = event.message.usage
+                    self.model = event.message.model
+                    self.input_tokens = usage.input_tokens
+                    self.cached_input_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+                    self.cache_write_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    yield event.delta.text
+                elif event.type == "message_delta":
+                    self.stop_reason = event.delta.stop_reason
+                    self.output_tokens = event.usage.output_tokens
+        except asyncio.CancelledError:
+            # The client left mid-answer: closing the stream stops the generation
+            metrics.incr(f"llm.cancelled.{self.agent}")
+            raise
+        finally:
+            in_flight[self.agent] -= 1
+            await events.close()
+        BudgetController.get_instance().record(self.agent, self.output_tokens)
+        metrics.incr(f"llm.output_tokens.{self.agent}", self.output_tokens)
+        metrics.incr(f"llm.input_tokens.{self.agent}", self.input_tokens)
+        metrics.incr(f"llm.cached_input_tokens.{self.agent}", self.cached_input_tokens)
+
+
+def stream_text(agent: str, messages: List[Dict], system: Union[str, List[Dict], None] = None,
+                temperature: float = 0, max_tokens: Optional[int] = None) -> TextStream:
+    """
+    Stream a generation for an agent
+    
+    Args:
+        agent: Agent name, selects the model policy and token budget
+        messages: Conversation so far, ending with the user's turn
+        system: System prompt, as text or content blocks (which may carry
+            cache_control breakpoints)
+        temperature: Sampling temperature
+        max_tokens: Override for the per-call budget
+        
+    Returns:
+        The stream; the upstream call starts when iteration does
+    """
+    return TextStream(agent, messages, system, temperature, max_tokens)
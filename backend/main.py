@@ -1,28 +1,190 @@
 # main.py
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import math
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 
-from agents.web_search_agent  import router as web_search_router
-from agents.preference_agent  import router as preference_router
-from agents.reasoning_agent   import router as reasoning_router
-from agents.planning_agent    import router as planning_router
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="ClaudeClimb Multi-Agent API")
+import health
+import metrics
+import profiler
+from idempotency import IdempotencyMiddleware
+from plan_store import PlanStore
+from responses import FastJSONResponse
+from scheduler import INTERACTIVE, QueueWaitMiddleware, TokenBucket, UpstreamScheduler, request_session
+from settings import Settings, configure, get_settings
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # adjust to your front-end origin
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Routes that call the model; everything else is a cheap state-store update
+EXPENSIVE_ROUTES = (
+    "/api/websearch",
+    "/api/reason",
+    "/api/career-plan",
+    "/api/jobs/career-plan",
+    "/api/jobs/reason",
 )
+MAX_TRACKED_CLIENTS = 10000
+
+
+def generates_section(path: str) -> bool:
+    """Whether a GET of /api/career-plan/{plan_id}/sections/{index} has to generate the section"""
+    parts = path.split("/")
+    if len(parts) != 6 or parts[4] != "sections" or not parts[5].isdigit():
+        return False
+    return PlanStore.get_instance().section_missing(parts[3], int(parts[5]))
+
+
+class RateLimitMiddleware:
+    """
+    Per-client token buckets at the API edge
+    Each session (X-Session-Id, else client IP) gets rate_per_minute credits a
+    minute; cheap routes cost 1, model routes expensive_cost. Model routes are
+    also shed with 503 while the upstream queue wait is above shed_after
+    seconds, rather than queueing requests that would time out anyway.
+    """
+
+    def __init__(self, app, rate_per_minute: float, expensive_cost: float, shed_after: float):
+        self.app = app
+        self.rate_per_minute = rate_per_minute
+        self.expensive_cost = expensive_cost
+        self.shed_after = shed_after
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate_per_minute)
+            while len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+        # Probes are never limited: a 429 would read as an unhealthy replica
+        if scope["path"].startswith("/api/health"):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].rstrip("/")
+        # Reading a stored plan is cheap unless a section has to be generated
+        expensive = path.startswith(EXPENSIVE_ROUTES) and (scope["method"] != "GET" or generates_section(path))
+        if expensive and self.shed_after:
+            wait = UpstreamScheduler.get_instance().estimate_wait(INTERACTIVE)
+            if wait > self.shed_after:
+                metrics.incr("ratelimit.shed")
+                await self._reject(scope, receive, send, 503, wait, "Server is busy, please retry shortly")
+                return
+
+        if self.rate_per_minute:
+            cost = self.expensive_cost if expensive else 1
+            bucket = self._bucket(request_session(Request(scope)))
+            wait = bucket.wait_time(cost)
+            if wait > 0:
+                metrics.incr("ratelimit.rejected")
+                await self._reject(scope, receive, send, 429, wait, "Too many requests, please slow down")
+                return
+            bucket.take(cost)
+
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope, receive, send, status_code: int, retry_after: float, detail: str):
+        response = FastJSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+
+
+def create_app(settings: Settings = None) -> FastAPI:
+    """
+    Build the API. Settings are read once (or passed in); agent routers are
+    imported here and the Anthropic SDK only on first use or by the
+    background prewarm, so startup stays fast.
+    """
+    if settings is not None:
+        configure(settings)
+    settings = get_settings()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Ready immediately; the SDK import happens off the event loop
+        if settings.prewarm_client:
+            from llm import warm_client
+            asyncio.get_running_loop().run_in_executor(None, warm_client)
+        from jobs import JobManager
+        await JobManager.get_instance().start()
+        health.loop_monitor.start()
+        health.activity.ready = True
+        yield
+        # Not ready while draining, so the balancer stops sending traffic
+        health.activity.ready = False
+        await JobManager.get_instance().stop()
+        await UpstreamScheduler.get_instance().stop()
+        profiler.stop_background()
+        health.loop_monitor.stop()
+        if settings.analytics_dir:
+            from analytics import AnalyticsStore
+            AnalyticsStore.get_instance().flush()
+
+    app = FastAPI(
+        title="ClaudeClimb Multi-Agent API",
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
+    )
+
+    # Innermost, so rejections still get CORS headers
+    app.add_middleware(
+        RateLimitMiddleware,
+        rate_per_minute=settings.client_rate_per_minute,
+        expensive_cost=settings.expensive_route_cost,
+        shed_after=settings.shed_queue_wait_seconds,
+    )
+    # Outside the rate limit: a replayed retry costs no credits
+    app.add_middleware(IdempotencyMiddleware, ttl_seconds=settings.idempotency_ttl_seconds)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),  # adjust CORS_ORIGINS to your front-end origin
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Queue-Wait", "Retry-After", "Idempotent-Replayed", "X-Plan-Id", "ETag"],
+    )
+    # Estimated upstream queue wait on every API response
+    app.add_middleware(QueueWaitMiddleware)
+    # Requests in flight and active sessions, for the readiness report
+    app.add_middleware(health.ActivityMiddleware)
+    # Outermost, so the measured latency is what the client sees
+    if settings.slow_request_ms > 0:
+        app.add_middleware(
+            profiler.SlowRequestMiddleware,
+            threshold_ms=settings.slow_request_ms,
+            interval=settings.profile_interval_ms / 1000,
+        )
+
+    from agents.web_search_agent  import router as web_search_router
+    from agents.preference_agent  import router as preference_router
+    from agents.reasoning_agent   import router as reasoning_router
+    from agents.planning_agent    import router as planning_router
+    from jobs                     import router as jobs_router
+    from analytics                import router as analytics_router
+
+    # Mount all agent routers
+    app.include_router(web_search_router)   # → POST /api/websearch, GET /api/autocomplete
+    app.include_router(preference_router)   # → POST /api/mbti, /api/priorities, /api/goals-interests & GET /api/profile
+    app.include_router(reasoning_router)    # → POST /api/reason
+    app.include_router(planning_router)     # → POST /api/career-plan (+ /outline, /{plan_id}/ask) & GET /api/career-plan/{plan_id} (+ /sections/{index})
+    app.include_router(jobs_router)         # → POST /api/jobs/career-plan, /api/jobs/reason & GET /api/jobs/{id} (+ /ws)
+    app.include_router(analytics_router)    # → GET /api/analytics/cohort
+    app.include_router(health.router)       # → GET /api/health, /api/health/live, /api/health/ready
+
+    return app
 
-# Mount all agent routers
-app.include_router(web_search_router)   # → POST /api/websearch
-app.include_router(preference_router)   # → POST /api/mbti, /api/priorities, /api/goals-interests & GET /api/profile
-app.include_router(reasoning_router)    # → GET  /api/career-reasoning
-app.include_router(planning_router)     # → POST /api/career-plan
 
-@app.get("/api/health")
-async def health_check():
-    return {"status": "ok"}
+app = create_app()
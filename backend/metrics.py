@@ -0,0 +1,25 @@
+"""
+Process-wide counters for ClaudeClimb
+Plain dict increments: everything that counts runs on the event loop, and
+readers (debug and health endpoints) only take a snapshot copy.
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+_counters: Dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, amount: float = 1):
+    """Increase a counter"""
+    _counters[name] += amount
+
+
+def get(name: str) -> float:
+    """Current value of a counter"""
+    return _counters.get(name, 0)
+
+
+def snapshot() -> Dict[str, float]:
+    """Copy of every counter"""
+    return dict(_counters)
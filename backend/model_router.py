@@ -0,0 +1,163 @@
+"""
+Per-agent model routing for ClaudeClimb
+Each agent has a primary and a fallback model. Rolling latency and error
+rates are tracked per (agent, model); when the primary breaches its SLO the
+agent is routed to the fallback for a cooldown period, then the primary is
+tried again.
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
+
+from settings import get_settings
+
+# Agents that call the model
+WEB_SEARCH = "web_search"
+REASONING = "reasoning"
+REASONING_BATCH = "reasoning_batch"  # several students' recommendations in one call
+PLANNING = "planning"
+PLAN_SECTION = "plan_section"  # lazily served plans: the outline and each section
+PERSONALIZATION = "personalization"
+CONVERSATION = "conversation"
+
+WINDOW_SECONDS = 300
+MIN_SAMPLES = 5
+
+
+class ModelPolicy(NamedTuple):
+    """Which models an agent uses and its latency SLO"""
+    primary: str
+    fallback: str
+    slo_seconds: float
+
+
+class RollingStats:
+    """Latency and outcome samples over a sliding time window"""
+
+    def __init__(self, window_seconds: float = WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._samples: Deque[Tuple[float, float, bool]] = deque()
+
+    def record(self, latency: float, ok: bool):
+        now = time.monotonic()
+        self._samples.append((now, latency, ok))
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while self._samples and self._samples[0][0] < now - self.window_seconds:
+            self._samples.popleft()
+
+    def summary(self) -> Dict[str, float]:
+        self._trim(time.monotonic())
+        count = len(self._samples)
+        if not count:
+            return {"count": 0, "p50": 0.0, "p95": 0.0, "error_rate": 0.0}
+        latencies = sorted(latency for _, latency, _ in self._samples)
+        errors = sum(1 for _, _, ok in self._samples if not ok)
+        return {
+            "count": count,
+            "p50": latencies[count // 2],
+            "p95": latencies[min(count - 1, int(count * 0.95))],
+            "error_rate": errors / count,
+        }
+
+
+class ModelRouter:
+    """Chooses the model per agent and records how each model performs"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared router, with policies from the settings"""
+        if cls._instance is None:
+            cls._instance = ModelRouter(default_policies())
+        return cls._instance
+
+    def __init__(self, policies: Dict[str, ModelPolicy], error_rate_slo: Optional[float] = None,
+                 cooldown_seconds: Optional[float] = None):
+        settings = get_settings()
+        self.policies = policies
+        self.error_rate_slo = error_rate_slo if error_rate_slo is not None else settings.slo_error_rate
+        self.cooldown_seconds = cooldown_seconds if cooldown_seconds is not None else settings.slo_cooldown_seconds
+        self._stats: Dict[Tuple[str, str], RollingStats] = {}
+        self._degraded_until: Dict[str, float] = {}
+
+    def policy(self, agent: str) -> ModelPolicy:
+        return self.policies[agent]
+
+    def choose(self, agent: str) -> str:
+        """Model to use for the next call from this agent"""
+        policy = self.policies[agent]
+        if self._degraded_until.get(agent, 0) > time.monotonic():
+            return policy.fallback
+        return policy.primary
+
+    def record(self, agent: str, model: str, latency: float, ok: bool):
+        """Record a call outcome and re-check the primary's SLO"""
+        self._stats.setdefault((agent, model), RollingStats()).record(latency, ok)
+        policy = self.policies[agent]
+        if model == policy.primary and self.breached(agent):
+            self._degraded_until[agent] = time.monotonic() + self.cooldown_seconds
+            # Start the primary with a clean window after the cooldown
+            self._stats[(agent, model)] = RollingStats()
+            print(f"Model router: {agent} switched to {policy.fallback} for {self.cooldown_seconds:.0f}s")
+
+    def breached(self, agent: str) -> bool:
+        """Whether the primary model currently violates the agent's SLO"""
+        policy = self.policies[agent]
+        stats = self._stats.get((agent, policy.primary))
+        if stats is None:
+            return False
+        summary = stats.summary()
+        if summary["count"] < MIN_SAMPLES:
+            return False
+        return summary["p95"] > policy.slo_seconds or summary["error_rate"] > self.error_rate_slo
+
+    def stats(self) -> Dict[str, Dict]:
+        """Routing state and rolling stats per agent"""
+        now = time.monotonic()
+        report = {}
+        for agent, policy in self.policies.items():
+            report[agent] = {
+                "primary": policy.primary,
+                "fallback": policy.fallback,
+                "slo_seconds": policy.slo_seconds,
+                "active": self.choose(agent),
+                "degraded_for_seconds": max(0.0, self._degraded_until.get(agent, 0) - now),
+                "models": {
+                    model: stats.summary()
+                    for (stats_agent, model), stats in self._stats.items() if stats_agent == agent
+                },
+            }
+        return report
+
+
+def default_policies() -> Dict[str, ModelPolicy]:
+    """Policies from the settings: fast model for web search, strong for the rest"""
+    settings = get_settings()
+
+    def policy(primary: str, slo_seconds: float, fallback: str = "") -> ModelPolicy:
+        primary = primary or settings.anthropic_model
+        fallback = fallback or settings.fallback_model
+        if fallback == primary:
+            fallback = settings.anthropic_model
+        return ModelPolicy(primary, fallback, slo_seconds)
+
+    return {
+        # Web search is on the fast model, so its fallback is fast too
+        WEB_SEARCH: policy(settings.web_search_model, settings.web_search_slo_seconds,
+                           settings.web_search_fallback_model),
+        REASONING: policy(settings.reasoning_model, settings.reasoning_slo_seconds),
+        REASONING_BATCH: policy(settings.reasoning_model, settings.reasoning_slo_seconds),
+        PLANNING: policy(settings.planning_model, settings.planning_slo_seconds),
+        PLAN_SECTION: policy(settings.planning_model, settings.planning_slo_seconds),
+        PERSONALIZATION: policy(
+            settings.personalization_model or settings.planning_model,
+            settings.personalization_slo_seconds,
+        ),
+        CONVERSATION: policy(
+            settings.conversation_model or settings.planning_model,
+            settings.conversation_slo_seconds,
+        ),
+    }
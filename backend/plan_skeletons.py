@@ -0,0 +1,124 @@
+"""
+Library of reusable career plan skeletons
+Plans for the same career, major and academic year share most of their
+structure, so a generic, validated plan (the skeleton) is generated once per
+(canonical career, canonical major, academic year) and each student only gets
+a small personalization call on top of it.
+Skeletons carry the prompt/schema version they were built with (entries from
+an older SKELETON_VERSION are discarded), are evicted least recently used
+beyond max_entries, and are refreshed in the background once older than the
+TTL while the stale copy keeps being served.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from blob_store import BlobHandle, BlobStore
+from canonical import canonical_key
+from career_catalog import career_key
+from settings import get_settings
+
+# Bump when the skeleton prompt or the plan schema changes
+SKELETON_VERSION = 1
+
+
+class Skeleton(NamedTuple):
+    """A stored skeleton and where it came from"""
+    handle: BlobHandle
+    version: int
+    revision: int
+    created_at: float
+    model: str
+
+
+def skeleton_key(career: str, major: str, academic_year: str) -> Tuple[str, str, str]:
+    """Library key: canonical career, canonical major, academic year"""
+    return (career_key(career), canonical_key("major", major), academic_year.strip().lower())
+
+
+class SkeletonLibrary:
+    """LRU of skeleton blob handles with versioning and stale-while-refresh"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared library, sized from the settings"""
+        if cls._instance is None:
+            settings = get_settings()
+            cls._instance = SkeletonLibrary(settings.skeleton_max_entries, settings.skeleton_ttl)
+        return cls._instance
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Skeleton]" = OrderedDict()
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def get(self, key: Hashable) -> Tuple[Optional[Skeleton], bool]:
+        """
+        Look up a skeleton
+
+        Returns:
+            (skeleton or None, whether it is due for a refresh)
+        """
+        skeleton = self._entries.get(key)
+        if skeleton is None or skeleton.version != SKELETON_VERSION:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None, False
+        self._entries.move_to_end(key)
+        self.hits += 1
+        stale = time.time() - skeleton.created_at > self.ttl_seconds
+        if stale:
+            self.stale_hits += 1
+        return skeleton, stale
+
+    def load(self, skeleton: Skeleton) -> Dict[str, Any]:
+        """The skeleton plan as a dict"""
+        return BlobStore.get_instance().get_json(skeleton.handle)
+
+    def put(self, key: Hashable, payload: bytes, model: str) -> Skeleton:
+        """Store a validated skeleton plan (CareerPlanResponse JSON bytes)"""
+        previous = self._entries.get(key)
+        revision = previous.revision + 1 if previous is not None and previous.version == SKELETON_VERSION else 1
+        if previous is not None:
+            self.refreshes += 1
+        skeleton = Skeleton(BlobStore.get_instance().put_bytes(payload), SKELETON_VERSION, revision, time.time(), model)
+        self._entries[key] = skeleton
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return skeleton
+
+    def claim_refresh(self, key: Hashable) -> bool:
+        """Mark a key as being refreshed; False if a refresh is already running"""
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        return True
+
+    def release_refresh(self, key: Hashable):
+        self._refreshing.discard(key)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "version": SKELETON_VERSION,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,123 @@
+"""
+Addressable career plans
+Every plan served is registered under a plan ID (a digest of its content)
+with the outline and each section stored as separate blobs, so the
+JourneyGraph view can fetch the outline first and a section's steps only
+when the student expands it. A plan created from an outline alone has no
+sections yet; each is generated the first time it is requested and then
+stored like the others.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from blob_store import BlobHandle, BlobStore
+from cache import ResultCache, digest
+from settings import get_settings
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+class StoredPlan:
+    """A registered plan: outline fields plus one section handle each (None until generated)"""
+    __slots__ = (
+        "plan_id", "career", "introduction", "conclusion", "titles", "descriptions",
+        "sections", "step_counts", "context",
+    )
+
+    def __init__(self, plan_id: str, plan: Dict[str, Any], sections: List[Optional[BlobHandle]],
+                 context: Optional[BlobHandle] = None):
+        self.plan_id = plan_id
+        self.career = plan["career"]
+        self.introduction = plan["introduction"]
+        self.conclusion = plan["conclusion"]
+        self.titles = [section["title"] for section in plan["sections"]]
+        self.descriptions = [section["description"] for section in plan["sections"]]
+        self.sections = sections
+        self.step_counts: List[Optional[int]] = [
+            len(section["steps"]) if handle is not None else None
+            for section, handle in zip(plan["sections"], sections)
+        ]
+        # Prompt text for generating missing sections (outline-only plans)
+        self.context = context
+
+    def outline(self) -> Dict[str, Any]:
+        """The PlanOutline dict: everything but the steps"""
+        return {
+            "plan_id": self.plan_id,
+            "career": self.career,
+            "introduction": self.introduction,
+            "sections": [
+                {
+                    "index": i,
+                    "title": title,
+                    "description": self.descriptions[i],
+                    "ready": self.sections[i] is not None,
+                    "step_count": self.step_counts[i],
+                }
+                for i, title in enumerate(self.titles)
+            ],
+            "conclusion": self.conclusion,
+        }
+
+    def etag(self) -> str:
+        """Changes whenever a missing section is generated"""
+        return f'"{self.plan_id}.{sum(handle is not None for handle in self.sections)}"'
+
+    def section_etag(self, index: int) -> str:
+        """A stored section never changes"""
+        return f'"{self.plan_id}-{index}"'
+
+
+class PlanStore:
+    """Registered plans by ID, least recently used evicted (sections live in the blob store)"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared plan store"""
+        if cls._instance is None:
+            cls._instance = PlanStore(ttl_seconds=get_settings().plan_cache_ttl)
+        return cls._instance
+
+    def __init__(self, maxsize: int = 4096, ttl_seconds: Optional[float] = None):
+        self._plans = ResultCache("plans", maxsize=maxsize, ttl_seconds=ttl_seconds)
+
+    def register(self, payload: bytes) -> StoredPlan:
+        """Store a complete, validated plan (CareerPlanResponse JSON bytes) and its sections"""
+        plan_id = hashlib.blake2b(payload, digest_size=12).hexdigest()
+        stored = self._plans.get(plan_id)
+        if stored is None:
+            plan = json.loads(payload)
+            blobs = BlobStore.get_instance()
+            stored = StoredPlan(plan_id, plan, [blobs.put_bytes(_dumps(section)) for section in plan["sections"]])
+            self._plans.set(plan_id, stored)
+        return stored
+
+    def register_outline(self, outline: Dict[str, Any], context: str) -> StoredPlan:
+        """Store a plan whose sections (title and description only) are generated later from context"""
+        plan_id = digest({"outline": outline, "context": context})
+        stored = self._plans.get(plan_id)
+        if stored is None:
+            stored = StoredPlan(plan_id, outline, [None] * len(outline["sections"]),
+                                BlobStore.get_instance().put_text(context))
+            self._plans.set(plan_id, stored)
+        return stored
+
+    def get(self, plan_id: str) -> Optional[StoredPlan]:
+        return self._plans.get(plan_id)
+
+    def section_missing(self, plan_id: str, index: int) -> bool:
+        """Whether requesting this section would generate it (False for unknown plans and indexes)"""
+        plan = self._plans.get(plan_id)
+        return plan is not None and 0 <= index < len(plan.sections) and plan.sections[index] is None
+
+    def set_section(self, plan: StoredPlan, index: int, section: Dict[str, Any]) -> BlobHandle:
+        """Store a generated section (CareerPlanSection dict)"""
+        handle = BlobStore.get_instance().put_bytes(_dumps(section))
+        plan.sections[index] = handle
+        plan.step_counts[index] = len(section["steps"])
+        return handle
@@ -0,0 +1,211 @@
+"""
+Sampling profiler for live diagnosis
+A background thread snapshots every thread's Python stack at a fixed interval
+(sys._current_frames) and counts identical stacks. The result is the
+collapsed-stack format read by flamegraph.pl, speedscope and inferno: one
+"root;caller;callee count" line per distinct stack.
+Used on demand by /api/debug/profile, and continuously (into a short ring
+buffer) when slow-request profiling is on, so a request that exceeded the
+threshold can be explained afterwards from the samples taken while it ran.
+"""
+
+import asyncio
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+import metrics
+from settings import get_settings
+
+ADMIN_HEADER = "x-admin-token"
+MAX_SLOW_PROFILES = 20
+
+Stack = Tuple[str, ...]
+
+
+def require_admin(request: Request, feature: str = "Debug profiling"):
+    """Refuse unless the request carries the configured admin token"""
+    token = get_settings().admin_token
+    if not token:
+        raise HTTPException(status_code=403, detail=f"{feature} is disabled (set ADMIN_TOKEN)")
+    if not hmac.compare_digest(request.headers.get(ADMIN_HEADER, ""), token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def collapse(counts: Counter) -> str:
+    """Collapsed-stack text from stack counts, most frequent stacks first"""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in counts.most_common())
+
+
+class Sampler:
+    """Thread sampling every other thread's stack each interval seconds"""
+
+    def __init__(self, interval: float = 0.01, window_seconds: Optional[float] = None):
+        self.interval = interval
+        # Ring buffer of (time, stack) when a window is set, plain counts otherwise
+        self.window: Optional[Deque[Tuple[float, Stack]]] = (
+            deque(maxlen=max(1, int(window_seconds / interval))) if window_seconds else None
+        )
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[Hashable, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            short = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+            label = self._labels[code] = f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+    def _stacks(self) -> List[Stack]:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(f"thread:{names.get(ident, ident)}")
+            stacks.append(tuple(reversed(labels)))
+        return stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            for stack in self._stacks():
+                if self.window is not None:
+                    self.window.append((now, stack))
+                else:
+                    self.counts[stack] += 1
+            self.samples += 1
+
+    def collapsed(self, since: Optional[float] = None, until: Optional[float] = None) -> str:
+        """Collapsed stacks sampled so far (or, with a window, between two monotonic times)"""
+        if self.window is None:
+            return collapse(self.counts)
+        return collapse(Counter(
+            stack for at, stack in list(self.window)
+            if (since is None or at >= since) and (until is None or at <= until)
+        ))
+
+
+# ============================================================
+# On demand
+# ============================================================
+_profile_lock = threading.Lock()
+
+
+async def profile_for(seconds: float, interval: float) -> Tuple[str, int]:
+    """
+    Sample the process for a number of seconds
+
+    Returns:
+        (collapsed stacks, number of samples)
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already being taken")
+    sampler = Sampler(interval)
+    try:
+        sampler.start()
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop()
+        _profile_lock.release()
+    metrics.incr("profiler.profiles")
+    return sampler.collapsed(), sampler.samples
+
+
+# ============================================================
+# Slow requests
+# ============================================================
+# Most recent slow-request profiles, newest last
+slow_profiles: Deque[Dict] = deque(maxlen=MAX_SLOW_PROFILES)
+
+# Continuous sampler behind slow-request profiling
+_background: Optional[Sampler] = None
+
+
+def background_sampler(interval: float, window_seconds: float) -> Sampler:
+    """The continuous sampler, started on first use"""
+    global _background
+    if _background is None or not _background.running:
+        _background = Sampler(interval, window_seconds)
+        _background.start()
+    return _background
+
+
+def stop_background():
+    global _background
+    if _background is not None:
+        _background.stop()
+        _background = None
+
+
+class SlowRequestMiddleware:
+    """
+    Keeps a short rolling window of samples and, for API requests slower
+    than threshold_ms, stores the stacks sampled while the request ran.
+    Everything on the event loop shares those samples, so concurrent requests
+    show up too; the request's own frames are the ones to look for.
+    """
+
+    def __init__(self, app, threshold_ms: float, interval: float, window_seconds: float = 120):
+        self.app = app
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api") or scope["path"].startswith("/api/debug"):
+            await self.app(scope, receive, send)
+            return
+
+        # Started on first use, so merely building the app spawns no thread
+        sampler = background_sampler(self.interval, self.window_seconds)
+        started = time.monotonic()
+        status = {}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.monotonic() - started
+            if elapsed >= self.threshold:
+                metrics.incr("profiler.slow_requests")
+                slow_profiles.append({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status.get("code"),
+                    "duration_ms": round(elapsed * 1000, 1),
+                    "finished_at": time.time(),
+                    "collapsed": sampler.collapsed(since=started, until=time.monotonic()),
+                })
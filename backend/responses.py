@@ -0,0 +1,104 @@
+"""
+Fast response path for ClaudeClimb
+JSON is rendered with orjson when it is installed. Large payloads that were
+already validated (plans, reasoning) are served from pre-serialized bytes,
+compressed with brotli or gzip according to Accept-Encoding, and the
+compressed variants are cached.
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from cache import ResultCache
+
+# orjson and brotli are optional speedups
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Below this size compression costs more than it saves
+COMPRESS_MIN_BYTES = 1024
+
+# Compressed variants of cached payloads, keyed by (payload digest, encoding)
+_compressed_cache = ResultCache("compressed-responses", maxsize=512)
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _pick_encoding(accept_encoding: str) -> Optional[str]:
+    """Choose br > gzip from an Accept-Encoding header"""
+    offered = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def payload_response(request: Request, body: bytes, cache_key: Optional[Any] = None,
+                     status_code: int = 200, etag: Optional[str] = None,
+                     cache_control: Optional[str] = None) -> Response:
+    """
+    Serve already-validated JSON bytes as-is, skipping response_model
+    re-validation. Large bodies are compressed when the client accepts it;
+    pass cache_key to reuse the compressed bytes across requests.
+    With an etag, a matching If-None-Match gets an empty 304 instead.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+    if cache_control is not None:
+        headers["Cache-Control"] = cache_control
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    encoding = None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = _pick_encoding(request.headers.get("accept-encoding", ""))
+
+    if encoding is not None:
+        compressed = _compressed_cache.get((cache_key, encoding)) if cache_key is not None else None
+        if compressed is None:
+            compressed = _compress(body, encoding)
+            if cache_key is not None:
+                _compressed_cache.set((cache_key, encoding), compressed)
+        body = compressed
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,306 @@
+"""
+Upstream admission control for ClaudeClimb
+Every messages.create call first takes a slot from the scheduler, which keeps
+the process inside its requests-per-minute and tokens-per-minute budgets.
+Waiting calls are queued in two lanes: interactive (wizard requests) always
+goes before batch (jobs, bulk and speculative work). Within a lane, sessions
+take turns, so one busy session cannot starve the others.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+from fastapi import Request
+
+import metrics
+from settings import get_settings
+
+# Priority lanes, highest first
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+SESSION_HEADER = "x-session-id"
+QUEUE_WAIT_HEADER = b"x-queue-wait"
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("lane", default=INTERACTIVE)
+_session: contextvars.ContextVar[str] = contextvars.ContextVar("session", default="anonymous")
+
+
+@contextmanager
+def lane_scope(lane: str, session: Optional[str] = None):
+    """Run a block's upstream calls in a lane (and optionally as a session)"""
+    lane_token = _lane.set(lane)
+    session_token = _session.set(session) if session is not None else None
+    try:
+        yield
+    finally:
+        _lane.reset(lane_token)
+        if session_token is not None:
+            _session.reset(session_token)
+
+
+def current_lane() -> str:
+    """Lane the current block's upstream calls run in"""
+    return _lane.get()
+
+
+@contextmanager
+def session_scope(session: str):
+    """Run a block's upstream calls as a session"""
+    token = _session.set(session)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def request_session(request: Request) -> str:
+    """Session of a request: the X-Session-Id header, else the client address"""
+    session = request.headers.get(SESSION_HEADER)
+    if session:
+        return f"session:{session}"
+    if request.client is not None:
+        return f"ip:{request.client.host}"
+    return "anonymous"
+
+
+class TokenBucket:
+    """Continuously refilled budget; a rate of 0 means unlimited"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.rate:
+            self._refill()
+            self.level -= amount
+
+    def give(self, amount: float):
+        """Return (or, negative, charge) budget after the real cost is known"""
+        if self.rate:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """A call waiting for (or holding) an upstream slot"""
+    __slots__ = ("agent", "tokens", "lane", "session", "future", "enqueued_at")
+
+    def __init__(self, agent: str, tokens: int, lane: str, session: str, future: asyncio.Future):
+        self.agent = agent
+        self.tokens = tokens
+        self.lane = lane
+        self.session = session
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class UpstreamScheduler:
+    """RPM/TPM admission with priority lanes and per-session round robin"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared scheduler, with budgets from the settings"""
+        if cls._instance is None:
+            settings = get_settings()
+            cls._instance = UpstreamScheduler(settings.upstream_rpm, settings.upstream_tpm)
+        return cls._instance
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._lanes: Dict[str, "OrderedDict[str, Deque[Ticket]]"] = {lane: OrderedDict() for lane in LANES}
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop = None
+        self.in_flight = 0
+
+    # ------------------------------------------------------------
+    # Callers
+    # ------------------------------------------------------------
+    async def acquire(self, agent: str, tokens: int) -> Ticket:
+        """
+        Wait for an upstream slot in the current lane and session
+
+        Args:
+            agent: Agent making the call (for metrics)
+            tokens: Estimated input plus maximum output tokens
+
+        Returns:
+            The ticket to settle() once the call has finished
+        """
+        self._ensure_dispatcher()
+        if self.tpm:
+            # A call larger than the whole budget would otherwise never run
+            tokens = min(tokens, int(self.tpm))
+        future = asyncio.get_running_loop().create_future()
+        ticket = Ticket(agent, tokens, _lane.get(), _session.get(), future)
+        self._lanes[ticket.lane].setdefault(ticket.session, deque()).append(ticket)
+        self._wakeup.set()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller went away; hand the slot back
+                self._requests.give(1)
+                self._tokens.give(ticket.tokens)
+                self.in_flight -= 1
+            raise
+
+        waited = time.monotonic() - ticket.enqueued_at
+        metrics.incr(f"upstream.admitted.{ticket.lane}")
+        metrics.incr(f"upstream.wait_seconds.{ticket.lane}", waited)
+        return ticket
+
+    def settle(self, ticket: Ticket, used_tokens: Optional[int] = None):
+        """Release a slot, correcting the token budget with the real usage"""
+        self.in_flight -= 1
+        if used_tokens is not None:
+            self._tokens.give(ticket.tokens - used_tokens)
+
+    def throttle(self, seconds: float):
+        """Hold every lane for a while (upstream said we are rate limited)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def estimate_wait(self, lane: str = INTERACTIVE) -> float:
+        """Estimated seconds a new call in this lane would queue"""
+        ahead = LANES[:LANES.index(lane) + 1]
+        tickets = [
+            ticket
+            for name in ahead
+            for queue in self._lanes[name].values()
+            for ticket in queue if not ticket.future.done()
+        ]
+        wait = max(0.0, self._paused_until - time.monotonic())
+        wait = max(wait, self._requests.wait_time(len(tickets) + 1))
+        return max(wait, self._tokens.wait_time(sum(ticket.tokens for ticket in tickets)))
+
+    def depth(self) -> Dict[str, int]:
+        """Queued calls per lane"""
+        return {lane: sum(len(queue) for queue in sessions.values()) for lane, sessions in self._lanes.items()}
+
+    def stats(self):
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "queued": self.depth(),
+            "sessions": {lane: len(sessions) for lane, sessions in self._lanes.items()},
+            "in_flight": self.in_flight,
+            "estimated_wait": {lane: round(self.estimate_wait(lane), 2) for lane in LANES},
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+    async def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    # ------------------------------------------------------------
+    # Dispatching
+    # ------------------------------------------------------------
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._loop is not loop or self._dispatcher.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _peek(self) -> Optional[Ticket]:
+        """Next ticket: highest lane first, sessions in turn"""
+        for lane in LANES:
+            sessions = self._lanes[lane]
+            while sessions:
+                session, queue = next(iter(sessions.items()))
+                while queue and queue[0].future.done():
+                    queue.popleft()
+                if queue:
+                    return queue[0]
+                del sessions[session]
+        return None
+
+    def _pop(self, ticket: Ticket):
+        sessions = self._lanes[ticket.lane]
+        queue = sessions[ticket.session]
+        queue.popleft()
+        if queue:
+            # The session goes to the back of the lane
+            sessions.move_to_end(ticket.session)
+        else:
+            del sessions[ticket.session]
+
+    async def _dispatch(self):
+        while True:
+            ticket = self._peek()
+            if ticket is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            wait = max(
+                self._paused_until - time.monotonic(),
+                self._requests.wait_time(1),
+                self._tokens.wait_time(ticket.tokens),
+            )
+            if wait > 0:
+                # Woken early by new arrivals, so interactive calls can overtake
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._pop(ticket)
+            self._requests.take(1)
+            self._tokens.take(ticket.tokens)
+            self.in_flight += 1
+            ticket.future.set_result(None)
+
+
+class QueueWaitMiddleware:
+    """Adds the estimated upstream queue wait (seconds) to every API response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_wait(message):
+            if message["type"] == "http.response.start":
+                wait = UpstreamScheduler.get_instance().estimate_wait(INTERACTIVE)
+                headers = list(message.get("headers", []))
+                headers.append((QUEUE_WAIT_HEADER, f"{wait:.1f}".encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_wait)
@@ -0,0 +1,271 @@
+"""
+Per-session event log
+Every profile change and agent result a StateStore makes is appended to
+<session_log_dir>/<session id>.log as a small binary record (header plus a
+JSON payload, zlib-compressed when large). Every session_snapshot_every
+events the whole state is written to <session id>.snapshot together with
+the log offset it covers, so recovery loads the snapshot and replays only
+the events after it.
+
+Run from backend/ to inspect or replay sessions offline:
+    python session_log.py list
+    python session_log.py dump  <session id> [--since SEQ]
+    python session_log.py state <session id>
+    python session_log.py rerun <session id> [--agents websearch reason plan]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import Any, Iterator, NamedTuple, Optional, Tuple
+
+from settings import get_settings
+from state_store import EVENT_KINDS, StateStore
+
+LOG_SUFFIX = ".log"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# seq, unix time, kind (high bit set when compressed), payload length
+HEADER = struct.Struct("<IdBI")
+COMPRESSED = 0x80
+COMPRESS_MIN_BYTES = 256
+
+# Agent results already serialized as JSON are logged as-is
+RAW_KINDS = ("reasoning", "plan")
+
+
+class Event(NamedTuple):
+    seq: int
+    at: float
+    kind: str
+    value: Any
+    end: int  # log offset just past this record
+
+
+def encode_event(seq: int, kind: str, value) -> bytes:
+    payload = value if kind in RAW_KINDS else json.dumps(value, separators=(",", ":")).encode("utf-8")
+    code = EVENT_KINDS.index(kind)
+    if len(payload) >= COMPRESS_MIN_BYTES:
+        payload = zlib.compress(payload)
+        code |= COMPRESSED
+    return HEADER.pack(seq, time.time(), code, len(payload)) + payload
+
+
+def read_events(path: str, offset: int = 0) -> Iterator[Event]:
+    """Events in a log file from a byte offset; a torn record at the end is ignored"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            seq, at, code, length = HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            if code & COMPRESSED:
+                payload = zlib.decompress(payload)
+            kind = EVENT_KINDS[code & ~COMPRESSED]
+            value = payload if kind in RAW_KINDS else json.loads(payload)
+            offset += HEADER.size + length
+            yield Event(seq, at, kind, value, offset)
+
+
+def apply_event(store: StateStore, kind: str, value):
+    """Redo one logged change on a store"""
+    if kind == "set":
+        store.apply_profile(value)
+    elif kind == "reasoning":
+        store.update_career_reasoning_payload(value)
+    elif kind == "plan":
+        store.update_career_plan_payload(value)
+    elif kind == "options":
+        store.update_career_options(value)
+    elif kind == "select":
+        store.select_career(value)
+    elif kind == "model":
+        for agent, model in value.items():
+            store.update_served_model(agent, model)
+
+
+def log_path(directory: str, session_id: str) -> str:
+    return os.path.join(directory, session_id + LOG_SUFFIX)
+
+
+def snapshot_path(directory: str, session_id: str) -> str:
+    return os.path.join(directory, session_id + SNAPSHOT_SUFFIX)
+
+
+def list_sessions(directory: str):
+    """Session IDs in a log directory, most recently written last"""
+    if not os.path.isdir(directory):
+        return []
+    logs = [name for name in os.listdir(directory) if name.endswith(LOG_SUFFIX)]
+    logs.sort(key=lambda name: os.path.getmtime(os.path.join(directory, name)))
+    return [name[:-len(LOG_SUFFIX)] for name in logs]
+
+
+def recover(directory: str, session_id: str) -> Tuple[StateStore, int, int]:
+    """
+    Rebuild a session from its latest snapshot plus the events after it
+
+    Returns:
+        (store, next sequence number, log offset after the last whole event)
+    """
+    seq, offset = 0, 0
+    store = None
+    snapshot = snapshot_path(directory, session_id)
+    if os.path.exists(snapshot):
+        with open(snapshot, encoding="utf-8") as f:
+            data = json.load(f)
+        store = StateStore.from_state(data["state"])
+        seq, offset = data["seq"], data["offset"]
+    if store is None:
+        store = StateStore(session_id)
+
+    path = log_path(directory, session_id)
+    if os.path.exists(path):
+        for event in read_events(path, offset):
+            apply_event(store, event.kind, event.value)
+            seq, offset = event.seq + 1, event.end
+    return store, seq, offset
+
+
+class SessionLog:
+    """Append-only event log for one session, attached to its StateStore"""
+
+    def __init__(self, directory: str, store: StateStore, seq: int = 0, offset: int = 0,
+                 snapshot_every: Optional[int] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.store = store
+        self.seq = seq
+        self.snapshot_every = snapshot_every or get_settings().session_snapshot_every
+        self._since_snapshot = 0
+        path = log_path(directory, store.instance_id)
+        self._file = open(path, "r+b" if os.path.exists(path) else "w+b")
+        # Drop a record torn by a crash before appending after it
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def record(self, kind: str, value):
+        """Append one event (and snapshot the session every snapshot_every events)"""
+        self._file.write(encode_event(self.seq, kind, value))
+        self._file.flush()
+        self.seq += 1
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write the session's current state, covering every event logged so far"""
+        path = snapshot_path(self.directory, self.store.instance_id)
+        data = {"seq": self.seq, "offset": self._file.tell(), "taken_at": time.time(),
+                "state": self.store.export_state()}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        self._since_snapshot = 0
+
+    def close(self):
+        self._file.close()
+
+
+def open_session(directory: str, session_id: Optional[str] = None) -> StateStore:
+    """
+    The store for a session with its log attached: the given session, else
+    the most recent one in the directory (after a restart), else a new one
+    """
+    if session_id is None:
+        sessions = list_sessions(directory)
+        session_id = sessions[-1] if sessions else None
+    if session_id is None:
+        store, seq, offset = StateStore(), 0, 0
+    else:
+        store, seq, offset = recover(directory, session_id)
+    store.attach_journal(SessionLog(directory, store, seq, offset))
+    print(f"Session log: {log_path(directory, store.instance_id)} (from event {seq})")
+    return store
+
+
+# ============================================================
+# Offline tool
+# ============================================================
+def _describe(event: Event) -> str:
+    if event.kind in RAW_KINDS:
+        value = f"<{len(event.value)} bytes>" if event.value else "<cleared>"
+    else:
+        value = json.dumps(event.value)
+        if len(value) > 120:
+            value = value[:117] + "..."
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.at))
+    return f"{event.seq:6d}  {stamp}  {event.kind:9s} {value}"
+
+
+async def rerun(store: StateStore, agents):
+    """Run downstream agents again on a rebuilt session"""
+    from agents.planning_agent import build_career_plan
+    from agents.reasoning_agent import build_reasoning
+    from agents.web_search_agent import perform_web_search
+
+    StateStore._instance = store
+    if "websearch" in agents:
+        store.update_web_search(await perform_web_search(store.college, store.major))
+        print(f"websearch: {len(store.web_search_results)} chars")
+    if "reason" in agents:
+        await build_reasoning()
+        print(f"reason: {len(store.career_options)} career options")
+    if "plan" in agents:
+        if not store.selected_career:
+            print("plan: skipped (no career selected)")
+        else:
+            await build_career_plan(store.selected_career)
+            print(f"plan: {len(store.career_plan.get('sections', []))} sections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay session event logs")
+    parser.add_argument("--dir", default=get_settings().session_log_dir or "sessions", help="session log directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="sessions in the directory")
+    dump = commands.add_parser("dump", help="print a session's events")
+    dump.add_argument("session")
+    dump.add_argument("--since", type=int, default=0, help="first sequence number to print")
+    state = commands.add_parser("state", help="rebuild a session and print its state")
+    state.add_argument("session")
+    run = commands.add_parser("rerun", help="rebuild a session and run downstream agents on it")
+    run.add_argument("session")
+    run.add_argument("--agents", nargs="+", choices=("websearch", "reason", "plan"), default=["reason"])
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for session_id in list_sessions(args.dir):
+            events = sum(1 for _ in read_events(log_path(args.dir, session_id)))
+            snapshot = "snapshot" if os.path.exists(snapshot_path(args.dir, session_id)) else ""
+            print(f"{session_id}  {events:6d} events  {snapshot}")
+        return
+
+    if not os.path.exists(log_path(args.dir, args.session)):
+        sys.exit(f"No log for session {args.session} in {args.dir}")
+
+    if args.command == "dump":
+        for event in read_events(log_path(args.dir, args.session)):
+            if event.seq >= args.since:
+                print(_describe(event))
+        return
+
+    store, seq, _ = recover(args.dir, args.session)
+    if args.command == "state":
+        print(f"=== Session {args.session} after {seq} events ===")
+        print(json.dumps(store.export_state(), indent=2))
+    else:
+        asyncio.run(rerun(store, args.agents))
+
+
+if __name__ == "__main__":
+    main()
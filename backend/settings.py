@@ -0,0 +1,203 @@
+"""
+Settings for ClaudeClimb
+All configuration is read from the environment (and .env) once, into a
+single typed, immutable object. Use get_settings() everywhere instead of
+os.getenv().
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+DEFAULT_MODEL = "claude-3-7-sonnet-20250219"
+FAST_MODEL = "claude-3-5-haiku-20241022"
+# Fallback for agents on FAST_MODEL: no slower (or dearer) than the primary
+FAST_FALLBACK_MODEL = "claude-3-haiku-20240307"
+
+
+def _float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _tuple(name: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return tuple(part.strip() for part in value.split(",") if part.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed application settings"""
+    anthropic_api_key: Optional[str] = None
+    anthropic_model: str = DEFAULT_MODEL
+    cors_origins: Tuple[str, ...] = ("http://localhost:3000",)
+    blob_path: Optional[str] = None
+    # Blob file size that triggers compaction of unreferenced blobs (0 = never)
+    blob_max_bytes: int = 256 * 1024 * 1024
+    web_search_cache_ttl: float = 7 * 24 * 3600
+    reasoning_cache_ttl: float = 24 * 3600
+    plan_cache_ttl: float = 24 * 3600
+    prewarm_client: bool = True
+    # Per-agent model policy; empty means anthropic_model
+    web_search_model: str = FAST_MODEL
+    reasoning_model: str = ""
+    planning_model: str = ""
+    personalization_model: str = ""  # empty means planning_model
+    conversation_model: str = ""  # empty means planning_model
+    fallback_model: str = FAST_MODEL
+    web_search_fallback_model: str = FAST_FALLBACK_MODEL  # empty means fallback_model
+    # SLO per agent: rolling p95 latency (seconds) and error rate
+    web_search_slo_seconds: float = 30
+    reasoning_slo_seconds: float = 45
+    planning_slo_seconds: float = 60
+    personalization_slo_seconds: float = 20
+    conversation_slo_seconds: float = 30
+    slo_error_rate: float = 0.25
+    slo_cooldown_seconds: float = 120
+    job_workers: int = 4
+    job_max_queue: int = 200
+    job_ttl: float = 3600
+    job_queue_url: str = "memory://"
+    # Plan skeletons shared per (career, major, academic year)
+    plan_skeletons: bool = True
+    skeleton_ttl: float = 7 * 24 * 3600
+    skeleton_max_entries: int = 512
+    # Upstream admission: Anthropic rate limits (0 = unlimited) and 429 retries
+    upstream_rpm: float = 50
+    upstream_tpm: float = 80000
+    upstream_max_retries: int = 4
+    upstream_backoff_base: float = 1.0
+    upstream_backoff_max: float = 30
+    # Inbound per-client limits: credits per minute, model routes cost more;
+    # model routes are refused while the upstream queue wait exceeds the limit
+    client_rate_per_minute: float = 120
+    expensive_route_cost: float = 20
+    shed_queue_wait_seconds: float = 20
+    # Request time budgets (seconds); X-Request-Timeout can only shorten them
+    default_deadline_seconds: float = 60
+    websearch_deadline_seconds: float = 45
+    reason_deadline_seconds: float = 60
+    career_plan_deadline_seconds: float = 90
+    # PATCH /api/profile: recompute recommendations in the background once the
+    # profile is complete, after the edits have been quiet for the delay
+    speculative_reasoning: bool = True
+    speculative_delay_seconds: float = 2.0
+    # Debug profiling: /api/debug/* profiling routes need X-Admin-Token
+    # (disabled while empty); requests slower than slow_request_ms are
+    # profiled when it is above 0
+    admin_token: str = ""
+    profile_interval_ms: float = 10
+    slow_request_ms: float = 0
+    # Session event log: every profile change and agent result is appended
+    # to a per-session file in this directory (disabled while empty), with a
+    # snapshot every session_snapshot_every events to keep recovery short
+    session_log_dir: str = ""
+    session_snapshot_every: int = 100
+    # How long a response is kept for repeats with the same Idempotency-Key
+    idempotency_ttl_seconds: float = 3600
+    # Follow-up questions on a plan: turns kept word for word before the
+    # older ones are folded into a running summary
+    conversation_recent_turns: int = 6
+    # Cohort analytics: recommendation and plan outcomes are kept in memory
+    # and, when set, written to this directory as NumPy segments
+    analytics_dir: str = ""
+    # Micro-batching of concurrent /api/reason model calls: at most
+    # reasoning_batch_window_ms of waiting (0 disables it) and
+    # reasoning_batch_max students per upstream call
+    reasoning_batch_window_ms: float = 0
+    reasoning_batch_max: int = 4
+    # GET /api/health/ready turns 503 while the event loop lags more than
+    # this (p99 over the last minute) or the upstream queue wait is above
+    # shed_queue_wait_seconds
+    ready_max_loop_lag_ms: float = 500
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Build settings from environment variables"""
+        return cls(
+            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY") or None,
+            anthropic_model=os.getenv("ANTHROPIC_MODEL", DEFAULT_MODEL),
+            cors_origins=_tuple("CORS_ORIGINS", cls.cors_origins),
+            blob_path=os.getenv("CLAUDECLIMB_BLOB_PATH") or None,
+            blob_max_bytes=_int("BLOB_MAX_BYTES", cls.blob_max_bytes),
+            web_search_cache_ttl=_float("WEB_SEARCH_CACHE_TTL", cls.web_search_cache_ttl),
+            reasoning_cache_ttl=_float("REASONING_CACHE_TTL", cls.reasoning_cache_ttl),
+            plan_cache_ttl=_float("PLAN_CACHE_TTL", cls.plan_cache_ttl),
+            prewarm_client=os.getenv("PREWARM_CLIENT", "1") not in ("0", "false", "False"),
+            web_search_model=os.getenv("WEB_SEARCH_MODEL", cls.web_search_model),
+            reasoning_model=os.getenv("REASONING_MODEL", cls.reasoning_model),
+            planning_model=os.getenv("PLANNING_MODEL", cls.planning_model),
+            personalization_model=os.getenv("PERSONALIZATION_MODEL", cls.personalization_model),
+            conversation_model=os.getenv("CONVERSATION_MODEL", cls.conversation_model),
+            fallback_model=os.getenv("FALLBACK_MODEL", cls.fallback_model),
+            web_search_fallback_model=os.getenv("WEB_SEARCH_FALLBACK_MODEL", cls.web_search_fallback_model),
+            web_search_slo_seconds=_float("WEB_SEARCH_SLO_SECONDS", cls.web_search_slo_seconds),
+            reasoning_slo_seconds=_float("REASONING_SLO_SECONDS", cls.reasoning_slo_seconds),
+            planning_slo_seconds=_float("PLANNING_SLO_SECONDS", cls.planning_slo_seconds),
+            personalization_slo_seconds=_float("PERSONALIZATION_SLO_SECONDS", cls.personalization_slo_seconds),
+            conversation_slo_seconds=_float("CONVERSATION_SLO_SECONDS", cls.conversation_slo_seconds),
+            slo_error_rate=_float("SLO_ERROR_RATE", cls.slo_error_rate),
+            slo_cooldown_seconds=_float("SLO_COOLDOWN_SECONDS", cls.slo_cooldown_seconds),
+            job_workers=_int("JOB_WORKERS", cls.job_workers),
+            job_max_queue=_int("JOB_MAX_QUEUE", cls.job_max_queue),
+            job_ttl=_float("JOB_TTL", cls.job_ttl),
+            job_queue_url=os.getenv("JOB_QUEUE_URL", cls.job_queue_url),
+            plan_skeletons=os.getenv("PLAN_SKELETONS", "1") not in ("0", "false", "False"),
+            skeleton_ttl=_float("SKELETON_TTL", cls.skeleton_ttl),
+            skeleton_max_entries=_int("SKELETON_MAX_ENTRIES", cls.skeleton_max_entries),
+            upstream_rpm=_float("UPSTREAM_RPM", cls.upstream_rpm),
+            upstream_tpm=_float("UPSTREAM_TPM", cls.upstream_tpm),
+            upstream_max_retries=_int("UPSTREAM_MAX_RETRIES", cls.upstream_max_retries),
+            upstream_backoff_base=_float("UPSTREAM_BACKOFF_BASE", cls.upstream_backoff_base),
+            upstream_backoff_max=_float("UPSTREAM_BACKOFF_MAX", cls.upstream_backoff_max),
+            client_rate_per_minute=_float("CLIENT_RATE_PER_MINUTE", cls.client_rate_per_minute),
+            expensive_route_cost=_float("EXPENSIVE_ROUTE_COST", cls.expensive_route_cost),
+            shed_queue_wait_seconds=_float("SHED_QUEUE_WAIT_SECONDS", cls.shed_queue_wait_seconds),
+            default_deadline_seconds=_float("DEFAULT_DEADLINE_SECONDS", cls.default_deadline_seconds),
+            websearch_deadline_seconds=_float("WEBSEARCH_DEADLINE_SECONDS", cls.websearch_deadline_seconds),
+            reason_deadline_seconds=_float("REASON_DEADLINE_SECONDS", cls.reason_deadline_seconds),
+            career_plan_deadline_seconds=_float("CAREER_PLAN_DEADLINE_SECONDS", cls.career_plan_deadline_seconds),
+            speculative_reasoning=os.getenv("SPECULATIVE_REASONING", "1") not in ("0", "false", "False"),
+            speculative_delay_seconds=_float("SPECULATIVE_DELAY_SECONDS", cls.speculative_delay_seconds),
+            admin_token=os.getenv("ADMIN_TOKEN", cls.admin_token),
+            profile_interval_ms=_float("PROFILE_INTERVAL_MS", cls.profile_interval_ms),
+            slow_request_ms=_float("SLOW_REQUEST_MS", cls.slow_request_ms),
+            session_log_dir=os.getenv("SESSION_LOG_DIR", cls.session_log_dir),
+            session_snapshot_every=_int("SESSION_SNAPSHOT_EVERY", cls.session_snapshot_every),
+            idempotency_ttl_seconds=_float("IDEMPOTENCY_TTL_SECONDS", cls.idempotency_ttl_seconds),
+            conversation_recent_turns=_int("CONVERSATION_RECENT_TURNS", cls.conversation_recent_turns),
+            analytics_dir=os.getenv("ANALYTICS_DIR", cls.analytics_dir),
+            reasoning_batch_window_ms=_float("REASONING_BATCH_WINDOW_MS", cls.reasoning_batch_window_ms),
+            reasoning_batch_max=_int("REASONING_BATCH_MAX", cls.reasoning_batch_max),
+            ready_max_loop_lag_ms=_float("READY_MAX_LOOP_LAG_MS", cls.ready_max_loop_lag_ms),
+        )
+
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    """Get the settings, loading .env on first use"""
+    global _settings
+    if _settings is None:
+        # python-dotenv is optional in deployments that set real env vars
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+        _settings = Settings.from_env()
+    return _settings
+
+
+def configure(settings: Settings):
+    """Replace the settings (app factory and standalone scripts)"""
+    global _settings
+    _settings = settings
@@ -2,70 +2,392 @@
 Simple state store for ClaudeClimb
 Stores all application state in a single object
 MBTI scores are on a 0–100 scale, with 50 as neutral midpoint
+Large agent outputs live in the blob store; the state keeps only handles
+Every profile field carries a version, bumped whenever its value changes
+Sessions are compact: slotted, MBTI packed into 4 bytes, priorities kept as
+indexes into a shared vocabulary, and college/major/grade strings shared
+between sessions. The public attributes still read and write plain values.
+With a journal attached (see session_log.py) every profile change and agent
+result is also appended to the session's event log.
+Derived artifacts (web search summary, reasoning, each career's plan) are
+remembered with the versions of the fields they were computed from, so they
+are reused until one of those fields changes.
 """
 
+import json
 import uuid
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from blob_store import BlobStore
+
+# Profile fields with a version, in display order
+PROFILE_FIELDS = (
+    "name", "college", "major", "grade", "gender",
+    "mbti_scores", "priorities", "goals_and_interests", "web_search_results",
+)
+
+# Profile fields each derived artifact is computed from (plans also depend
+# on the stored reasoning)
+ARTIFACT_INPUTS = {
+    "websearch": ("college", "major"),
+    "reasoning": ("college", "major", "grade", "mbti_scores", "priorities", "goals_and_interests"),
+    "plan": (
+        "name", "college", "major", "grade", "mbti_scores", "priorities",
+        "goals_and_interests", "web_search_results",
+    ),
+}
+
+# Events a journal receives: profile field changes and agent results
+EVENT_KINDS = ("set", "reasoning", "plan", "options", "select", "model")
+
+MBTI_DIMENSIONS = ("ei", "sn", "tf", "jp")
+GOAL_FIELDS = ("knowsGoals", "goalType", "goals", "interests", "skills")
+
+# Shared defaults: an idle session references these instead of holding copies
+NEUTRAL_MBTI = bytes([50] * len(MBTI_DIMENSIONS))
+EMPTY_GOALS = (False, None, None, "", "")
+
+# Past this many distinct values a table stops growing and values are kept as-is
+MAX_TABLE_SIZE = 65536
+
+
+class StringTable:
+    """Process-wide table of distinct strings, each stored once"""
+
+    def __init__(self, max_size: int = MAX_TABLE_SIZE):
+        self.max_size = max_size
+        self._index: Dict[str, int] = {}
+        self._values: List[str] = []
+
+    def index(self, value: str) -> Union[int, str]:
+        """Index of a value (added on first use); the value itself once the table is full"""
+        index = self._index.get(value)
+        if index is None:
+            if len(self._values) >= self.max_size:
+                return value
+            index = self._index[value] = len(self._values)
+            self._values.append(value)
+        return index
+
+    def value(self, item: Union[int, str]) -> str:
+        """The string an index() result stands for"""
+        return self._values[item] if isinstance(item, int) else item
+
+    def intern(self, value: Optional[str]) -> Optional[str]:
+        """The shared copy of a string"""
+        if not value:
+            return value
+        return self.value(self.index(value))
+
+    def __len__(self):
+        return len(self._values)
+
+
+# College, major, grade, gender and goal types repeat across sessions
+SHARED_STRINGS = StringTable()
+# Priority labels come from a short list in the frontend
+PRIORITY_VOCABULARY = StringTable()
+
+
+def pack_mbti(scores: Dict[str, int]) -> bytes:
+    """MBTI scores as one byte per dimension"""
+    values = [int(scores[d]) for d in MBTI_DIMENSIONS]
+    if any(not 0 <= v <= 100 for v in values):
+        raise ValueError("MBTI scores must be between 0 and 100")
+    return bytes(values)
+
+
+def unpack_mbti(packed: bytes) -> Dict[str, int]:
+    return dict(zip(MBTI_DIMENSIONS, packed))
+
+
+def pack_priorities(priorities: List[str]) -> Tuple[Union[int, str], ...]:
+    return tuple(PRIORITY_VOCABULARY.index(p) for p in priorities or ())
+
+
+def unpack_priorities(packed: Tuple[Union[int, str], ...]) -> List[str]:
+    return [PRIORITY_VOCABULARY.value(item) for item in packed]
+
+
+def pack_goals(goals: Optional[Dict[str, Any]]) -> Tuple:
+    """Goals and interests as a tuple in GOAL_FIELDS order (other keys are dropped)"""
+    if not goals:
+        return EMPTY_GOALS
+    packed = tuple(goals.get(field, default) for field, default in zip(GOAL_FIELDS, EMPTY_GOALS))
+    if packed == EMPTY_GOALS:
+        return EMPTY_GOALS
+    knows, goal_type, *rest = packed
+    return (bool(knows), SHARED_STRINGS.intern(goal_type), *rest)
+
+
+def unpack_goals(packed: Tuple) -> Dict[str, Any]:
+    return dict(zip(GOAL_FIELDS, packed))
+
+
+def _same(value):
+    return value
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _web_search_handle(results: str):
+    return BlobStore.get_instance().put_text(results) if results else None
+
+
+def _web_search_text(handle) -> str:
+    if handle is None:
+        return ""
+    return BlobStore.get_instance().get_text(handle)
+
+
+# Versioned field -> (slot, encode, decode)
+_FIELDS: Dict[str, Tuple[str, Callable, Callable]] = {
+    "name": ("_name", _same, _same),
+    "college": ("_college", SHARED_STRINGS.intern, _same),
+    "major": ("_major", SHARED_STRINGS.intern, _same),
+    "grade": ("_grade", SHARED_STRINGS.intern, _same),
+    "gender": ("_gender", SHARED_STRINGS.intern, _same),
+    "mbti_scores": ("_mbti", pack_mbti, unpack_mbti),
+    "priorities": ("_priorities", pack_priorities, unpack_priorities),
+    "goals_and_interests": ("_goals", pack_goals, unpack_goals),
+    "web_search_results": ("_web_search_handle", _web_search_handle, _web_search_text),
+}
+
+
+def _versioned(field: str) -> property:
+    """Property storing a field encoded in its slot and bumping its version on change"""
+    slot, encode, decode = _FIELDS[field]
+
+    def get(self):
+        return decode(getattr(self, slot))
+
+    def set(self, value):
+        self._assign(field, encode(value), value)
+
+    return property(get, set)
+
 
 class StateStore:
     """Simple singleton state store"""
     _instance = None
     
+    __slots__ = (
+        "instance_id", "_revision", "_versions",
+        "_name", "_college", "_major", "_grade", "_gender",
+        "_mbti", "_priorities", "_goals",
+        "_web_search_handle", "_career_reasoning_handle", "_career_plan_handle",
+        "career_options", "selected_career", "_served_models", "_journal",
+        "_artifacts",
+    )
+    
     @classmethod
     def get_instance(cls):
-        """Get the singleton instance"""
+        """Get the singleton instance (recovered from the session log when one is configured)"""
         if cls._instance is None:
-            cls._instance = StateStore()
+            from settings import get_settings
+            if get_settings().session_log_dir:
+                from session_log import open_session
+                cls._instance = open_session(get_settings().session_log_dir)
+            else:
+                cls._instance = StateStore()
         return cls._instance
     
-    def __init__(self):
+    def __init__(self, instance_id: Optional[str] = None):
         """Initialize with default state"""
+        # Field versions: the revision at which each profile field last changed
+        # (created on the first change)
+        self._revision = 0
+        self._versions: Optional[Dict[str, int]] = None
+        
+        # Event log receiving every change (see session_log.py), if any
+        self._journal = None
+        
         # Add a unique identifier to this instance
-        self.instance_id = str(uuid.uuid4())
+        self.instance_id = instance_id or str(uuid.uuid4())
         print(f"Created new StateStore instance with ID: {self.instance_id}")
         
         # Basic info
-        self.name = ""
-        self.college = ""
-        self.major = ""
-        self.grade = ""
-        self.gender = ""
+        self._name = ""
+        self._college = ""
+        self._major = ""
+        self._grade = ""
+        self._gender = ""
         
-        # Web search results
-        self.web_search_results = ""
+        # Handles into the blob store for large agent outputs
+        self._web_search_handle = None
+        self._career_reasoning_handle = None
+        self._career_plan_handle = None
         
-        # MBTI scores on 0–100 scale (50 = neutral)
-        self.mbti_scores = {
-            "ei": 50,  # Extraversion vs Introversion
-            "sn": 50,  # Sensing vs Intuition
-            "tf": 50,  # Thinking vs Feeling
-            "jp": 50,  # Judging vs Perceiving
-        }
+        # MBTI scores on 0–100 scale (50 = neutral), in MBTI_DIMENSIONS order
+        self._mbti = NEUTRAL_MBTI
         
-        # Priorities
-        self.priorities = []
+        # Priorities, as PRIORITY_VOCABULARY indexes
+        self._priorities = ()
         
-        # Goals and interests
-        self.goals_and_interests = {
-            "knowsGoals": False,
-            "goalType": None,
-            "goals": None,
-            "interests": "",
-            "skills": ""
-        }
+        # Goals and interests, in GOAL_FIELDS order
+        self._goals = EMPTY_GOALS
         
         # Career options
-        self.career_options = []
-        
-        # Career reasoning
-        self.career_reasoning = {}
+        self.career_options = ()
         
         # Selected career
         self.selected_career = None
+        
+        # Model that served each agent's latest response (created on first use)
+        self._served_models: Optional[Dict[str, str]] = None
+        
+        # Derived artifact -> (input fingerprint, blob handle) (created on first use)
+        self._artifacts: Optional[Dict[Hashable, Tuple[Tuple, Any]]] = None
+    
+    # Profile fields read and write plain values; see _FIELDS for the encoding
+    name = _versioned("name")
+    college = _versioned("college")
+    major = _versioned("major")
+    grade = _versioned("grade")
+    gender = _versioned("gender")
+    mbti_scores = _versioned("mbti_scores")
+    priorities = _versioned("priorities")
+    goals_and_interests = _versioned("goals_and_interests")
+    # Large outputs are read from / written to the blob store transparently
+    web_search_results = _versioned("web_search_results")
+    
+    def _assign(self, field: str, encoded, value, record: bool = True):
+        """Store an encoded field value, bumping its version (and logging it) if it changed"""
+        slot = _FIELDS[field][0]
+        if getattr(self, slot) == encoded:
+            return
+        self._revision += 1
+        if self._versions is None:
+            self._versions = {}
+        self._versions[field] = self._revision
+        setattr(self, slot, encoded)
+        if record:
+            self._record("set", {field: value})
+    
+    def _record(self, kind: str, value):
+        if self._journal is not None:
+            self._journal.record(kind, value)
+    
+    def attach_journal(self, journal):
+        """Send every later change to an event log (None detaches)"""
+        self._journal = journal
+    
+    @property
+    def served_models(self) -> Dict[str, str]:
+        """Model that served each agent's latest response"""
+        return self._served_models or {}
+    
+    @property
+    def career_reasoning(self):
+        """Career reasoning JSON"""
+        if self._career_reasoning_handle is None:
+            return {}
+        return BlobStore.get_instance().get_json(self._career_reasoning_handle)
+    
+    @career_reasoning.setter
+    def career_reasoning(self, reasoning):
+        self.update_career_reasoning_payload(_dumps(reasoning) if reasoning else b"")
+    
+    @property
+    def career_plan(self):
+        """Most recently generated career plan"""
+        if self._career_plan_handle is None:
+            return None
+        return BlobStore.get_instance().get_json(self._career_plan_handle)
+    
+    @career_plan.setter
+    def career_plan(self, plan):
+        self.update_career_plan_payload(_dumps(plan) if plan else b"")
     
     def get_instance_id(self):
         """Return the instance ID for debugging"""
         return self.instance_id
     
+    def versions(self) -> Dict[str, int]:
+        """Version of every profile field (0 = never changed)"""
+        versions = self._versions or {}
+        return {field: versions.get(field, 0) for field in PROFILE_FIELDS}
+    
+    def input_fingerprint(self, artifact: str) -> Tuple:
+        """Versions of the inputs of an artifact ("websearch", "reasoning" or "plan")"""
+        versions = self._versions or {}
+        fingerprint = tuple(versions.get(field, 0) for field in ARTIFACT_INPUTS[artifact])
+        if artifact == "plan":
+            # Identical reasoning is stored once, so its handle stands for its content
+            fingerprint += (self._career_reasoning_handle,)
+        return fingerprint
+    
+    def stored_artifact(self, key: Hashable, fingerprint: Tuple):
+        """Blob handle of an artifact computed from the same inputs, or None"""
+        entry = (self._artifacts or {}).get(key)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+    
+    def remember_artifact(self, key: Hashable, fingerprint: Tuple, handle):
+        """Keep an artifact's handle with the fingerprint it was computed from"""
+        if self._artifacts is None:
+            self._artifacts = {}
+        self._artifacts[key] = (fingerprint, handle)
+    
+    def apply_profile(self, changes: Dict[str, Any]) -> List[str]:
+        """
+        Set several profile fields at once
+        Every value is encoded (and validated) before any field is written
+        
+        Args:
+            changes: New values keyed by profile field
+        
+        Returns:
+            The fields whose value actually changed
+        """
+        unknown = set(changes) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+        encoded = {field: _FIELDS[field][1](changes[field]) for field in PROFILE_FIELDS if field in changes}
+        changed = [field for field, value in encoded.items() if getattr(self, _FIELDS[field][0]) != value]
+        for field in changed:
+            self._assign(field, encoded[field], changes[field], record=False)
+        if changed:
+            # One event for the whole patch
+            self._record("set", {field: changes[field] for field in changed})
+        return changed
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Everything needed to rebuild this session, as JSON-serialisable values"""
+        return {
+            "instance_id": self.instance_id,
+            "revision": self._revision,
+            "versions": self._versions or {},
+            "profile": {field: getattr(self, field) for field in PROFILE_FIELDS},
+            "career_reasoning": self._payload_text(self._career_reasoning_handle),
+            "career_plan": self._payload_text(self._career_plan_handle),
+            "career_options": list(self.career_options),
+            "selected_career": self.selected_career,
+            "served_models": dict(self.served_models),
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "StateStore":
+        """Rebuild a session from export_state() output (nothing is journaled)"""
+        store = cls(state["instance_id"])
+        for field, value in state["profile"].items():
+            setattr(store, field, value)
+        store._revision = state["revision"]
+        store._versions = dict(state["versions"]) or None
+        store.update_career_reasoning_payload((state["career_reasoning"] or "").encode("utf-8"))
+        store.update_career_plan_payload((state["career_plan"] or "").encode("utf-8"))
+        store.career_options = state["career_options"] or ()
+        store.selected_career = state["selected_career"]
+        store._served_models = dict(state["served_models"]) or None
+        return store
+    
+    @staticmethod
+    def _payload_text(handle) -> Optional[str]:
+        return BlobStore.get_instance().get_text(handle) if handle is not None else None
+    
     def update_basic_info(self, name, college, major, grade, gender):
         """Update basic info"""
         self.name = name
@@ -98,14 +420,43 @@ class StateStore:
     def update_career_options(self, options):
         """Update career options"""
         self.career_options = options
+        self._record("options", options)
     
     def update_career_reasoning(self, reasoning):
         """Update career reasoning with detailed analysis"""
         self.career_reasoning = reasoning
     
+    def update_career_reasoning_payload(self, payload):
+        """Store career reasoning from already-serialized JSON bytes (empty clears it)"""
+        handle = BlobStore.get_instance().put_bytes(payload) if payload else None
+        if handle != self._career_reasoning_handle:
+            self._career_reasoning_handle = handle
+            self._record("reasoning", payload)
+    
+    def update_career_plan(self, plan):
+        """Store the generated career plan"""
+        self.career_plan = plan
+    
+    def update_career_plan_payload(self, payload):
+        """Store the career plan from already-serialized JSON bytes (empty clears it)"""
+        handle = BlobStore.get_instance().put_bytes(payload) if payload else None
+        if handle != self._career_plan_handle:
+            self._career_plan_handle = handle
+            self._record("plan", payload)
+    
+    def update_served_model(self, agent, model):
+        """Record which model served an agent's latest response"""
+        if self._served_models is None:
+            self._served_models = {}
+        if self._served_models.get(agent) != model:
+            self._served_models[agent] = model
+            self._record("model", {agent: model})
+    
     def select_career(self, career):
         """Select a career"""
-        self.selected_career = career
+        if career != self.selected_career:
+            self.selected_career = career
+            self._record("select", career)
     
     def get_full_profile(self):
         """Get the complete profile as a dictionary"""
@@ -0,0 +1,96 @@
+"""
+Adaptive output-token budgets
+Records how many output tokens each agent (and each plan section) actually
+uses and derives max_tokens and section-length guidance from the observed
+percentiles instead of fixed numbers.
+"""
+
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# Budgets used until enough outputs have been observed
+DEFAULT_MAX_TOKENS = {
+    "web_search": 1500,  # per topic query
+    "reasoning": 4000,
+    "planning": 5000,
+    "plan_section": 2048,  # outline or one section; kept apart from whole plans
+    "personalization": 1500,
+    "conversation": 1024,  # per answer
+}
+
+MIN_SAMPLES = 20
+WINDOW = 500
+HEADROOM = 1.25
+FLOOR = 1024
+CEILING = 8192
+WORDS_PER_TOKEN = 0.75
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class BudgetController:
+    """Observed output lengths → max_tokens and length guidance"""
+    _instance = None
+
+    @classmethod
+    def get_instance(cls):
+        """Get the shared budget controller"""
+        if cls._instance is None:
+            cls._instance = BudgetController()
+        return cls._instance
+
+    def __init__(self, defaults: Optional[Dict[str, int]] = None, min_samples: int = MIN_SAMPLES,
+                 window: int = WINDOW):
+        self.defaults = dict(defaults or DEFAULT_MAX_TOKENS)
+        self.min_samples = min_samples
+        self.window = window
+        self._outputs: Dict[str, Deque[int]] = {}
+        self._sections: Dict[str, Dict[str, Deque[int]]] = {}
+
+    def record(self, agent: str, output_tokens: int):
+        """Record the total output tokens of a finished generation"""
+        self._outputs.setdefault(agent, deque(maxlen=self.window)).append(output_tokens)
+
+    def record_section(self, agent: str, section: str, tokens: int):
+        """Record the (estimated) length of one section of an output"""
+        sections = self._sections.setdefault(agent, {})
+        sections.setdefault(section.strip().lower(), deque(maxlen=self.window)).append(tokens)
+
+    def max_tokens(self, agent: str) -> int:
+        """p95 of observed outputs plus headroom, clamped; the default until warmed up"""
+        samples = self._outputs.get(agent)
+        if not samples or len(samples) < self.min_samples:
+            return self.defaults.get(agent, FLOOR * 4)
+        budget = int(percentile(samples, 0.95) * HEADROOM)
+        return max(FLOOR, min(CEILING, budget))
+
+    def expected(self, agent: str) -> int:
+        """Typical (median) output length, for estimating tokens saved by cancelling"""
+        samples = self._outputs.get(agent)
+        if not samples:
+            return self.defaults.get(agent, FLOOR * 4) // 2
+        return percentile(samples, 0.5)
+
+    def section_guidance(self, agent: str) -> str:
+        """Prompt guidance on section length, or "" until enough sections were seen"""
+        lengths = [n for samples in self._sections.get(agent, {}).values() for n in samples]
+        if len(lengths) < self.min_samples:
+            return ""
+        words = int(percentile(lengths, 0.75) * WORDS_PER_TOKEN)
+        return f"Keep each section to roughly {words} words or fewer."
+
+    def stats(self) -> Dict[str, Dict]:
+        report = {}
+        for agent in set(self.defaults) | set(self._outputs):
+            samples = self._outputs.get(agent, ())
+            report[agent] = {
+                "samples": len(samples),
+                "p50": percentile(samples, 0.5) if samples else None,
+                "p95": percentile(samples, 0.95) if samples else None,
+                "max_tokens": self.max_tokens(agent),
+            }
+        return report